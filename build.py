@@ -38,6 +38,7 @@ def initialize(project):
     project.build_depends_on('descartes')
     project.build_depends_on('iso3166') # Country codes converter
     project.build_depends_on('Jinja2') # Path visualizer
+    project.build_depends_on('pyarrow') # Parquet, Arrow and Feather exports
 
     # Suppress Log Output
     logging.disable(logging.CRITICAL)
@@ -0,0 +1,303 @@
+"""
+This module contains the Arrow export class, also the base of the other columnar exports.
+"""
+import os
+import json
+import shutil
+from cybercaptain.export.base import export_base
+from cybercaptain.utils.exceptions import ValidationError, ConfigurationError
+from cybercaptain.utils.columnarFileHandler import record_file_reader
+from cybercaptain.utils.attributePath import compile_attribute_path
+from cybercaptain.utils.lazyImport import lazy_import
+pa = lazy_import("pyarrow")
+
+BATCH_SIZE = 65536 # Datasets per record batch
+INFERENCE_ROWS = 10000 # Datasets read to infer the types of the columns
+DICTIONARY_CARDINALITY = 0.5 # Max ratio of distinct values to values in the inferred datasets to dictionary encode a string column
+
+class export_arrow(export_base):
+    """
+    The Arrow exporting class exports the CyberCaptain data to an Arrow IPC file (Readable as Feather V2 file, E.g. with ``pandas.read_feather``).
+    The datasets are streamed in record batches, the columns are typed and string columns with few distinct values are dictionary encoded.
+    Unlike the CSV export, missing attributes are exported as null values.
+
+	**Parameters**:
+		kwargs:
+			Contains a dictionary of all attributes.
+
+    **Script Attributes**:
+        exportedAttributes:
+            * A list of attributes to be exported, nested values (E.g. lists) are exported as nested columns.
+            * ``all``, all of the attributes with a value which is not an object will be exported. This will result in an extra loop over the entire data set.
+        columnTypes:
+            (Optional) the Arrow types of columns (E.g. 'port = int32', 'timestamp = timestamp[s]'). The other types are inferred from the first datasets,
+            columns with mixed types in them are string columns with the values as JSON.
+            The types are checked when running (Not with the validation, to not import pyarrow), an unknown type fails the run.
+        dictionaryEncode:
+            (Optional) dictionary encode the string columns, a list of attributes or a bool for all string columns
+            (Defaults to the string columns with at most half as many distinct values as values in the first datasets).
+        compression:
+            (Optional) the compression of the columns (Defaults to zstd).
+        batchSize:
+            (Optional) the amount of datasets per record batch (Defaults to 65536).
+    """
+    COMPRESSIONS = ["none", "lz4", "zstd"]
+    DEFAULT_COMPRESSION = "zstd"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.validate(kwargs)
+
+        # all subclass special script attributes
+        self.exported_attributes = kwargs.get('exportedAttributes')
+        if isinstance(self.exported_attributes, str) and self.exported_attributes != "all": self.exported_attributes = [self.exported_attributes]
+        self.column_types = dict(kwargs.get('columnTypes') or {})
+        self.dictionary_encode = kwargs.get('dictionaryEncode') # None to decide by the cardinality of the column
+        if isinstance(self.dictionary_encode, str) and self.dictionary_encode.lower() in ["true", "false"]: self.dictionary_encode = self.dictionary_encode.lower() == "true"
+        if isinstance(self.dictionary_encode, str): self.dictionary_encode = [self.dictionary_encode]
+        self.compression = kwargs.get('compression', self.DEFAULT_COMPRESSION).lower()
+        self.batch_size = int(kwargs.get('batchSize', BATCH_SIZE))
+        self.dictionaries = {} # Attribute -> (value -> index, dictionary array) of the dictionary encoded columns
+
+    def run(self):
+        """
+        Runs the columnar export.
+
+        **Returns**:
+            ``True`` if the run was successful.
+            ``False`` if a column type is unknown or the values of an attribute do not fit the type of its column.
+        """
+        if not self.columnTypesExist(): return False
+        attributes = self.getAttributes(self.src)
+        schema = self.inferSchema(attributes)
+        self.dictionaries = {}
+        tmp_target = "%s.tmp" % self.target
+        try:
+            writer = self.openWriter(tmp_target, schema)
+            try:
+                for columns in self.readBatches(attributes):
+                    writer.write(self.toRecordBatch(columns, schema))
+            finally:
+                writer.close()
+            shutil.move(tmp_target, self.target)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            self.cc_log("ERROR", "Columnar export failed, set the type of the column with columnTypes: %s" % e)
+            return False
+        finally:
+            if os.path.exists(tmp_target): os.remove(tmp_target)
+        return True
+
+    def columnTypesExist(self):
+        """
+        Checks if the types of ``columnTypes`` are Arrow types.
+
+        **Returns**:
+            ``True`` if all the types are existing.
+            ``False`` if a type is not existing.
+        """
+        for attribute, column_type in self.column_types.items():
+            try:
+                pa.type_for_alias(column_type)
+            except (ValueError, TypeError):
+                self.cc_log("ERROR", "Type %s of %s is not an Arrow type!" % (column_type, attribute))
+                return False
+        return True
+
+    def getAttributes(self, src):
+        """
+        Evaluates the given configuration and parses the attributes nessesary.
+
+        **Parameters**:
+            src : str
+                The src location and name for opening the file.
+
+        **Returns**:
+            Returns a list of all wished attributes.
+        """
+        if isinstance(self.exported_attributes, list): return self.exported_attributes
+        if self.exported_attributes != 'all': raise ConfigurationError("Unknown attributes to export")
+
+        attributes = {} # Ordered set of the attributes
+        json_fr = record_file_reader(src)
+        while not json_fr.isEOF():
+            for key in self.getLeafKeys(json_fr.readRecord()):
+                attributes[key] = None
+        json_fr.close()
+        return list(attributes)
+
+    def getLeafKeys(self, s_dict, prefix=""):
+        """
+        Finds the keys of all values within the dict which are not an object. Including nested dicts.
+
+        **Returns**:
+            Generator of the dotted keys.
+        """
+        for k, val in s_dict.items():
+            key_with_prefix = "%s.%s" % (prefix, k) if prefix else k
+            if isinstance(val, dict) and val:
+                yield from self.getLeafKeys(val, key_with_prefix)
+            else:
+                yield key_with_prefix
+
+    def readBatches(self, attributes, batch_size=None):
+        """
+        Reads the values of the attributes column by column in batches.
+
+        **Parameters**:
+            attributes : list
+                the exported attributes.
+            batch_size : int
+                (Optional) the amount of datasets per batch, defaults to ``batchSize``.
+
+        **Returns**:
+            Generator of ``list`` with the list of values per attribute, ``None`` for missing attributes.
+        """
+        batch_size = batch_size or self.batch_size
+        attribute_paths = [compile_attribute_path(key) for key in attributes]
+        json_fr = record_file_reader(self.src, columns=attributes) # Only the exported attributes are read
+        try:
+            while not json_fr.isEOF():
+                columns = [[] for _ in attributes]
+                for _ in range(batch_size):
+                    if json_fr.isEOF(): break
+                    line = json_fr.readRecord()
+                    for values, attribute_path in zip(columns, attribute_paths):
+                        values.append(attribute_path(line, None))
+                yield columns
+        finally:
+            json_fr.close()
+
+    def inferSchema(self, attributes):
+        """
+        Creates the schema of the export. The types which are not set with ``columnTypes`` are inferred from the first datasets,
+        columns without values or with mixed types in them are string columns.
+
+        **Parameters**:
+            attributes : list
+                the exported attributes.
+
+        **Returns**:
+            ``pyarrow.Schema`` with a field per attribute.
+        """
+        batches = self.readBatches(attributes, INFERENCE_ROWS)
+        sample = next(batches, [[] for _ in attributes])
+        batches.close()
+        fields = []
+        for attribute, values in zip(attributes, sample):
+            if attribute in self.column_types:
+                column_type = pa.type_for_alias(self.column_types[attribute])
+            else:
+                try:
+                    column_type = pa.array(values).type
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    self.cc_log("WARNING", "Values of %s have mixed types, exported as strings. Set the type with columnTypes otherwise." % attribute)
+                    column_type = pa.string()
+                if pa.types.is_null(column_type): column_type = pa.string()
+            if pa.types.is_string(column_type) and self.isDictionaryEncoded(attribute, values): column_type = self.dictionaryType(column_type)
+            fields.append(pa.field(attribute, column_type))
+        return pa.schema(fields)
+
+    def isDictionaryEncoded(self, attribute, values):
+        """
+        Checks if the string column of the attribute is dictionary encoded. Without ``dictionaryEncode``
+        only the columns with few distinct values in the first datasets are, as the dictionary is kept in memory.
+
+        **Parameters**:
+            attribute : str
+                the exported attribute.
+            values : list
+                the values of the attribute in the first datasets.
+        """
+        if isinstance(self.dictionary_encode, list): return attribute in self.dictionary_encode
+        if self.dictionary_encode is not None: return bool(self.dictionary_encode)
+        values = [self.toString(val) for val in values if val is not None]
+        return bool(values) and len(set(values)) <= len(values) * DICTIONARY_CARDINALITY
+
+    def dictionaryType(self, value_type):
+        """
+        Returns the type of a dictionary encoded string column.
+        """
+        return pa.dictionary(pa.int32(), value_type)
+
+    def toRecordBatch(self, columns, schema):
+        """
+        Converts the values of a batch to a record batch of the schema.
+
+        **Parameters**:
+            columns : list
+                the list of values per attribute.
+            schema : pyarrow.Schema
+                the schema of the export.
+
+        **Returns**:
+            ``pyarrow.RecordBatch``
+
+        **Raises**:
+            ``pyarrow.ArrowInvalid`` or ``pyarrow.ArrowTypeError`` if the values do not fit the type of the column.
+        """
+        arrays = [self.toArray(values, field) for values, field in zip(columns, schema)]
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def toArray(self, values, field):
+        """
+        Converts the values of a column. The dictionaries grow with the new values of each batch, so the writer emits them as deltas.
+
+        **Returns**:
+            ``pyarrow.Array`` of the type of the field.
+        """
+        if pa.types.is_string(field.type): return pa.array([self.toString(val) for val in values], type=field.type)
+        if not pa.types.is_dictionary(field.type): return pa.array(values, type=field.type)
+
+        lookup, dictionary = self.dictionaries.get(field.name, ({}, pa.array([], type=field.type.value_type)))
+        indices = []
+        new_values = []
+        for val in values:
+            if val is None:
+                indices.append(None)
+                continue
+            val = self.toString(val)
+            index = lookup.get(val)
+            if index is None:
+                index = lookup[val] = len(dictionary) + len(new_values)
+                new_values.append(val)
+            indices.append(index)
+        if new_values: dictionary = pa.concat_arrays([dictionary, pa.array(new_values, type=field.type.value_type)]) # Only the new values are converted
+        self.dictionaries[field.name] = (lookup, dictionary)
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type=field.type.index_type), dictionary)
+
+    @staticmethod
+    def toString(val):
+        """
+        Converts a value of a string column, values which are not strings are converted to JSON.
+        """
+        return val if val is None or isinstance(val, str) else json.dumps(val)
+
+    def openWriter(self, target, schema):
+        """
+        Opens the Arrow IPC file writer.
+
+        **Returns**:
+            The writer with a ``write`` and ``close`` method.
+        """
+        options = pa.ipc.IpcWriteOptions(compression=None if self.compression == "none" else self.compression, emit_dictionary_deltas=True)
+        return pa.ipc.new_file(target, schema, options=options)
+
+    def validate(self, kwargs):
+        """
+		Validates all arguments for the columnar export modules.
+
+		**Parameters**:
+			kwargs : dict
+				contains a dictionary of all attributes.
+        """
+        super().validate(kwargs)
+        if not kwargs.get('exportedAttributes'):
+            raise ValidationError(self, ["exportedAttributes"], "Parameter cannot be empty!")
+        if kwargs.get('columnTypes') and not isinstance(kwargs.get('columnTypes'), dict):
+            raise ValidationError(self, ["columnTypes"], "Parameter has to be a section of attributes and types!")
+        if kwargs.get('compression', self.DEFAULT_COMPRESSION).lower() not in self.COMPRESSIONS:
+            raise ValidationError(self, ["compression"], "Parameter has to be one of %s!" % ", ".join(self.COMPRESSIONS))
+        try:
+            if int(kwargs.get('batchSize', BATCH_SIZE)) <= 0: raise ValidationError(self, ["batchSize"], "Parameter has to be positive!")
+        except ValueError:
+            raise ValidationError(self, ["batchSize"], "Parameter needs to be an integer!")
@@ -1,17 +1,112 @@
 """
 This module contains the CSV export class.
 """
-
+import os
+import csv
+from concurrent.futures import ProcessPoolExecutor
 from cybercaptain.export.base import export_base
 from cybercaptain.utils.exceptions import ValidationError, ConfigurationError
-from cybercaptain.utils.jsonFileHandler import json_file_reader
+from cybercaptain.utils.jsonFileHandler import json_projection
 from cybercaptain.utils.csvFileHandler import csv_file_writer
+from cybercaptain.utils.columnarFileHandler import columnar_file_writer, columnar_file_reader, record_file_reader, is_columnar_file, COLUMNAR_EXTENSION
+from cybercaptain.utils.attributePath import compile_attribute_path, as_attribute_path
+
+CHUNK_SIZE = 16 * 1024 * 1024 # Bytes of the src exported by one worker process
+_MISSING = object()
+
+def find_chunks(file_name, chunk_size=CHUNK_SIZE):
+    """
+    Splits a JSON datasets newline separated file into chunks which start and end at a line break.
+
+    **Parameters**:
+        file_name : str
+            the path to the file.
+        chunk_size : int
+            (Optional) the size of a chunk in bytes, a chunk is extended to the end of its last line.
+
+    **Returns**:
+        ``list`` of ``(start, end)`` byte offsets.
+    """
+    size = os.path.getsize(file_name)
+    chunks = []
+    with open(file_name, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline() # Move to the start of the next line
+            chunks.append((start, f.tell()))
+            start = f.tell()
+    return chunks
+
+def csv_cell(val):
+    """
+    Returns the value as it is written by the csv writer.
+    """
+    if val is None: return ""
+    return val if isinstance(val, str) else str(val)
+
+def flatten_row(record, attribute_paths, attribute_fill):
+    """
+    Flattens a dataset to the CSV row of the exported attributes.
+    Only attributes which are missing get the fill value, falsy values (E.g. ``0``, ``False`` or ``""``) are exported as they are.
+
+    **Parameters**:
+        record : dict
+            the dataset.
+        attribute_paths : list
+            ``(attribute, attribute_path)`` of the exported attributes.
+        attribute_fill : str
+            the value of missing attributes.
+
+    **Returns**:
+        ``dict`` the flat CSV row.
+    """
+    csv_row = {}
+    for key, attribute_path in attribute_paths:
+        val = attribute_path(record, _MISSING)
+        csv_row[key] = attribute_fill if val is _MISSING else val
+    return csv_row
+
+def export_chunk(src, start, end, part, attributes, attribute_fill):
+    """
+    Exports the datasets of a chunk of the src to a CSV fragment without a header. Runs in the worker processes.
+
+    **Parameters**:
+        src : str
+            the path to the JSON datasets newline separated file.
+        start : int
+            the offset of the first line of the chunk.
+        end : int
+            the offset after the last line of the chunk.
+        part : str
+            the path to the CSV fragment.
+        attributes : list
+            the exported attributes, the columns of the fragment.
+        attribute_fill : str
+            the value of missing attributes.
+
+    **Returns**:
+        ``int`` the amount of exported datasets.
+    """
+    attribute_paths = [(key, compile_attribute_path(key)) for key in attributes]
+    decode = json_projection(attributes).decode # Only the exported attributes are decoded
+    count = 0
+    with open(src, "rb") as json_file, open(part, "w") as part_file:
+        csv_writer = csv.DictWriter(part_file, dialect='unix', fieldnames=attributes)
+        json_file.seek(start)
+        while json_file.tell() < end:
+            line = json_file.readline().decode("utf-8")
+            if not line.strip(): continue
+            csv_writer.writerow(flatten_row(decode(line), attribute_paths, attribute_fill))
+            count += 1
+    return count
 
 class export_csv(export_base):
     """
     The CSV exporting class exports the CyberCaptain data. This includes a morphing of JSON to CSV. This will flatten the JSON to one dimension, this cannot be undone. It is possible to keep the depth, but the exported data might be used to do further research or analysis where the additional columns or informations are confusing and useless.
 
     If a attribute is not found at a location, it will just be exported with the text ``CC-empty``. Cause if it is left empty, any further processing of the data might be flawed. It forces the user to think how to handle this data! (Just to be kind.)
+    Attributes with a falsy value (E.g. ``0`` or ``false``) are found and exported as they are, ``null`` is exported as an empty value.
 
 	**Parameters**:
 		kwargs:
@@ -20,10 +115,13 @@ class export_csv(export_base):
     **Script Attributes**:
         exportedAttributes:
             * A list of attributes to be exported.
-            * ``all``, all of the attributes will be exported. This will result in an extra loop over the entire data set.
+            * ``all``, all of the attributes will be exported. The attributes are collected while the rows are spilled to a temporary columnar file next to the target, the CSV is written from it once the header is complete.
             * ``line-number``, all the attributes of this line will be exported.
         attributeFill:
             The default value is ``CC-empty``, if you think you are smarter than what is documented then feel free to change this value.
+        parallelism:
+            The amount of worker processes exporting line aligned chunks of the src, the CSV fragments are concatenated in order (Default: the amount of CPUs).
+            Not used for ``all``, which needs the complete header before writing, and for a columnar src, which is not split into lines.
     """
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -47,28 +145,94 @@ class export_csv(export_base):
             self.attribute_fill = 'CC-empty'
             self.cc_log("INFO", 'Set the filler attribute to "CC-empty"')
 
+        self.parallelism = int(kwargs.get("parallelism", os.cpu_count() or 1))
+
     def run(self):
         """
         Runs the csv export algorythm.
         """
+        if self.exported_attributes == 'all': return self.exportAllAttributes()
 
         attributes = self.getAttributes(self.src)
-        json_fr = json_file_reader(self.src)
-        csv_fw = csv_file_writer(self.target, attributes)
+        if is_columnar_file(self.src): return self.exportRecords(attributes)
+
+        chunks = find_chunks(self.src, CHUNK_SIZE)
+        parts = ["%s.part%d" % (self.target, i) for i in range(len(chunks))]
+        jobs = [(self.src, start, end, part, attributes, self.attribute_fill) for (start, end), part in zip(chunks, parts)]
+        csv_fw = None
+        try:
+            if self.parallelism > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.parallelism, len(jobs))) as executor:
+                    counts = list(executor.map(export_chunk, *zip(*jobs)))
+            else:
+                counts = [export_chunk(*job) for job in jobs]
 
-        while not json_fr.isEOF():
-            line = json_fr.readRecord()
-            csv_row = {}
-            # flatten the dict so that it can be written into the CSV format
-            for key in attributes:
-                val = self.getValueFromDict(line, key)
-                if not val:
-                    val = self.attribute_fill
-                csv_row[key] = val
-            csv_fw.writeCSVRow(csv_row)
-
-        json_fr.close()
+            csv_fw = csv_file_writer(self.target, attributes)
+            for part in parts:
+                csv_fw.appendCSVFile(part)
+            csv_fw.close()
+        finally:
+            if csv_fw: csv_fw.abort() # Only the tmp file is left if the parts could not be appended
+            for file_name in parts + ["%s.tmp" % self.target]:
+                if os.path.exists(file_name): os.remove(file_name)
+
+        self.cc_log("INFO", "Exported %i datasets in %i chunks" % (sum(counts), len(chunks)))
+        return True
+
+    def exportRecords(self, attributes):
+        """
+        Exports the attributes of the src in a single process, for a src which can not be split into line aligned chunks (E.g. a columnar file).
+
+        **Parameters**:
+            attributes : list
+                the exported attributes.
+        """
+        attribute_paths = [(key, compile_attribute_path(key)) for key in attributes]
+        record_fr = record_file_reader(self.src, columns=attributes) # Only the exported attributes are read
+        csv_fw = csv_file_writer(self.target, attributes)
+        while not record_fr.isEOF():
+            csv_fw.writeCSVRow(flatten_row(record_fr.readRecord(), attribute_paths, self.attribute_fill))
         csv_fw.close()
+        record_fr.close()
+
+        self.cc_log("INFO", "Exported %i datasets" % record_fr.read_lines)
+        return True
+
+    def exportAllAttributes(self):
+        """
+        Exports all the attributes of the src in a single pass over it. The flattened rows are spilled to a temporary columnar file,
+        keyed by the column index, while the attributes are collected. The CSV is written from the spill file with the complete header,
+        attributes a dataset does not have are filled with the ``attributeFill``.
+        """
+        spill_file = "%s.spill%s" % (self.target, COLUMNAR_EXTENSION)
+        columns = {} # Ordered set of the attributes: attribute -> column index
+        record_fr = record_file_reader(self.src)
+        spill_fw = columnar_file_writer(spill_file)
+        try:
+            while not record_fr.isEOF():
+                spill_row = {}
+                for key, val in self.getFlatItems(record_fr.readRecord()):
+                    column = columns.get(key)
+                    if column is None: column = columns[key] = len(columns)
+                    elif str(column) in spill_row: continue # The first value of an attribute is kept, as by the attribute path
+                    spill_row[str(column)] = csv_cell(val)
+                spill_fw.writeRecord(spill_row)
+            spill_fw.close()
+            record_fr.close()
+
+            attributes = list(columns)
+            spill_fr = columnar_file_reader(spill_file)
+            csv_fw = csv_file_writer(self.target, attributes)
+            while not spill_fr.isEOF():
+                spill_row = spill_fr.readRecord()
+                csv_fw.writeCSVRow({key: spill_row.get(str(column), self.attribute_fill) for key, column in columns.items()})
+            spill_fr.close()
+            csv_fw.close()
+        finally:
+            spill_fw.abort()
+            for file_name in (spill_file, "%s.tmp" % spill_file):
+                if os.path.exists(file_name): os.remove(file_name)
+        return True
 
     def validate(self, kwargs):
         """
@@ -81,6 +245,10 @@ class export_csv(export_base):
         super().validate(kwargs)
         if not kwargs.get('exportedAttributes'):
             raise ValidationError(self, ["exportedAttributes"], "Parameter cannot be empty!")
+        try:
+            if int(kwargs.get("parallelism", 1)) <= 0: raise ValidationError(self, ["parallelism"], "Parameter has to be positive!")
+        except ValueError:
+            raise ValidationError(self, ["parallelism"], "Parameter needs to be an integer!")
 
     def getAttributes(self, src):
         """
@@ -96,7 +264,7 @@ class export_csv(export_base):
         if isinstance(self.exported_attributes, list): # just return the given list of attributes
             return self.exported_attributes
 
-        json_fr = json_file_reader(src)
+        json_fr = record_file_reader(src)
         if isinstance(self.exported_attributes, int): # find the line and it's attributes
             line = json_fr.readLineRecord(self.exported_attributes)
             attributes = self.getKeysFromDict(line)
@@ -109,6 +277,23 @@ class export_csv(export_base):
         else:
             raise ConfigurationError("Unknown attributes to export")
 
+    def getFlatItems(self, s_dict, prefix=""):
+        """
+        Flattens the dict to its attributes and their values. Including nested dicts, the attribute of a nested dict is followed by the attributes within it.
+
+        **Parameters**:
+			s_dict : dict
+				Contains the dict which has to be flattened.
+
+        **Returns**:
+            Generator of ``(attribute, value)`` tuples.
+        """
+        for k, val in s_dict.items():
+            key_with_prefix = "%s.%s" % (prefix, k) if prefix else k
+            yield key_with_prefix, val
+            if isinstance(val, dict):
+                yield from self.getFlatItems(val, key_with_prefix)
+
     def getKeysFromDict(self, s_dict, prefix=""):
         """
         Finds all keys within the dict. Including nested dicts.
@@ -120,45 +305,25 @@ class export_csv(export_base):
         **Returns**:
             Returns a list of all keys from the given dict.
         """
-        keys = []
-        for k in s_dict.keys():
-            key_with_prefix = ""
-            if not prefix:
-                key_with_prefix = k
-            else:
-                key_with_prefix = "%s.%s" % (prefix, k)
-
-            keys.append(key_with_prefix)
-
-            if isinstance(s_dict[k], dict):
-                # get all keys in a set
-                n_keys = set(self.getKeysFromDict(s_dict[k], key_with_prefix))
-                s_keys = set(keys)
-                diff = n_keys - s_keys # get only the new keys a.k.a. the difference
-                keys = keys + list(diff) # add the new attributes
-
-        return keys
+        return list(dict.fromkeys(key for key, _ in self.getFlatItems(s_dict, prefix)))
 
     def getAllKeysFromFile(self, json_fr):
         """
-        Find all keys in the given file handler.
+        Find all keys in the given file handler. The keys are collected in an ordered set, in the order they first appear.
 
         **Parameters**:
-			json_fr : json_file_reader
+			json_fr : json_file_reader or columnar_file_reader
 				The file reader with the open file.
 
         **Returns**:
             Returns a list of all keys from the given file.
         """
-        keys = []
+        keys = {}
         while not json_fr.isEOF():
-            line = json_fr.readRecord()
-            n_keys = set(self.getKeysFromDict(line))
-            s_keys = set(keys)
-            diff = n_keys - s_keys
-            keys = keys + list(diff)
+            for key, _ in self.getFlatItems(json_fr.readRecord()):
+                keys[key] = None
 
-        return keys
+        return list(keys)
 
     def getValueFromDict(self, dictionary, attribute):
         """
@@ -167,17 +332,11 @@ class export_csv(export_base):
         **Parameter**:
             dictionary : dict
                 The dictionary which has to be searched.
-            attribute : str
-                The attribute for which has to be searched for.
+            attribute : str or attribute_path
+                The attribute for which has to be searched for, compiled once with ``compile_attribute_path`` if read from many records.
 
         **Returns**:
             Returns the value of the attribute.
         """
-        
-        if "." in attribute:
-            for key in attribute.split("."):
-                dictionary = dictionary[key]
-            return dictionary
-        else:
-            return dictionary[attribute]
+        return as_attribute_path(attribute)(dictionary)
         
@@ -0,0 +1,19 @@
+"""
+This module contains the Feather export class.
+"""
+from cybercaptain.export.arrow import export_arrow
+
+class export_feather(export_arrow):
+    """
+    The Feather exporting class exports the CyberCaptain data to a Feather V2 file, which is an Arrow IPC file.
+    The script attributes are the ones of ``export_arrow``, the columns are compressed with lz4 by default like ``pyarrow.feather``.
+
+	**Parameters**:
+		kwargs:
+			Contains a dictionary of all attributes.
+
+    **Script Attributes**:
+        compression:
+            (Optional) the compression of the columns [none|lz4|zstd] (Defaults to lz4).
+    """
+    DEFAULT_COMPRESSION = "lz4"
@@ -0,0 +1,77 @@
+"""
+This module contains the Parquet export class.
+"""
+from cybercaptain.export.arrow import export_arrow
+from cybercaptain.utils.lazyImport import lazy_import
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+class export_parquet(export_arrow):
+    """
+    The Parquet exporting class exports the CyberCaptain data to a Parquet file, each record batch is written as a row group.
+    The script attributes are the ones of ``export_arrow``, the dictionary encoding of the string columns is done by Parquet.
+
+	**Parameters**:
+		kwargs:
+			Contains a dictionary of all attributes.
+
+    **Script Attributes**:
+        compression:
+            (Optional) the compression of the columns [none|snappy|gzip|brotli|lz4|zstd] (Defaults to zstd).
+    """
+    COMPRESSIONS = ["none", "snappy", "gzip", "brotli", "lz4", "zstd"]
+    DEFAULT_COMPRESSION = "zstd"
+
+    def inferSchema(self, attributes):
+        """
+        Creates the schema of the export, the dictionary encoded string columns are plain string columns.
+        """
+        self.dictionary_columns = [] # The dictionary encoding of these columns is done by the Parquet writer
+        return super().inferSchema(attributes)
+
+    def isDictionaryEncoded(self, attribute, values):
+        """
+        Checks if the string column of the attribute is dictionary encoded and keeps it for the Parquet writer.
+        """
+        dictionary_encoded = super().isDictionaryEncoded(attribute, values)
+        if dictionary_encoded: self.dictionary_columns.append(attribute)
+        return dictionary_encoded
+
+    def dictionaryType(self, value_type):
+        """
+        Returns the plain string type, Parquet dictionary encodes the column pages itself.
+        """
+        return value_type
+
+    def openWriter(self, target, schema):
+        """
+        Opens the Parquet file writer.
+
+        **Returns**:
+            The writer with a ``write`` and ``close`` method.
+        """
+        use_dictionary = [field.name for field in schema if field.name in self.dictionary_columns]
+        return parquet_batch_writer(pq.ParquetWriter(target, schema, compression=None if self.compression == "none" else self.compression, use_dictionary=use_dictionary))
+
+class parquet_batch_writer():
+    """
+    Writes the record batches as row groups of a Parquet file.
+
+    **Parameters**:
+        writer : pyarrow.parquet.ParquetWriter
+            the opened Parquet writer.
+    """
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, batch):
+        """
+        Writes a record batch as a row group.
+        """
+        self.writer.write_table(pa.Table.from_batches([batch]))
+
+    def close(self):
+        """
+        Writes the footer and closes the file.
+        """
+        self.writer.close()
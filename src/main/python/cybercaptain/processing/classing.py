@@ -3,8 +3,9 @@ This module contains the processing classing class.
 """
 import re
 from cybercaptain.utils.exceptions import ValidationError
-from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.columnarFileHandler import record_file_reader, record_file_writer
 from cybercaptain.utils.helpers import str2bool
+from cybercaptain.utils.attributePath import compile_attribute_path
 from cybercaptain.processing.base import processing_base
 
 class processing_classing(processing_base):
@@ -33,6 +34,7 @@ class processing_classing(processing_base):
 
         # all subclass special script attributes
         self.class_by = kwargs.get('classBy')
+        self.class_by_path = compile_attribute_path(self.class_by)
         self.classes = kwargs.get('classes')
         self.rules = kwargs.get('rules')
         self.keep_others = str2bool(kwargs.get('keepOthers'))
@@ -43,8 +45,8 @@ class processing_classing(processing_base):
         Runs the classing algorythm.
         """
         self.cc_log("INFO", "Data Processing Classing: Started")
-        json_fr = json_file_reader(self.src)
-        json_fw = json_file_writer(self.target)
+        json_fr = record_file_reader(self.src)
+        json_fw = record_file_writer(self.target)
         while not json_fr.isEOF():
             record = json_fr.readRecord()
             classes = self.getClasses(record)
@@ -92,11 +94,8 @@ class processing_classing(processing_base):
             record : obj
                 The record to be classed.
         """
-        attributes = self.class_by.split('.')
         classes = []
-
-        for attribute in attributes:
-            record = record[attribute]
+        record = self.class_by_path(record)
 
         rule_no = 0
         for rule in self.rules:
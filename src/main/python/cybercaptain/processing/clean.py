@@ -4,7 +4,12 @@ The Clean module contains the processing_clean class.
 from cybercaptain.utils.helpers import str2bool
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.processing.base import processing_base
-from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.columnarFileHandler import record_file_reader, record_file_writer
+
+class _remove_line(Exception):
+    """
+    Raised on a missing key with ``removeMissingKeys`` to stop cleaning the data set.
+    """
 
 class processing_clean(processing_base):
     """
@@ -25,19 +30,23 @@ class processing_clean(processing_base):
             skip any missing keys if they are found. (cannot be used together with ``removeMissingKeys``)
         removeMissingKeys:
             remove any missing keys from the data set. (cannot be used together with ``ignoreMissingKeys``)
+
+    The attributes are dotted paths (E.g. 'location.country_code'). A step into a list of objects is applied to every object
+    (E.g. 'data.port' for a list in 'data'), a number step selects a list element (E.g. 'hostnames.0').
     """
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.validate(kwargs)
 
-        # TBD REFACTOR MOVE UP THE SINGLE STRING TO LIST
-
         # If subclass needs special variables define here
         self.format = kwargs.get("format")
         self.keep = kwargs.get("keep")
         self.drop = kwargs.get("drop")
+        if self.drop and isinstance(self.drop, str): self.drop = [self.drop]
+        if self.keep and isinstance(self.keep, str): self.keep = [self.keep]
         self.ignoreMissingKeys = str2bool(kwargs.get("ignoreMissingKeys"))
         self.removeMissingKeys = str2bool(kwargs.get("removeMissingKeys"))
+        self.plan = self.compile_plan(self.drop or self.keep) # Compiled once, applied to every data set
 
     def run(self):
         """
@@ -46,10 +55,9 @@ class processing_clean(processing_base):
         self.cc_log("INFO", "Data Processing Clean: Started")
 
         if self.format.lower() == "json":
-            if self.drop and isinstance(self.drop, str): self.drop = [self.drop]
-            if self.keep and isinstance(self.keep, str): self.keep = [self.keep]
-            json_fr = json_file_reader(self.src)
-            json_fw = json_file_writer(self.target)
+            # With keep only the top level attributes of the kept paths are decoded
+            json_fr = record_file_reader(self.src, columns=list(self.plan[0]) if self.keep else None)
+            json_fw = record_file_writer(self.target)
 
             self.cc_log("INFO", "Started to clean line for line, please wait!")
 
@@ -87,6 +95,39 @@ class processing_clean(processing_base):
         if kwargs.get("removeMissingKeys") and not isinstance(kwargs.get("removeMissingKeys"), str): raise ValidationError(self, ["removeMissingKeys"], "Parameter has to be a string!")
         self.cc_log("INFO", "Data Processing Clean: finished validation")
 
+    def compile_plan(self, attributes):
+        """
+        Compiles the dotted attributes into a merged path trie, so each data set is cleaned in one traversal.
+        If an attribute and one of its sub attributes are given, the attribute as a whole wins.
+
+        **Parameters**:
+            attributes : list
+                the dotted attributes of ``keep`` or ``drop``.
+
+        **Returns**:
+            The root node ``(steps, indexed)`` where steps is a dict ``key -> (index, child node or None for a leaf)``
+            and indexed is ``True`` if all steps are list indexes.
+        """
+        trie = {}
+        for attribute in attributes or []:
+            node = trie
+            keys = attribute.split('.')
+            for i, key in enumerate(keys):
+                if i == len(keys) - 1:
+                    node[key] = None
+                elif key in node and node[key] is None:
+                    break # The parent is already handled as a whole
+                else:
+                    node = node.setdefault(key, {})
+        return self._compile_node(trie)
+
+    def _compile_node(self, trie):
+        steps = {}
+        for key, child in trie.items():
+            index = int(key) if key.lstrip('-').isdigit() else None
+            steps[key] = (index, None if child is None else self._compile_node(child))
+        return steps, all(index is not None for index, _ in steps.values())
+
     def clean_json(self, data):
         """
         The passed line will be cleaned acording to the given attributes.
@@ -99,47 +140,79 @@ class processing_clean(processing_base):
             return self.keep_in_json(data)
 
     def drop_in_json(self, json_line):
-        for attributes in self.drop:
-            key_list = attributes.split('.')
-            keepLine = self.deepdrop_json(json_line, key_list)	# If line has to be removed, return false otherwise no return
-            if not keepLine: break
-        return keepLine, json_line
+        try:
+            self.drop_node(self.plan, json_line)
+        except _remove_line:
+            return False, json_line
+        return True, json_line
 
     def keep_in_json(self, json_line):
-        altered_line = {}
-        for attributes in self.keep:
-            key_list = attributes.split('.')
-            keepLine = self.deepkeep_json(altered_line, json_line, key_list) # If line has to be removed, return false otherwise no return
-            if not keepLine: break
-        return keepLine, altered_line
-
-    def deepdrop_json(self, the_dict, key_list):
-        if the_dict and key_list[0] in the_dict:
-            if len(key_list) == 1:
-                del the_dict[key_list[0]]
-                return True
-            else:
-                return self.deepdrop_json(the_dict[key_list[0]], key_list[1:])
+        try:
+            return True, self.keep_node(self.plan, json_line)
+        except _remove_line:
+            return False, {}
+
+    def missing_key(self, key):
+        """
+        Handles a key missing in the data set according to ``ignoreMissingKeys`` and ``removeMissingKeys``.
+        """
+        if self.ignoreMissingKeys:
+            return
+        elif self.removeMissingKeys:
+            raise _remove_line()
         else:
-            if self.ignoreMissingKeys:
-                return True
-            elif self.removeMissingKeys:
-                return False
-            else:
-                raise KeyError("Key not existing")
-
-    def deepkeep_json(self, altered_dict, the_dict, key_list):
-        if the_dict and key_list[0] in the_dict:
-            if len(key_list) == 1:
-                altered_dict[key_list[0]] = the_dict[key_list[0]]
-                return True
-            else:
-                if not key_list[0] in altered_dict: altered_dict[key_list[0]] = {}
-                return self.deepkeep_json(altered_dict[key_list[0]], the_dict[key_list[0]], key_list[1:])
+            raise KeyError("Key %s not existing" % key)
+
+    def drop_node(self, node, data):
+        """
+        Deletes the attributes of the trie node from the data in place.
+        """
+        steps, indexed = node
+        if isinstance(data, dict):
+            for key, (_, child) in steps.items():
+                if key not in data:
+                    self.missing_key(key)
+                elif child is None:
+                    del data[key]
+                else:
+                    self.drop_node(child, data[key])
+        elif isinstance(data, list):
+            if not indexed:
+                for item in data: self.drop_node(node, item)
+                return
+            leaves = set()
+            for key, (index, child) in steps.items():
+                if not -len(data) <= index < len(data):
+                    self.missing_key(key)
+                elif child is None:
+                    leaves.add(index % len(data))
+                else:
+                    self.drop_node(child, data[index])
+            for index in sorted(leaves, reverse=True): del data[index]
         else:
-            if self.ignoreMissingKeys:
-                return True
-            elif self.removeMissingKeys:
-                return False
-            else:
-                raise KeyError("Key %s not existing" % key_list)
\ No newline at end of file
+            self.missing_key(next(iter(steps)))
+
+    def keep_node(self, node, data):
+        """
+        Copies the attributes of the trie node from the data into a new data set.
+        """
+        steps, indexed = node
+        if isinstance(data, dict):
+            kept = {}
+            for key, (_, child) in steps.items():
+                if key not in data:
+                    self.missing_key(key)
+                else:
+                    kept[key] = data[key] if child is None else self.keep_node(child, data[key])
+            return kept
+        elif isinstance(data, list):
+            if not indexed: return [self.keep_node(node, item) for item in data]
+            kept = []
+            for key, (index, child) in steps.items():
+                if not -len(data) <= index < len(data):
+                    self.missing_key(key)
+                else:
+                    kept.append(data[index] if child is None else self.keep_node(child, data[index]))
+            return kept
+        self.missing_key(next(iter(steps)))
+        return {}
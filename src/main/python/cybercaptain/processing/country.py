@@ -2,10 +2,12 @@
 The country module contains the processing_country class.
 """
 from os import path
-import geoip2.database
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.processing.base import processing_base
-from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.columnarFileHandler import record_file_reader, record_file_writer
+from cybercaptain.utils.attributePath import compile_attribute_path
+from cybercaptain.utils.lazyImport import lazy_import
+geoip2 = lazy_import("geoip2")
 
 class processing_country(processing_base):
     """
@@ -32,6 +34,7 @@ class processing_country(processing_base):
 
         # If subclass needs special variables define here
         self.ip_input_attribute = kwargs.get("ipInputAttribute")
+        self.ip_input_path = compile_attribute_path(self.ip_input_attribute)
         self.output_attribute = kwargs.get("outputAttribute")
         self.max_mind_db_path = kwargs.get("maxMindDbPath")
 
@@ -54,8 +57,8 @@ class processing_country(processing_base):
             return False
         self.cc_log("DEBUG", "Opened the MaxMindGeoLite2-Country DB!")
 
-        json_fr = json_file_reader(self.src)
-        json_fw = json_file_writer(self.target)
+        json_fr = record_file_reader(self.src)
+        json_fw = record_file_writer(self.target)
 
         self.cc_log("INFO", "Started to lookup ips and write into the target, please wait!")
 
@@ -63,11 +66,9 @@ class processing_country(processing_base):
             data = json_fr.readRecord()
 
             country_code = "-99"
-            found_ip = data
-            for attribute in self.ip_input_attribute.split('.'):
-                found_ip = found_ip[attribute]
+            found_ip = self.ip_input_path(data, None)
 
-            if not found_ip or found_ip == data:
+            if not found_ip:
                 self.cc_log("WARNING", "No IP found at the give ipInputAttribute place - Add country code -99 to this dataset!")
             else:
                 # Lookup ip for country
@@ -5,9 +5,10 @@ from os import path, remove
 from shutil import move
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.processing.base import processing_base
-from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.columnarFileHandler import record_file_reader, record_file_writer
 from cybercaptain.utils.kvStore import kv_store
-from cybercaptain.utils.helpers import keyGen, genBTree
+from cybercaptain.utils.helpers import keyGen, genBTree, encodeKey, decodeKey, legacyKey
+from cybercaptain.utils.attributePath import compile_attribute_path, as_attribute_path
 
 class processing_diff(processing_base):
     """
@@ -68,34 +69,45 @@ class processing_diff(processing_base):
         self.cc_log("INFO", "Data Processing Diff: Started")
         if self.attributes_diff and isinstance(self.attributes_diff, str): self.attributes_diff = [self.attributes_diff]
         if self.key_attributes and isinstance(self.key_attributes, str): self.key_attributes = [self.key_attributes]
+        key_paths = [compile_attribute_path(attribute) for attribute in self.key_attributes]
+        diff_paths = [compile_attribute_path(attribute) for attribute in self.attributes_diff]
 
         # if the target does not exist create the file and add all the data
         if not path.isfile(self.target):
-            json_fr = json_file_reader(self.src)
+            json_fr = record_file_reader(self.src)
             self.cc_log("DEBUG", "Opened source file")
-            json_fw = json_file_writer(self.target)
+            json_fw = record_file_writer(self.target)
             self.cc_log("DEBUG", "Opened target file - please have patience")
             while not json_fr.isEOF():
                 data = json_fr.readRecord()
-                data = self.genDataSet(keyGen(self.key_attributes, data), data, self.attributes_diff)
+                data = self.genDataSet(encodeKey(keyGen(key_paths, data)), data, diff_paths)
                 json_fw.writeRecord(data)
             json_fr.close()
             json_fw.close()
         # else create a B-Tree out of the src file with the nessecary data
         else:
             self.cc_log("DEBUG", "Generating B-Tree for the diff - please have patience")
-            b_tree = genBTree(self.src, self.key_attributes)
+            b_tree = genBTree(self.src, key_paths)
             # move the old target so it can be read from and does not collide with the writer
             old_target = self.target + '.old'
             move(self.target, old_target)
-            json_fr = json_file_reader(old_target)
-            json_fw = json_file_writer(self.target)
+            json_fr = record_file_reader(old_target)
+            json_fw = record_file_writer(self.target)
+            legacy_keys = None
             self.cc_log("INFO", "Started to generate the diff - please have patience")
             while not json_fr.isEOF():
                 old_data = json_fr.readRecord()
                 try: # update all the data
-                    new_data = b_tree.pop(old_data["cc_id"])
-                    diff_data = self.getDataByAttributes(self.attributes_diff, new_data)
+                    cc_id = old_data["cc_id"]
+                    if isinstance(cc_id, str):
+                        # target written by a previous version with concatenated string keys
+                        if legacy_keys is None: legacy_keys = {legacyKey(key): key for key in b_tree.keys()}
+                        key = legacy_keys[cc_id]
+                        old_data["cc_id"] = encodeKey(key)
+                    else:
+                        key = decodeKey(cc_id)
+                    new_data = b_tree.pop(key)
+                    diff_data = self.getDataByAttributes(diff_paths, new_data)
                     old_data = self.compareData(old_data, diff_data)
                 except KeyError: # if the id cannot be found it must be delete
                     old_data["cc_status"] = "delete"
@@ -105,7 +117,7 @@ class processing_diff(processing_base):
             self.cc_log("INFO", "Adding leftover data...")
             while b_tree:
                 key = b_tree.minKey()
-                data = self.genDataSet(key, b_tree.pop(key), self.attributes_diff)
+                data = self.genDataSet(encodeKey(key), b_tree.pop(key), diff_paths)
                 json_fw.writeRecord(data)
 
             remove(old_target)
@@ -140,12 +152,12 @@ class processing_diff(processing_base):
         Generates the data set for later use.
 
         **Parameters**:
-            identifier : str
-                The identifier of this data set.
+            identifier : list
+                The identifier of this data set (the key encoded by ``encodeKey``).
             data : dict
                 The entire data set passed down.
             attributes : list
-                A list of attributes which define the key.
+                A list of attributes (or their compiled ``attribute_path``) which are taken from the data.
             status : str
                 The status that has to be written into the data set. (Default is 'insert').
 
@@ -186,7 +198,7 @@ class processing_diff(processing_base):
 
         **Parameters**:
             attributes : list
-                A list of attributes which define the key.
+                A list of attributes (or their compiled ``attribute_path``) which are taken from the data.
             data : dict
                 The data for which the key has to be generated for.
 
@@ -196,10 +208,7 @@ class processing_diff(processing_base):
         result = {}
 
         for attribute in attributes:
-            splitSet = attribute.split('.')
-            _data = data
-            for split in splitSet:
-                _data = _data[split]
-            result[attribute] = _data
+            attribute_path = as_attribute_path(attribute)
+            result[attribute_path.attribute] = attribute_path(data)
 
         return result
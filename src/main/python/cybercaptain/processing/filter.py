@@ -4,7 +4,8 @@ This module contains the processing filter class.
 import re
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.processing.base import processing_base
-from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.columnarFileHandler import record_file_reader, record_file_writer
+from cybercaptain.utils.attributePath import compile_attribute_path
 
 class processing_filter(processing_base):
     """
@@ -34,6 +35,7 @@ class processing_filter(processing_base):
 
         # If subclass needs special variables define here
         self.filterby = kwargs.get("filterby")
+        self.filterby_path = compile_attribute_path(self.filterby)
         self.rule = kwargs.get("rule")
 
     def run(self):
@@ -42,16 +44,13 @@ class processing_filter(processing_base):
         """
         self.cc_log("INFO", "Data Processing Filter: Started")
         count = 0
-        json_fr = json_file_reader(self.src)
-        json_fw = json_file_writer(self.target)
+        json_fr = record_file_reader(self.src, where=([self.filterby], self.filter)) # Only the kept data sets are decoded completely
+        json_fw = record_file_writer(self.target)
         # load data
         self.cc_log("DEBUG", "Started to filter, please wait...!")
         while not json_fr.isEOF():
-            data = json_fr.readRecord()
-            if self.filter(data):
-                json_fw.writeRecord(data)
-            else:
-                count += 1
+            json_fw.writeRecord(json_fr.readRecord())
+        count = json_fr.filtered_rows
 
         json_fr.close()
         json_fw.close()
@@ -93,10 +92,7 @@ class processing_filter(processing_base):
         **Returns**:
             ``True`` if the line should be kept, and ``False`` if the line can be discarded.
         """
-        attributes = self.filterby.split('.')
-
-        for attribute in attributes:
-            data = data.get(attribute, {})
+        data = self.filterby_path(data, None)
 
         if not data: 
             self.cc_log("DEBUG", "Skipped line for not existing attribute")
@@ -4,7 +4,8 @@ This module contains the processing group class.
 import re
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.processing.base import processing_base
-from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.columnarFileHandler import record_file_reader, record_file_writer
+from cybercaptain.utils.attributePath import compile_attribute_path
 
 class processing_group(processing_base):
     """
@@ -26,6 +27,7 @@ class processing_group(processing_base):
 
         # If subclass needs special variables define here
         self.groupBy = kwargs.get("groupby")
+        self.groupBy_path = compile_attribute_path(self.groupBy)
         self.groupRegex = kwargs.get("groupRegex")
 
     def run(self):
@@ -34,14 +36,12 @@ class processing_group(processing_base):
         """
         self.cc_log("INFO", "Data Processing Group: Started")
         data_dict = {}
-        json_fr = json_file_reader(self.src)
-        json_fw = json_file_writer(self.target)
+        json_fr = record_file_reader(self.src, columns=[self.groupBy])
+        json_fw = record_file_writer(self.target)
         # load data
         self.cc_log("DEBUG", "Started to group, please wait...!")
         while not json_fr.isEOF():
-            data = json_fr.readRecord()
-            for attribute in self.groupBy.split('.'):
-                data = data.get(attribute, {})
+            data = self.groupBy_path(json_fr.readRecord(), None)
 
             if not data: 
                 self.cc_log("DEBUG", "Skip a line, attribute was not found!")
@@ -3,14 +3,19 @@ This module contains the processing join class.
 """
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.processing.base import processing_base
-from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.columnarFileHandler import record_file_reader, record_file_writer
 from cybercaptain.utils.helpers import keyGen, genBTree
+from cybercaptain.utils.attributePath import compile_attribute_path
+
+JOIN_TYPES = ["inner", "left", "right", "full"]
+DEFAULT_JOIN_TYPE = "left"
 
 class processing_join(processing_base):
     """
     The Join allows to join two different files into one based on the given attributes. (NOTE: the two attribute list must produce the same
      key!)
-    The Join will be implemented as a left join, using the ``src`` as the left table and the ``joinwith`` as the right table.
+    The ``src`` is used as the left table and the ``joinwith`` as the right table. Every left record is written once per matching right
+    record (one-to-many) with the matched right record attached in ``right_data``.
 
     **Parameters**:
         kwargs:
@@ -23,6 +28,12 @@ class processing_join(processing_base):
             a list of attributes for the right side to join on.
         joinwith:
             the second file with which the join has to be done (rootPath auto appended to the given absolute src).
+        joinType:
+            (Optional) the type of the join (Default: left):
+                * ``inner``: only matched records are written.
+                * ``left``: all left records are written, with ``right_data`` if matched.
+                * ``right``: all right records are written, unmatched ones only as ``right_data``.
+                * ``full``: all left and all right records are written.
     """
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -32,32 +43,50 @@ class processing_join(processing_base):
         self.left_joinon = kwargs.get("left-joinon")
         self.right_joinon = kwargs.get("right-joinon")
         self.joinwith = kwargs.get("joinwith")
+        self.join_type = kwargs.get("joinType", DEFAULT_JOIN_TYPE).lower()
 
     def run(self):
         """
         Runs the join algorythm.
         """
-        self.cc_log("INFO", "Data Processing Join: Started")
+        self.cc_log("INFO", "Data Processing Join: Started (%s join)" % self.join_type)
         if self.left_joinon and isinstance(self.left_joinon, str): self.left_joinon = [self.left_joinon]
         if self.right_joinon and isinstance(self.right_joinon, str): self.right_joinon = [self.right_joinon]
 
-        # Create the B-Tree for quick and easy search
-        b_tree = genBTree(self.joinwith, self.left_joinon)
+        # Create the B-Tree for quick and easy search, every key holds all the right records sharing it
+        b_tree = genBTree(self.joinwith, self.right_joinon, multi=True)
+        matched_keys = set()
+        left_paths = [compile_attribute_path(attribute) for attribute in self.left_joinon]
 
-        json_fr = json_file_reader(self.src)
-        json_fw = json_file_writer(self.target)
+        json_fr = record_file_reader(self.src)
+        json_fw = record_file_writer(self.target)
 
         # Loop through all the left table
-        failed_counter = 0
+        unmatched_left = 0
         while not json_fr.isEOF():
             data = json_fr.readRecord()
-            key = keyGen(self.right_joinon, data)
-            (data, b_tree, failed_counter) = self.join(b_tree, key, data, failed_counter)
-            json_fw.writeRecord(data)
-
+            key = keyGen(left_paths, data)
+            matched = False
+            for joined in self.join(b_tree, key, data, matched_keys):
+                matched = True
+                json_fw.writeRecord(joined)
+            if not matched:
+                unmatched_left += 1
+                if self.join_type in ["left", "full"]:
+                    json_fw.writeRecord(data)
         json_fr.close()
+
+        # Add the right records which were never matched
+        unmatched_right = 0
+        for key, records in b_tree.items():
+            if key in matched_keys: continue
+            unmatched_right += len(records)
+            if self.join_type in ["right", "full"]:
+                for right_data in records:
+                    json_fw.writeRecord({"right_data": right_data})
+
         json_fw.close()
-        self.cc_log("INFO", "%i (btree) & %i (keyerror) records could not be mached" % (len(b_tree), failed_counter))
+        self.cc_log("INFO", "%i (left) & %i (right) records could not be matched" % (unmatched_left, unmatched_right))
         self.cc_log("INFO", "Data Processing Join: Finished")
         return True
 
@@ -77,36 +106,38 @@ class processing_join(processing_base):
             raise ValidationError(self, ["right-joinon"], "Parameter cannot be empty!")
         if not kwargs.get("joinwith"):
             raise ValidationError(self, ["joinwith"], "Parameter cannot be empty!")
+        if kwargs.get("joinType") and kwargs.get("joinType").lower() not in JOIN_TYPES:
+            raise ValidationError(self, ["joinType"], "Parameter has to be one of %s!" % JOIN_TYPES)
         self.cc_log("INFO", "Data Processing Join: finished validation")
 
-    def join(self, b_tree, key, data, failed_counter):
+    def join(self, b_tree, key, data, matched_keys):
         """
-        Joins the given data with the data from the given B-Tree and removes it.
-        If no entry can be found a log message is printed. The morphed data will be returned.
+        Joins the given data with every matching record from the given B-Tree.
+        The left record is not copied per match: the same ``data`` dict is yielded again with ``right_data`` replaced,
+        so every yielded record has to be written before the next one is requested.
 
         **Parameters**:
             b-tree : B-Tree
-                the B-Tree that has to be searched.
-            key : str
-                the key string for which has to be searched.
+                the B-Tree that has to be searched, containing a list of records per key.
+            key : tuple
+                the key generated by ``keyGen`` for which has to be searched.
             data : dict
                 the left table data.
-            failed_counter : int
-                counter to keep track of key error entries.
+            matched_keys : set
+                the keys which already found a match, the given key is added on a match.
 
         **Returns**:
-            The modified ``data`` and the modified ``b_tree`` in a tuple: ``(data, b_tree)``
+            A generator yielding the joined ``data`` once per matching right record. Nothing is yielded if no match was found.
         """
-        try:
-            # Try to find a match
-            right_data = b_tree.pop(key)
-            data['right_data'] = right_data
-        except KeyError:
-            # If no match if found catch the exception and carry on
-            self.cc_log("INFO", "Could not find any data for the key %s" % key)
-            failed_counter += 1
+        right_records = b_tree.get(key) if key else None
+        if not right_records:
+            self.cc_log("DEBUG", "Could not find any data for the key %s" % (key,))
+            return
 
-        return (data, b_tree, failed_counter)
+        matched_keys.add(key)
+        for right_data in right_records:
+            data['right_data'] = right_data
+            yield data
 
     def depends_on_file(self):
         """
@@ -1,7 +1,10 @@
 """
 This module contains the store base class.
 """
+import os
 from cybercaptain.base import cybercaptain_base
+from cybercaptain.utils.apiCache import api_cache, DEFAULT_CACHE_DIR
+from cybercaptain.utils.exceptions import ValidationError
 
 class store_base(cybercaptain_base):
 	"""
@@ -10,6 +13,19 @@ class store_base(cybercaptain_base):
 	**Parameters**:
 		kwargs:
 			contains a dictionary of all attributes.
+
+	**Script Attributes**:
+		prefetchDatasets:
+			(Only for modules injecting missing datasets) Number of injected datasets fetched concurrently in the background
+			while the already fetched ones are processed (Default: 0, fetched one after another).
+		prefetchRate:
+			(Only for modules injecting missing datasets) Maximum number of injected datasets started per minute (Default: unlimited).
+		maxMissingDatasets:
+			(Only for modules injecting missing datasets) Maximum number of missing datasets injected per run to limit API credits (Default: unlimited).
+			The remaining datasets are injected by the next run.
+		apiCacheTtl:
+			(Only for modules using an API) Seconds the API responses are also cached on disk in the project root and reused by later runs.
+			Without it responses are only shared within the current run, 0 disables the cache.
 	"""
 	def __init__(self, **kwargs):
 		super().__init__(**kwargs)
@@ -30,6 +46,37 @@ class store_base(cybercaptain_base):
 		"""
 		super().validate(kwargs)
 
+		for attribute in ["prefetchDatasets", "maxMissingDatasets", "apiCacheTtl"]:
+			if kwargs.get(attribute) is not None:
+				try:
+					kwargs[attribute] = int(kwargs.get(attribute))
+				except ValueError:
+					raise ValidationError(self, [attribute], "Parameter needs to be an integer!")
+				if kwargs[attribute] < 0: raise ValidationError(self, [attribute], "Parameter cannot be negative!")
+
+		if kwargs.get("prefetchRate") is not None:
+			try:
+				kwargs["prefetchRate"] = float(kwargs.get("prefetchRate"))
+			except ValueError:
+				raise ValidationError(self, ["prefetchRate"], "Parameter needs to be a number!")
+			if kwargs["prefetchRate"] <= 0: raise ValidationError(self, ["prefetchRate"], "Parameter has to be positive!")
+
+	def get_api_cache(self, namespace, ttl=None):
+		"""
+		Creates the cache for the API responses of the module, kept on disk in the project root if a ttl is given.
+
+		**Parameters**:
+			namespace : str
+				The name of the API (E.g. 'shodan').
+			ttl : int
+				(Optional) the validated ``apiCacheTtl`` attribute.
+
+		**Returns**:
+			``api_cache`` shared with all other modules using the same API.
+		"""
+		cache_dir = os.path.join(self.projectRoot, DEFAULT_CACHE_DIR) if self.projectRoot else None
+		return api_cache(namespace, ttl, cache_dir)
+
 	def inject_additional_tasks(self):
 		"""
 		Needs to be implemented by specific store modules for functionality.
@@ -39,3 +86,13 @@ class store_base(cybercaptain_base):
 			``False`` as a default, [] list of dicts with {"attributes":{KWARGS}, "identifier":"zz"}
 		"""
 		return False
+
+	def prefetch_additional_tasks(self):
+		"""
+		Needs to be implemented by specific store modules for functionality.
+		Can be used to let the runner fetch the tasks injected by ``inject_additional_tasks`` concurrently in the background.
+
+		**Returns**:
+			``False`` as a default, {"parallelism": INT, "rate": TASKS_PER_MINUTE or None} to prefetch the injected tasks.
+		"""
+		return False
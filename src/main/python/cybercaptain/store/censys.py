@@ -2,18 +2,18 @@
 This module contains the store censys class.
 """
 import json
-import requests
 import math
-import lz4.frame
 import os
 import datetime
-import censys.data
 import re
-import shutil
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.utils.helpers import str2bool, append_str_to_filename
 from cybercaptain.utils.kvStore import kv_store
+from cybercaptain.utils.httpDownloader import range_downloader, DEFAULT_CONNECTIONS
 from cybercaptain.store.base import store_base
+from cybercaptain.utils.lazyImport import lazy_import
+lz4 = lazy_import("lz4")
+censys = lazy_import("censys")
 
 DEFAULT_CHUNK_SIZE_DOWNLOAD = 2048
 DEFAULT_CHUNK_SIZE_DECOMPRESS = 2048
@@ -54,7 +54,15 @@ class store_censys(store_base):
 		chunkSizeDownload:
 			Set a custom download chunk size (Default: 2048)
 		chunkSizeDecomp:
-			Set a custom decompress chunk size (Default: 2048)
+			Set a custom decompress chunk size, used with resumableDownload (Default: 2048)
+		downloadConnections:
+			Set the number of concurrent connections (byte ranges) used to download a dataset (Default: 4).
+			The download is verified against the SHA-256 fingerprint of the censys api.
+		keepCompressed:
+			Keep a copy of the downloaded compressed file next to the target as ``<target>.lz4`` (Default: False).
+		resumableDownload:
+			Download the compressed file to ``<target>.lz4`` first and decompress it afterwards, instead of decompressing it while downloading (Default: False).
+			Needs the disk space of the compressed file, but an interrupted download continues where it stopped on the next run.
 	"""
 	def __init__(self, **kwargs):
 		kwargs["src"] = "." # src-less module
@@ -88,6 +96,19 @@ class store_censys(store_base):
 		else:
 			self.chunk_size_dec = DEFAULT_CHUNK_SIZE_DECOMPRESS
 
+		self.download_connections = kwargs.get("downloadConnections", DEFAULT_CONNECTIONS)
+		self.keep_compressed = str2bool(kwargs.get("keepCompressed"))
+		self.resumable_download = str2bool(kwargs.get("resumableDownload"))
+		self.dataset_sha256 = None # Compressed file fingerprint received from the api
+
+		# Prefetching of the injected missing datasets
+		self.prefetch_datasets = kwargs.get("prefetchDatasets", 0)
+		self.prefetch_rate = kwargs.get("prefetchRate")
+		self.max_missing_sets = kwargs.get("maxMissingDatasets")
+
+		# API responses shared with the injected tasks
+		self.api_cache = self.get_api_cache("censys", kwargs.get("apiCacheTtl"))
+
 		# Save current configs - Used for missingDatasets
 		self.kwargs = kwargs
 
@@ -123,30 +144,25 @@ class store_censys(store_base):
 			return False
 
 		# Check if we did process the id before but with another targetname
-		processed_ids = self.kv_store.get("processed_ids", section=self.moduleName)
-		if not processed_ids: processed_ids = []
-
-		if dataset_id and dataset_id in processed_ids:
+		if dataset_id and self.kv_store.in_set("processed_ids", dataset_id, section=self.moduleName):
 			original_target = self.kv_store.get(dataset_id, section=self.moduleName)
 			self.cc_log("WARNING", "Dataset with the ID %s has been already processed with the target %s - skip rest of the path!" % (dataset_id, original_target))
 			return False
 
-		# Download and decompress the censys file
-		self.download_file(dataset_wanted_file_url, self.target+".downloaded", self.chunk_size_dl)
-		self.decompress_lz4(self.target+".downloaded", self.target+".tmp", self.chunk_size_dec)
-		shutil.move(self.target+".tmp",self.target)
+		self.download_dataset(dataset_wanted_file_url, self.target)
 
 		if dataset_id:
-			processed_ids.append(dataset_id)
-			self.kv_store.put("processed_ids", processed_ids, section=self.moduleName, force=True)
+			# Update the store in one transaction as other tasks of the project might update it concurrently
+			with self.kv_store.transaction():
+				self.kv_store.add_to_set("processed_ids", dataset_id, section=self.moduleName)
 
-			# Save the newest processed ID to be able to tell times between last run and the current run
-			newest_processed_id = self.kv_store.get("newest_processed_id", section=self.moduleName)
-			if not newest_processed_id or self.censys_id_is_newer(dataset_id, newest_processed_id):
-				self.kv_store.put("newest_processed_id", dataset_id, section=self.moduleName, force=True)
+				# Save the newest processed ID to be able to tell times between last run and the current run
+				newest_processed_id = self.kv_store.get("newest_processed_id", section=self.moduleName)
+				if not newest_processed_id or self.censys_id_is_newer(dataset_id, newest_processed_id):
+					self.kv_store.put("newest_processed_id", dataset_id, section=self.moduleName)
 
-			# Save the target file for an explicit ID to be able to tell the file if it was already processed
-			self.kv_store.put(dataset_id, self.target, section=self.moduleName, force=True)
+				# Save the target file for an explicit ID to be able to tell the file if it was already processed
+				self.kv_store.put(dataset_id, self.target, section=self.moduleName)
 
 		self.cc_log("INFO", "Data Store Censys: Finished")
 		return True
@@ -173,8 +189,7 @@ class store_censys(store_base):
 			self.cc_log("WARNING", "Failed to get the result for '%s' and '%s' - error(%s)" % (series_id, latest_dataset["id"], dataset["error_code"]))
 			return None
 
-		dataset_wanted_file = dataset["files"][self.file_id]
-		return latest_dataset["id"], dataset_wanted_file["compressed_download_path"]
+		return latest_dataset["id"], self.get_wanted_file_url(dataset)
 
 	def via_api_get_by_date(self, censys_data, series_id, wanted_date):
 		"""
@@ -206,8 +221,7 @@ class store_censys(store_base):
 			self.cc_log("WARNING", "Failed to get the result for '%s' and '%s' - error(%s)" % (series_id, found_dataset_id, dataset["error_code"]))
 			return None
 
-		dataset_wanted_file = dataset["files"][self.file_id]
-		return found_dataset_id, dataset_wanted_file["compressed_download_path"]
+		return found_dataset_id, self.get_wanted_file_url(dataset)
 
 	def via_api_get_by_datasetId(self, censys_data, series_id, wanted_datasetId):
 		"""
@@ -222,8 +236,22 @@ class store_censys(store_base):
 			self.cc_log("WARNING", "Failed to get the result for '%s' and '%s' - error(%s)" % (series_id, wanted_datasetId, dataset["error_code"]))
 			return None
 
+		return wanted_datasetId, self.get_wanted_file_url(dataset)
+
+	def get_wanted_file_url(self, dataset):
+		"""
+		Get the compressed download path of the wanted file (fileId) from a censys api result and remember its fingerprint.
+
+		**Parameters**:
+			dataset : dict
+				The censys api result of a dataset.
+
+		**Returns**:
+			``str`` compressed download path.
+		"""
 		dataset_wanted_file = dataset["files"][self.file_id]
-		return wanted_datasetId, dataset_wanted_file["compressed_download_path"]
+		self.dataset_sha256 = dataset_wanted_file.get("compressed_sha256_fingerprint")
+		return dataset_wanted_file["compressed_download_path"]
 
 	def censys_api_response_has_error(self, response):
 		"""
@@ -234,9 +262,18 @@ class store_censys(store_base):
 		"""
 		return "error_code" in response
 
+	def censys_api_response_is_cacheable(self, response):
+		"""
+		Check the censys api response if it can be cached. Error responses are requested again.
+
+		**Returns**:
+			``True`` if the response is a normal response without error.
+		"""
+		return isinstance(response, dict) and not self.censys_api_response_has_error(response)
+
 	def censys_api_view_series(self, censys_data, series_id):
 		"""
-		Call the view_series method on the api.
+		Call the view_series method on the api. Responses without an error are cached.
 
 		**Parameters**:
 			censys_data : object
@@ -247,11 +284,12 @@ class store_censys(store_base):
 		**Returns**:
 			Censys API response.
 		"""
-		return censys_data.view_series(series_id)
+		request = ("view_series", series_id, self.api_id)
+		return self.api_cache.call(request, lambda: censys_data.view_series(series_id), cache_if=self.censys_api_response_is_cacheable)
 
 	def censys_api_view_result(self, censys_data, series_id, dataset_id):
 		"""
-		Call the view_results method on the api.
+		Call the view_results method on the api. Responses without an error are cached.
 
 		**Parameters**:
 			censys_data : object
@@ -264,11 +302,33 @@ class store_censys(store_base):
 		**Returns**:
 			Censys API response.
 		"""
-		return censys_data.view_result(series_id, dataset_id)
+		request = ("view_result", series_id, dataset_id, self.api_id)
+		return self.api_cache.call(request, lambda: censys_data.view_result(series_id, dataset_id), cache_if=self.censys_api_response_is_cacheable)
+
+	def download_dataset(self, url, target):
+		"""
+		Downloads and decompresses the censys file to its given target.
+		Decompressed while downloading in one pass, or with resumableDownload downloaded to ``<target>.lz4`` and decompressed afterwards.
+
+		**Parameters**:
+			url : str
+				path to the source where to download from.
+			target : str
+				path to the decompressed target file.
+		"""
+		compressed_target = target+".lz4"
+		if not self.resumable_download:
+			self.download_decompress_lz4(url, target, self.chunk_size_dl, self.dataset_sha256, compressed_target if self.keep_compressed else None)
+			return
+
+		self.download_file(url, compressed_target, self.chunk_size_dl, self.dataset_sha256)
+		self.decompress_lz4(compressed_target, target, self.chunk_size_dec)
+		if not self.keep_compressed: os.remove(compressed_target)
 
-	def download_file(self, url, target, chunk_size):
+	def download_file(self, url, target, chunk_size, expected_sha256=None):
 		"""
 		Downloads a file from a url to its given target.
+		The file is fetched in byte ranges over concurrent connections (downloadConnections) and resumed if a previous download was interrupted.
 
 		**Parameters**:
 			url : str
@@ -277,25 +337,61 @@ class store_censys(store_base):
 				path to the target file.
 			chunk_size : int
 				downloading chunk size.
+			expected_sha256 : str
+				(Optional) the SHA-256 fingerprint the downloaded file is verified against.
 		"""
-		r = requests.get(url, stream=True)
-		handle = open(target+".tmp", "wb")
-		total_size = int(r.headers.get('content-length', 0))
-		total_blocks = math.ceil(total_size//chunk_size)
-		total_blocks_100 = math.ceil(total_blocks//100)
+		downloader = range_downloader(url, connections=self.download_connections, chunk_size=chunk_size, expected_sha256=expected_sha256)
+		downloader.download(target)
 
-		self.cc_log("INFO", "Started download for %s with a total size of %s [0%%/100%%]" % (url, total_size))
-
-		dl_counter = block_counter = 0
-		for chunk in r.iter_content(chunk_size=chunk_size):
-			handle.write(chunk)
-			dl_counter += 1;
-			if dl_counter >= total_blocks_100:
-				block_counter += 1
-				dl_counter = 0
-				self.cc_log("INFO", "Downloaded (%s) - [%s%%/100%%]" % (url, block_counter))
-		handle.close()
-		os.rename(target+".tmp", target)
+	def download_decompress_lz4(self, url, target, chunk_size, expected_sha256=None, archive_target=None):
+		"""
+		Downloads a .LZ4 file from a url and decompresses it to its given target while downloading.
+		The compressed file is never written to the disk unless an archive target is given.
+
+		**Parameters**:
+			url : str
+				path to the source where to download from.
+			target : str
+				path to the decompressed target file.
+			chunk_size : int
+				downloading chunk size.
+			expected_sha256 : str
+				(Optional) the SHA-256 fingerprint the compressed file is verified against.
+			archive_target : str
+				(Optional) path where a copy of the compressed file is written to.
+		"""
+		downloader = range_downloader(url, connections=self.download_connections, chunk_size=chunk_size, expected_sha256=expected_sha256)
+		decompressor = lz4.frame.LZ4FrameDecompressor()
+		tmp_files = [target+".tmp"] + ([archive_target+".tmp"] if archive_target else [])
+
+		archive = open(archive_target+".tmp", "wb") if archive_target else None
+		try:
+			frame_open = False
+			frames_decoded = 0 # Complete frames, an empty response has none
+			with open(target+".tmp", "wb") as d:
+				for chunk in downloader.stream():
+					if archive: archive.write(chunk)
+					while chunk:
+						d.write(decompressor.decompress(chunk))
+						frame_open = not decompressor.eof
+						chunk = b""
+						if decompressor.eof: # Continue with the next frame if multiple frames are concatenated
+							frames_decoded += 1
+							chunk = decompressor.unused_data
+							decompressor = lz4.frame.LZ4FrameDecompressor()
+			if frame_open:
+				raise EOFError("Compressed file %s ended before the end of the lz4 frame" % url)
+			if not frames_decoded:
+				raise EOFError("Compressed file %s does not contain a complete lz4 frame" % url)
+		except BaseException:
+			if archive: archive.close()
+			for tmp_file in tmp_files:
+				if os.path.isfile(tmp_file): os.remove(tmp_file)
+			raise
+
+		if archive: archive.close()
+		for tmp_file in tmp_files: os.replace(tmp_file, tmp_file[:-len(".tmp")])
+		self.cc_log("INFO", "Downloaded and decompressed %s to %s" % (url, target))
 
 	def decompress_lz4(self, source, target, chunk_size):
 		"""
@@ -416,6 +512,12 @@ class store_censys(store_base):
 			except ValueError:
 				raise ValidationError(self, ["chunkSizeDownload"], "Chunk size download needs to be an integer!")
 
+		if kwargs.get("downloadConnections"):
+			try:
+				kwargs["downloadConnections"] = int(kwargs.get("downloadConnections"))
+			except ValueError:
+				raise ValidationError(self, ["downloadConnections"], "Download connections needs to be an integer!")
+
 		if kwargs.get("chunkSizeDecomp"):
 			try:
 				kwargs["chunkSizeDecomp"] = int(kwargs.get("chunkSizeDecomp"))
@@ -451,8 +553,7 @@ class store_censys(store_base):
 				return False
 
 			newest_processed_id = self.kv_store.get("newest_processed_id", section=self.moduleName)
-			processed_ids = self.kv_store.get("processed_ids", section=self.moduleName)
-			if not processed_ids: processed_ids = []
+			processed_ids = self.kv_store.get_set("processed_ids", section=self.moduleName)
 
 			additional_tasks = []
 			for result in series["results"]["historical"]:
@@ -478,8 +579,24 @@ class store_censys(store_base):
 			if len(additional_tasks) >= 2:
 				if self.censys_id_is_newer(additional_tasks[0]["identifier"], additional_tasks[-1]["identifier"]):
 					additional_tasks = list(reversed(additional_tasks))
-			
+
+			# Limit the injected datasets per run (API credits) - the oldest are processed first, the rest by the next run
+			if self.max_missing_sets and len(additional_tasks) > self.max_missing_sets:
+				self.cc_log("INFO", "Limit the additional datasets to %d of %d (maxMissingDatasets) - the rest follows with the next run" % (self.max_missing_sets, len(additional_tasks)))
+				additional_tasks = additional_tasks[:self.max_missing_sets]
+
 			return additional_tasks
 
 		return False
 
+	def prefetch_additional_tasks(self):
+		"""
+		Overwrite base method 'prefetch_additional_tasks'.
+
+		The injected missing datasets are fetched in the background with ``prefetchDatasets`` in parallel and at most ``prefetchRate`` per minute.
+
+		**Returns**:
+			``dict`` with the parallelism and rate if prefetchDatasets is set, otherwise ``False``.
+		"""
+		if not self.prefetch_datasets: return False
+		return {"parallelism": self.prefetch_datasets, "rate": self.prefetch_rate}
@@ -1,34 +1,158 @@
 """
 This module contains the store local class.
 """
+import os
+import csv
+import glob
+import gzip
 import json
+import shutil
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.store.base import store_base
-from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.jsonFileHandler import json_file_writer
+from cybercaptain.utils.lazyImport import lazy_import
+lz4 = lazy_import("lz4")
+
+FORMAT_DELIMITERS = {"json": None, "jsonl": None, "csv": ",", "tsv": "\t"} # Supported formats with their CSV delimiter
+COMPRESSIONS = ["auto", "none", "gzip", "lz4"]
+COPY_MODES = ["copy", "link", "normalize"]
+COPY_BUFFER_SIZE = 1024 * 1024
+WRITE_BATCH_SIZE = 1000 # Records written with one flush
+
+def detect_compression(source, compression="auto"):
+	"""
+	Detects the compression of a source file by its extension.
+
+	**Parameters**:
+		source : str
+			the path to the source file.
+		compression : str
+			the configured compression, only 'auto' is detected.
+
+	**Returns**:
+		``str`` 'gzip', 'lz4' or 'none'.
+	"""
+	if compression != "auto": return compression
+	source = source.lower()
+	if source.endswith(".gz") or source.endswith(".gzip"): return "gzip"
+	if source.endswith(".lz4"): return "lz4"
+	return "none"
+
+def open_source(source, compression, text=True):
+	"""
+	Opens a source file and decompresses it on the fly.
+
+	**Parameters**:
+		source : str
+			the path to the source file.
+		compression : str
+			'gzip', 'lz4' or 'none'.
+		text : bool
+			(Optional) open the file in text mode, otherwise binary. (Default ``True``)
+
+	**Returns**:
+		file object of the decompressed content.
+	"""
+	mode = "rt" if text else "rb"
+	encoding = "utf-8" if text else None
+	newline = "" if text else None # The csv module handles the newlines itself
+	if compression == "gzip": return gzip.open(source, mode, encoding=encoding, newline=newline)
+	if compression == "lz4": return lz4.frame.open(source, mode, encoding=encoding, newline=newline)
+	return open(source, "r" if text else "rb", encoding=encoding, newline=newline)
+
+def ingest_file(source, target, file_format, compression, copy_mode):
+	"""
+	Ingests a single source file into a JSON datasets newline separated target.
+	Module level function so the files can be ingested in parallel worker processes.
+
+	**Parameters**:
+		source : str
+			the path to the source file.
+		target : str
+			the path to the target (or part) file.
+		file_format : str
+			the format of the source file (json, jsonl, csv, tsv).
+		compression : str
+			'gzip', 'lz4' or 'none'.
+		copy_mode : str
+			'copy' or 'link' to take JSON datasets over without decoding them, 'normalize' to decode and encode each dataset.
+
+	**Returns**:
+		``int`` the amount of written datasets or ``None`` if the datasets were copied without decoding.
+	"""
+	delimiter = FORMAT_DELIMITERS[file_format]
+
+	if delimiter is None and copy_mode != "normalize":
+		if compression == "none":
+			if copy_mode == "link":
+				try:
+					os.link(source, "%s.tmp" % target)
+				except OSError: # Other device or file system without hardlinks
+					shutil.copyfile(source, "%s.tmp" % target)
+			else:
+				shutil.copyfile(source, "%s.tmp" % target) # Uses the zero-copy system calls of the platform
+		else:
+			with open_source(source, compression, text=False) as source_file, open("%s.tmp" % target, "wb") as target_file:
+				shutil.copyfileobj(source_file, target_file, COPY_BUFFER_SIZE)
+		os.replace("%s.tmp" % target, target)
+		return None
+
+	count = 0
+	json_fw = json_file_writer(target)
+	try:
+		with open_source(source, compression) as source_file:
+			if delimiter is None:
+				records = (json.loads(line) for line in source_file if line.strip())
+			else:
+				records = csv.DictReader(source_file, delimiter=delimiter)
+
+			batch = []
+			for record in records:
+				batch.append(record)
+				if len(batch) >= WRITE_BATCH_SIZE:
+					json_fw.writeRecords(batch)
+					count += len(batch)
+					batch = []
+			json_fw.writeRecords(batch)
+			count += len(batch)
+	except BaseException:
+		json_fw.abort()
+		raise
+	json_fw.close()
+	return count
 
 class store_local(store_base):
 	"""
 	The local module allows to integrate CyberCaptain data from a connected file system.
+	The src can be a single file, a directory (all files in it recursively) or a glob pattern (E.g. 'archive/**/*.json.gz').
+	Multiple files are ingested in parallel and concatenated in their sorted order into one JSON datasets newline separated target.
 
-	**Important**:
-		This module currently only serves as a place to implement local imports with for example the need to morph the data.
-		If the local to import file already is a json datasets newline separated file, we recommend to directly include 
-		it in the src attribute of the next configured module.
-	
 	**Parameters**:
 		kwargs:
 			contains a dictionary of all attributes.
 
 	**Script Attributes**:
 		format:
-			<todo>
+			The format of the src files [json|jsonl|csv|tsv]. CSV and TSV files need a header row, its columns are used as attributes.
+		compression:
+			The compression of the src files [auto|none|gzip|lz4] (Default: auto, detected by the file extension '.gz' or '.lz4').
+		copyMode:
+			How JSON datasets newline separated files are taken over [copy|link|normalize] (Default: copy).
+			'copy' copies the bytes without decoding the datasets, 'link' hardlinks a single uncompressed src file (falls back to copy),
+			'normalize' decodes and encodes each dataset and skips empty lines.
+		parallelism:
+			The amount of files ingested at the same time (Default: the amount of CPUs).
 	"""
 	def __init__(self, **kwargs):
 		super().__init__(**kwargs)
 		self.validate(kwargs)
 		# If subclass needs special variables define here
 		self.format = kwargs.get("format")
+		self.compression = kwargs.get("compression", "auto").lower()
+		self.copy_mode = kwargs.get("copyMode", "copy").lower()
+		self.parallelism = int(kwargs.get("parallelism", os.cpu_count() or 1))
 
 	def run(self):
 		"""
@@ -37,28 +161,104 @@ class store_local(store_base):
 		self.cc_log("INFO", "Data Store Local: Started")
 		self.cc_log("INFO", "Run DataStore LOCAL for (src->target) %s -> %s" % (self.src, self.target))
 
-		# TBD: Rework this in Task #10
-		count = 0
-		if self.format.lower() == "json":
-			json_fr = json_file_reader(self.src)
-			json_fw = json_file_writer(self.target)
+		file_format = self.format.lower()
 
-			self.cc_log("INFO", "Started to read the local file into a new file, please wait!")
+		sources = self.get_source_files(self.src)
+		self.cc_log("INFO", "Started to read %d local file(s) into a new file, please wait!" % len(sources))
 
-			while not json_fr.isEOF():
-				data = json_fr.readRecord()
-				json_fw.writeRecord(data)
-
-			json_fr.close()
-			json_fw.close()
+		if len(sources) == 1:
+			count = ingest_file(sources[0], self.target, file_format, detect_compression(sources[0], self.compression), self.copy_mode)
 		else:
-			raise NotImplementedError("The selected format is not implemented!")
-		# END TEMP
-		self.cc_log("DEBUG", "Data Store Local: Loaded %s data entries" % (count))
+			count = self.ingest_files(sources, file_format)
+
+		if count is not None: self.cc_log("DEBUG", "Data Store Local: Loaded %s data entries" % (count))
 		self.cc_log("INFO", "Data Store Local: Finished")
 
 		return True
 
+	def ingest_files(self, sources, file_format):
+		"""
+		Ingests multiple files in parallel into part files and concatenates them into the target.
+		Uncompressed JSON files taken over without decoding are concatenated directly.
+
+		**Parameters**:
+			sources : list
+				the paths to the source files in the wanted order.
+			file_format : str
+				the format of the source files.
+
+		**Returns**:
+			``int`` the amount of written datasets or ``None`` if datasets were copied without decoding.
+		"""
+		copy_mode = "copy" if self.copy_mode == "link" else self.copy_mode # Several files cannot be hardlinked into one target
+		parts = []
+		jobs = []
+		for i, source in enumerate(sources):
+			compression = detect_compression(source, self.compression)
+			if FORMAT_DELIMITERS[file_format] is None and copy_mode == "copy" and compression == "none":
+				parts.append(source)
+			else:
+				part = "%s.part%d" % (self.target, i)
+				parts.append(part)
+				jobs.append((source, part, file_format, compression, copy_mode))
+
+		try:
+			if self.parallelism > 1 and len(jobs) > 1:
+				with ProcessPoolExecutor(max_workers=min(self.parallelism, len(jobs))) as executor:
+					counts = list(executor.map(ingest_file, *zip(*jobs)))
+			else:
+				counts = [ingest_file(*job) for job in jobs]
+			self.concatenate_files(parts, self.target)
+		finally:
+			for job in jobs:
+				if os.path.exists(job[1]): os.remove(job[1])
+
+		if None in counts or len(jobs) < len(sources): return None
+		return sum(counts)
+
+	def concatenate_files(self, parts, target):
+		"""
+		Concatenates the JSON datasets newline separated files into the target without decoding them.
+		A newline is added between two files if the previous one does not end with one.
+
+		**Parameters**:
+			parts : list
+				the paths to the files in the wanted order.
+			target : str
+				the path to the target file.
+		"""
+		ends_with_newline = True
+		with open("%s.tmp" % target, "wb") as target_file:
+			for part in parts:
+				if os.path.getsize(part) == 0: continue
+				if not ends_with_newline: target_file.write(b"\n")
+				with open(part, "rb") as part_file:
+					shutil.copyfileobj(part_file, target_file, COPY_BUFFER_SIZE)
+					part_file.seek(-1, os.SEEK_END)
+					ends_with_newline = part_file.read(1) == b"\n"
+		os.replace("%s.tmp" % target, target)
+
+	@staticmethod
+	def get_source_files(src):
+		"""
+		Gets the files of the src attribute.
+
+		**Parameters**:
+			src : str
+				a file, a directory or a glob pattern.
+
+		**Returns**:
+			``list`` with the sorted paths to the files. Hidden files in directories are skipped.
+		"""
+		if os.path.isfile(src): return [src]
+		if os.path.isdir(src):
+			files = []
+			for root, dirs, file_names in os.walk(src):
+				dirs[:] = [d for d in dirs if not d.startswith(".")]
+				files.extend(os.path.join(root, f) for f in file_names if not f.startswith("."))
+			return sorted(files)
+		return sorted(f for f in glob.glob(src, recursive=True) if os.path.isfile(f))
+
 	def validate(self, kwargs):
 		"""
 		Validates all arguments for the local module.
@@ -70,8 +270,19 @@ class store_local(store_base):
 		super().validate(kwargs)
 		self.cc_log("INFO", "Data Store Local: started validation")
 
-		# Check if src file to load exists
-		if not Path(kwargs.get("src")).is_file() and not Path(self.src).is_file():
-			raise ValidationError(self, ["src"], "Parameter must point to an existing file!")
+		# Check if src files to load exist
+		if not self.get_source_files(kwargs.get("src")) and not Path(self.src).is_file():
+			raise ValidationError(self, ["src"], "Parameter must point to an existing file, a directory with files or a glob pattern matching files!")
+
+		if str(kwargs.get("format")).lower() not in FORMAT_DELIMITERS:
+			raise ValidationError(self, ["format"], "Parameter has to be one of %s!" % ", ".join(FORMAT_DELIMITERS))
+		if kwargs.get("compression", "auto").lower() not in COMPRESSIONS:
+			raise ValidationError(self, ["compression"], "Parameter has to be one of %s!" % ", ".join(COMPRESSIONS))
+		if kwargs.get("copyMode", "copy").lower() not in COPY_MODES:
+			raise ValidationError(self, ["copyMode"], "Parameter has to be one of %s!" % ", ".join(COPY_MODES))
+		try:
+			if int(kwargs.get("parallelism", 1)) <= 0: raise ValidationError(self, ["parallelism"], "Parameter has to be positive!")
+		except ValueError:
+			raise ValidationError(self, ["parallelism"], "Parameter needs to be an integer!")
 
 		self.cc_log("INFO", "Data Store Local: finished validation")
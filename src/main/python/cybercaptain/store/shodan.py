@@ -1,20 +1,31 @@
 """
 This module contains the store shodan class.
 """
-import shodan
 import json
+import math
+import os
+import time
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from cybercaptain.store.base import store_base
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.utils.helpers import str2bool, append_str_to_filename
 from cybercaptain.utils.jsonFileHandler import json_file_writer
 from cybercaptain.utils.kvStore import kv_store
+from cybercaptain.utils.rateLimiter import token_bucket
+from cybercaptain.utils.lazyImport import lazy_import
+shodan = lazy_import("shodan")
+
+DEFAULT_QUERY_RATE = 1 # Lookups per second, the query rate limit of the shodan api
+DEFAULT_CONCURRENCY = 4 # Lookups waiting for a response at the same time
+DEFAULT_CHECKPOINT_PAGES = 10 # Search result pages downloaded between two checkpoints
+SEARCH_PAGE_SIZE = 100 # Banners per search result page of the shodan api
 
 
 class store_shodan(store_base):
 	"""
 	The shodan module ensures a correct implementation of the shodan.io api interface and makes it easy to download shodan datasets.
-	Shodan module supports two lookup types: ip_lookup & search_query.
+	Shodan module supports three lookup types: ip_lookup, bulk_ip_lookup & search_query.
 
 	More information can be found on: http://shodan.readthedocs.io/en/latest/api.html
 
@@ -28,7 +39,7 @@ class store_shodan(store_base):
 		apiKey : str
 			Define the API key received from shodan which is used to access the data via API.
 		type : str
-			Define the wanted lookup type [ip_lookup|search_query].
+			Define the wanted lookup type [ip_lookup|bulk_ip_lookup|search_query].
 		minify : bool
 			True to only return the list of ports and the general host information, no banners.
 	**Script Attributes [ip_lookup]**:
@@ -44,6 +55,17 @@ class store_shodan(store_base):
 			Define if the run should be checked for missing datasets happened between last scan and new scan which have not been processed yet.
 		getAllMissingDatasets : bool
 			Define if the run should get all missing datasets from the beginning which have not been processed yet.
+	**Script Attributes [bulk_ip_lookup]**:
+		targets : list
+			Define the hosts to lookup as 'IP:PORT' (E.g. '1.1.1.1:80, 8.8.8.8:53').
+		targetsFile : str
+			Define a file with one 'IP:PORT' per line instead of or in addition to targets. Lines starting with '#' are ignored.
+		queryRate : float
+			Define the maximum lookups per second according to the query rate of the shodan account (Default: 1).
+		concurrency : int
+			Define the amount of lookups running at the same time (Default: 4).
+		retries : int
+			Define the amount of retries of a lookup in case of a timeout or the rate limit (Default: 5).
 	**Script Attributes [search_query]**:
 		query : str
 			Define the shodan search query according to the shodan docs.
@@ -51,6 +73,9 @@ class store_shodan(store_base):
 			Define the amount of wanted results (Important to save shodan account credits).
 		retries : int
 			Define the amount of retries in case of a timeout.
+		checkpointPages : int
+			Define after how many result pages the download position is saved (Default: 10).
+			An aborted search query resumes from the last checkpoint with the next run instead of downloading all pages again.
 	"""
 	def __init__(self, **kwargs):
 		kwargs["src"] = "." # src-less module
@@ -68,14 +93,28 @@ class store_shodan(store_base):
 		self.get_by_dataset_ts = kwargs.get("getByDatasetTs")
 		self.get_missing_sets = str2bool(kwargs.get("getMissingDatasets")) # Inject additional paths
 		self.get_all_missing_sets = str2bool(kwargs.get("getAllMissingDatasets"))
+		# bulk_ip_lookup
+		self.targets = kwargs.get("targets")
+		self.targets_file = kwargs.get("targetsFile")
+		self.query_rate = float(kwargs.get("queryRate", DEFAULT_QUERY_RATE))
+		self.concurrency = int(kwargs.get("concurrency", DEFAULT_CONCURRENCY))
 		# search_query
 		self.query = kwargs.get("query")
 		self.limit = int(kwargs.get("limit","1"))
 		self.retries = int(kwargs.get("retries","5"))
+		self.checkpoint_pages = int(kwargs.get("checkpointPages", DEFAULT_CHECKPOINT_PAGES))
 
 		# KV-Store Init
 		self.kv_store = kv_store(self.projectRoot, self.projectName)
 
+		# API responses shared with the injected tasks
+		self.api_cache = self.get_api_cache("shodan", kwargs.get("apiCacheTtl"))
+
+		# Prefetching of the injected missing datasets
+		self.prefetch_datasets = kwargs.get("prefetchDatasets", 0)
+		self.prefetch_rate = kwargs.get("prefetchRate")
+		self.max_missing_sets = kwargs.get("maxMissingDatasets")
+
 		# Save current configs - Used for missingDatasets
 		self.kwargs = kwargs
 
@@ -90,10 +129,12 @@ class store_shodan(store_base):
 		try: 
 			if self.type == "ip_lookup":
 				return self.run_shodan_ip_lookup()
+			elif self.type == "bulk_ip_lookup":
+				return self.run_shodan_bulk_ip_lookup()
 			elif self.type == "search_query":
 				return self.run_shodan_search_query()
 			else:
-				self.cc_log("ERROR", "Failed to run shodan module as no valid type was found (ip_lookup, search_query)!")
+				self.cc_log("ERROR", "Failed to run shodan module as no valid type was found (ip_lookup, bulk_ip_lookup, search_query)!")
 				self.cc_log("INFO", "Data Store Shodan: Finished Run With Error")
 				return False
 		except Exception as e:
@@ -140,8 +181,7 @@ class store_shodan(store_base):
 			``None`` if the port is not available in the scans.
 		"""
 		self.cc_log("INFO", "Get shodan ip lookup data by latest")
-		s_api = shodan.Shodan(self.apiKey)
-		host_info = s_api.host(self.ip, minify=self.minify)
+		host_info = self.shodan_api_host()
 
 		if not self.is_port_in_available_ports(host_info): return None
 
@@ -166,8 +206,7 @@ class store_shodan(store_base):
 			``None`` if the port is not available in the scans or not data with the TS was found.
 		"""
 		self.cc_log("INFO", "Get shodan ip lookup data by dataset timestamp %s" % (dataset_ts))
-		s_api = shodan.Shodan(self.apiKey)
-		host_info = s_api.host(self.ip, history=True, minify=self.minify)
+		host_info = self.shodan_api_host(history=True)
 
 		if not self.is_port_in_available_ports(host_info): return None
 
@@ -179,6 +218,138 @@ class store_shodan(store_base):
 		self.cc_log("ERROR", "No shodan data was found for the available port %s with timestamp %s" % (self.port, dataset_ts))
 		return None
 
+	def shodan_api_host(self, history=False, ip=None):
+		"""
+		Call the host method on the api for the configured ip.
+		The response is cached, the injected tasks reuse the host history requested by the injecting module.
+
+		**Parameters**:
+			history : bool
+				(Optional) True to get the full history of the host.
+			ip : str
+				(Optional) another ip than the configured one (bulk_ip_lookup).
+
+		**Returns**:
+			Shodan API response.
+		"""
+		ip = ip or self.ip
+		request = ("host", ip, history, self.minify, self.apiKey)
+		return self.api_cache.call(request, lambda: shodan.Shodan(self.apiKey).host(ip, history=history, minify=self.minify))
+
+	def run_shodan_bulk_ip_lookup(self):
+		"""
+		Runs the shodan api ip lookup for all the bulk targets concurrently and writes the latest banner per target to the target file.
+		The lookups are started at most with the ``queryRate`` per second, the banners are written as soon as their lookup finished.
+		The processed timestamps of all targets are updated in one transaction at the end.
+
+		**Returns**:
+			``True`` if at least one new banner was written.
+			``False`` if no new banner was found or all lookups failed.
+		"""
+		bulk_targets = self.get_bulk_targets()
+		self.cc_log("INFO", "Data Store Shodan: Started Bulk IP Lookup For %d Targets" % len(bulk_targets))
+
+		bucket = token_bucket(self.query_rate)
+		processed = {} # "IP:PORT" -> newest processed timestamp
+		written = failed = 0
+		json_fw = json_file_writer(self.target)
+		try:
+			with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="cc-shodan") as executor:
+				lookups = {executor.submit(self.lookup_bulk_target, ip, port, bucket): (ip, port) for ip, port in bulk_targets}
+				for lookup in as_completed(lookups):
+					ip, port = lookups[lookup]
+					try:
+						banner = lookup.result()
+					except Exception as e:
+						self.cc_log("WARNING", "Shodan lookup for %s:%s failed (%s)" % (ip, port, e))
+						failed += 1
+						continue
+
+					if not banner: continue
+					if self.kv_store.in_set("processed_banners", self.bulk_banner_id(ip, port, banner["timestamp"]), section=self.moduleName):
+						self.cc_log("DEBUG", "Banner of %s:%s with TS %s has been already processed" % (ip, port, banner["timestamp"]))
+						continue
+
+					json_fw.writeRecord(banner)
+					processed["%s:%s" % (ip, port)] = banner["timestamp"]
+					written += 1
+		except BaseException:
+			json_fw.abort()
+			raise
+		json_fw.close()
+
+		# Update the store in one batch instead of a transaction per target
+		with self.kv_store.transaction():
+			for host, data_ts in processed.items():
+				ip, port = host.rsplit(":", 1)
+				self.kv_store.add_to_set("processed_banners", self.bulk_banner_id(ip, port, data_ts), section=self.moduleName)
+				self.kv_store.put(host, data_ts, section=self.moduleName)
+
+		self.cc_log("INFO", "Data Store Shodan: Bulk IP Lookup wrote %d new banner(s), %d lookup(s) failed" % (written, failed))
+		return written > 0
+
+	def lookup_bulk_target(self, ip, port, bucket):
+		"""
+		Looks up the latest banner of a single bulk target. Runs in the threads of the bulk ip lookup.
+
+		**Parameters**:
+			ip : str
+				the ip of the target.
+			port : int
+				the port of the target.
+			bucket : token_bucket
+				limits the rate of the lookups to the query rate of the account.
+
+		**Returns**:
+			``{DATASET}`` the latest banner for the port.
+			``None`` if the port is not available in the scans.
+		"""
+		for attempt in range(self.retries + 1):
+			bucket.acquire()
+			try:
+				host_info = self.shodan_api_host(ip=ip)
+				break
+			except shodan.APIError as e:
+				retryable = "rate limit" in str(e).lower() or "timed out" in str(e).lower()
+				if not retryable or attempt >= self.retries: raise
+				self.cc_log("DEBUG", "Retry shodan lookup for %s:%s (%s)" % (ip, port, e))
+
+		banners = [d for d in host_info.get("data", []) if d.get("port") == port and "timestamp" in d]
+		if not banners:
+			self.cc_log("INFO", "No shodan lookup data available for port %s and IP %s" % (port, ip))
+			return None
+		return max(banners, key=lambda d: datetime.strptime(d["timestamp"], "%Y-%m-%dT%H:%M:%S.%f"))
+
+	def get_bulk_targets(self):
+		"""
+		Gets the bulk targets from the targets attribute and the targets file.
+
+		**Returns**:
+			``list`` of unique (ip, port) tuples in the configured order.
+
+		**Raises**:
+			ValueError if a target is not in the form 'IP:PORT'.
+		"""
+		targets = self.targets or []
+		if isinstance(targets, str): targets = targets.split(",")
+		targets = list(targets)
+		if self.targets_file:
+			with open(self.targets_file, "r") as targets_file:
+				targets.extend(line for line in targets_file if line.strip() and not line.strip().startswith("#"))
+
+		bulk_targets = []
+		for target in targets:
+			ip, separator, port = target.strip().rpartition(":")
+			if not separator or not ip or not port.isdigit(): raise ValueError("Target '%s' is not in the form 'IP:PORT'" % target.strip())
+			bulk_targets.append((ip.strip("[]"), int(port)))
+		return list(dict.fromkeys(bulk_targets))
+
+	def bulk_banner_id(self, ip, port, data_ts):
+		"""
+		Creates the identifier of a processed bulk banner saved in the store.
+		"""
+		return "%s:%s@%s" % (ip, port, data_ts)
+
 	def process_ip_lookup_data(self, lookup_data):
 		"""
 		Writes an ip lookup dataset to the target file if not already processed and sets it as processed after.
@@ -194,26 +365,24 @@ class store_shodan(store_base):
 		data_ts = lookup_data["timestamp"]
 
 		# Check if we did process the timestamp before but with another targetname
-		processed_ts = self.kv_store.get("processed_ts", section=self.moduleName)
-		if not processed_ts: processed_ts = []
-
-		if data_ts not in processed_ts:
+		if not self.kv_store.in_set("processed_ts", data_ts, section=self.moduleName):
 			self.cc_log("INFO", 'Banner data for TS %s has not been processed yet' % (data_ts))
 
 			json_fw = json_file_writer(self.target)
 			json_fw.writeRecord(lookup_data)
 			json_fw.close()
 
-			processed_ts.append(data_ts)
-			self.kv_store.put("processed_ts", processed_ts, section=self.moduleName, force=True)
+			# Update the store in one transaction as other tasks of the project might update it concurrently
+			with self.kv_store.transaction():
+				self.kv_store.add_to_set("processed_ts", data_ts, section=self.moduleName)
 
-			# Save the newest processed timestamp to be able to tell times between last run and the current run
-			newest_processed_ts = self.kv_store.get("newest_processed_ts", section=self.moduleName)
-			if not newest_processed_ts or self.shodan_ts_is_newer(data_ts, newest_processed_ts):
-				self.kv_store.put("newest_processed_ts", data_ts, section=self.moduleName, force=True)
+				# Save the newest processed timestamp to be able to tell times between last run and the current run
+				newest_processed_ts = self.kv_store.get("newest_processed_ts", section=self.moduleName)
+				if not newest_processed_ts or self.shodan_ts_is_newer(data_ts, newest_processed_ts):
+					self.kv_store.put("newest_processed_ts", data_ts, section=self.moduleName)
 
-			# Save the target file for an explicit timestamp to be able to tell the file if it was already processed
-			self.kv_store.put(data_ts, self.target, section=self.moduleName, force=True)
+				# Save the target file for an explicit timestamp to be able to tell the file if it was already processed
+				self.kv_store.put(data_ts, self.target, section=self.moduleName)
 
 			return True
 		else:
@@ -223,7 +392,9 @@ class store_shodan(store_base):
 
 	def run_shodan_search_query(self):
 		"""
-		Runs the shodan api search query lookup.
+		Runs the shodan api search query lookup page by page.
+		The page position, banner count and file position are saved as a checkpoint in the kv store every ``checkpointPages`` pages and if the download fails.
+		A rerun of the aborted search query continues the tmp file from the checkpoint.
 
 		**Returns**:
 			``True`` if the search query lookup was successfull and the data written.
@@ -232,18 +403,36 @@ class store_shodan(store_base):
 		self.cc_log("INFO", "Data Store Shodan: Started Search Query Lookup With Query '%s'" % self.query)
 
 		s_api = shodan.Shodan(self.apiKey)
-		json_fw = json_file_writer(self.target)
-
-		counter = 0
-		for banner in s_api.search_cursor(self.query, minify=self.minify, retries=self.retries):
-			json_fw.writeRecord(banner)
-
-			counter += 1
-			self.cc_log("DEBUG", "Data amount: %s!" % (counter))
-			if counter >= self.limit:
-				break
+		page, counter, offset = self.get_search_checkpoint()
+		if page > 1: self.cc_log("INFO", "Resume search query at page %s after %s banner(s)" % (page, counter))
+		json_fw = json_file_writer(self.target, resume_at=offset)
+
+		total_pages = None
+		pages_since_checkpoint = 0
+		try:
+			while counter < self.limit and (total_pages is None or page <= total_pages):
+				results = self.shodan_api_search_page(s_api, page)
+				if results.get("total"): total_pages = int(math.ceil(results["total"] / SEARCH_PAGE_SIZE))
+
+				banners = results["matches"][:self.limit - counter]
+				if not banners: break
+				json_fw.writeRecords(banners)
+				counter += len(banners)
+				page += 1
+				self.cc_log("DEBUG", "Data amount: %s!" % (counter))
+
+				pages_since_checkpoint += 1
+				if pages_since_checkpoint >= self.checkpoint_pages:
+					self.put_search_checkpoint(page, counter, json_fw.sync())
+					pages_since_checkpoint = 0
+		except BaseException:
+			self.put_search_checkpoint(page, counter, json_fw.sync())
+			json_fw.abort()
+			self.cc_log("WARNING", "Search query aborted at page %s, the next run resumes from there" % page)
+			raise
 
 		json_fw.close()
+		self.put_search_checkpoint(None, None, None)
 		if counter > 0:
 			self.cc_log("INFO", "A total of %s banner data was downloaded!" % (counter))
 			return True
@@ -251,6 +440,53 @@ class store_shodan(store_base):
 		self.cc_log("WARNING", "No data was downloaded via search cursor lookup!")
 		return False
 
+	def shodan_api_search_page(self, s_api, page):
+		"""
+		Call the search method on the api for a single result page, retried ``retries`` times like the shodan search cursor.
+
+		**Parameters**:
+			s_api : object
+				The initialized shodan api.
+			page : int
+				The wanted result page starting at 1.
+
+		**Returns**:
+			Shodan API response with the "matches" and the "total".
+		"""
+		for tries in range(self.retries + 1):
+			try:
+				return s_api.search(self.query, page=page, minify=self.minify)
+			except Exception as e:
+				if tries >= self.retries: raise
+				self.cc_log("DEBUG", "Retry shodan search page %s (%s)" % (page, e))
+				time.sleep(tries + 1)
+
+	def get_search_checkpoint(self):
+		"""
+		Gets the checkpoint of an aborted search query with the same query and target.
+
+		**Returns**:
+			``(PAGE, COUNTER, OFFSET)`` to continue the download, ``(1, 0, 0)`` to start from the beginning.
+		"""
+		checkpoint = self.kv_store.get("search_checkpoint", section=self.moduleName)
+		if not checkpoint or checkpoint[:2] != [self.query, self.target] or not os.path.isfile("%s.tmp" % self.target):
+			return 1, 0, 0
+		return tuple(int(value) for value in checkpoint[2:])
+
+	def put_search_checkpoint(self, page, counter, offset):
+		"""
+		Saves the checkpoint of the running search query, ``None`` values clear the checkpoint.
+
+		**Parameters**:
+			page : int
+				the next page to download.
+			counter : int
+				the amount of banners written.
+			offset : int
+				the position in the tmp file after the last written banner.
+		"""
+		checkpoint = [self.query, self.target, page, counter, offset] if page else []
+		self.kv_store.put("search_checkpoint", checkpoint, section=self.moduleName, force=True)
 
 	def shodan_ts_is_newer(self, d1, d2):
 		"""
@@ -301,7 +537,7 @@ class store_shodan(store_base):
 		self.cc_log("INFO", "Data Store Shodan: Started Validation")
 		if not kwargs.get("apiKey"): raise ValidationError(self, ["apiKey"], "Parameter cannot be empty!")
 		if not kwargs.get("type"): raise ValidationError(self, ["type"], "Parameter cannot be empty!")
-		if kwargs.get("type") != "ip_lookup" and kwargs.get("type") != "search_query": raise ValidationError(self, ["type"], "Type has to be 'ip_lookup' or 'search_query'")
+		if kwargs.get("type") not in ["ip_lookup", "bulk_ip_lookup", "search_query"]: raise ValidationError(self, ["type"], "Type has to be 'ip_lookup', 'bulk_ip_lookup' or 'search_query'")
 
 
 		if kwargs.get("type") == "ip_lookup":
@@ -311,10 +547,27 @@ class store_shodan(store_base):
 			if not kwargs.get("getByLatest") and not kwargs.get("getByDatasetTs"): raise ValidationError(self, ["getByLatest","getByDatasetTs"], "One of them has to be defined!")
 			if kwargs.get("getMissingDatasets") and kwargs.get("getAllMissingDatasets"): raise ValidationError(self, ["getMissingDatasets", "getAllMissingDatasets"], "Please only use one!")
 
+		if kwargs.get("type") == "bulk_ip_lookup":
+			if not kwargs.get("targets") and not kwargs.get("targetsFile"): raise ValidationError(self, ["targets","targetsFile"], "One of them has to be defined!")
+			if kwargs.get("getMissingDatasets"): raise ValidationError(self, ["getMissingDatasets"], "Parameter only usable for type 'ip_lookup'!")
+			if kwargs.get("getAllMissingDatasets"): raise ValidationError(self, ["getAllMissingDatasets"], "Parameter only usable for type 'ip_lookup'!")
+			try:
+				if float(kwargs.get("queryRate", DEFAULT_QUERY_RATE)) <= 0: raise ValidationError(self, ["queryRate"], "Parameter has to be positive!")
+			except ValueError:
+				raise ValidationError(self, ["queryRate"], "Parameter needs to be a number!")
+			try:
+				if int(kwargs.get("concurrency", DEFAULT_CONCURRENCY)) <= 0: raise ValidationError(self, ["concurrency"], "Parameter has to be positive!")
+			except ValueError:
+				raise ValidationError(self, ["concurrency"], "Parameter needs to be an integer!")
+
 		if kwargs.get("type") == "search_query":
 			if not kwargs.get("query"): raise ValidationError(self, ["query"], "Parameter cannot be empty!")
 			if not kwargs.get("limit"): raise ValidationError(self, ["limit"], "Parameter cannot be empty!")
 			if not kwargs.get("retries"): raise ValidationError(self, ["retries"], "Parameter cannot be empty!")
+			try:
+				if int(kwargs.get("checkpointPages", DEFAULT_CHECKPOINT_PAGES)) <= 0: raise ValidationError(self, ["checkpointPages"], "Parameter has to be positive!")
+			except ValueError:
+				raise ValidationError(self, ["checkpointPages"], "Parameter needs to be an integer!")
 			if kwargs.get("getMissingDatasets"): raise ValidationError(self, ["getMissingDatasets"], "Parameter only usable for type 'ip_lookup'!")
 			if kwargs.get("getAllMissingDatasets"): raise ValidationError(self, ["getAllMissingDatasets"], "Parameter only usable for type 'ip_lookup'!")
 
@@ -338,14 +591,12 @@ class store_shodan(store_base):
 			mode = "GET ALL MISSING DATASETS" if self.get_all_missing_sets else "GET MISSING DATASETS BETWEEN LAST RUN AND NEWEST"
 			self.cc_log("INFO", "Data Store Shodan: Looking for missing datasets for %s and port %s in mode [%s]" % (self.ip, self.port, mode))
 
-			s_api = shodan.Shodan(self.apiKey)
-			host_info = s_api.host(self.ip, history=True, minify=self.minify)
+			host_info = self.shodan_api_host(history=True)
 
 			if not self.is_port_in_available_ports(host_info): return False
 
 			newest_processed_ts = self.kv_store.get("newest_processed_ts", section=self.moduleName)
-			processed_ts = self.kv_store.get("processed_ts", section=self.moduleName)
-			if not processed_ts: processed_ts = []
+			processed_ts = self.kv_store.get_set("processed_ts", section=self.moduleName)
 			
 			additional_tasks = []
 			for hi in host_info["data"]:
@@ -375,6 +626,23 @@ class store_shodan(store_base):
 				if self.shodan_ts_is_newer(additional_tasks[0]["attributes"]["getByDatasetTs"], additional_tasks[-1]["attributes"]["getByDatasetTs"]):
 					additional_tasks = list(reversed(additional_tasks))
 
+			# Limit the injected datasets per run (API credits) - the oldest are processed first, the rest by the next run
+			if self.max_missing_sets and len(additional_tasks) > self.max_missing_sets:
+				self.cc_log("INFO", "Limit the additional datasets to %d of %d (maxMissingDatasets) - the rest follows with the next run" % (self.max_missing_sets, len(additional_tasks)))
+				additional_tasks = additional_tasks[:self.max_missing_sets]
+
 			return additional_tasks
 
 		return False
+
+	def prefetch_additional_tasks(self):
+		"""
+		Overwrite base method 'prefetch_additional_tasks'.
+
+		The injected missing datasets are fetched in the background with ``prefetchDatasets`` in parallel and at most ``prefetchRate`` per minute.
+
+		**Returns**:
+			``dict`` with the parallelism and rate if prefetchDatasets is set, otherwise ``False``.
+		"""
+		if not self.prefetch_datasets: return False
+		return {"parallelism": self.prefetch_datasets, "rate": self.prefetch_rate}
@@ -0,0 +1,235 @@
+"""
+This util module caches the per file aggregates of the bar and line visualizations.
+A plot over many group files (E.g. one per day) only decodes the files which are new or changed since the last plot,
+the summaries of the other files are taken from memory or from disk.
+The on-disk cache is pruned when summaries are written, summaries not used for ``MAX_AGE_DAYS`` are removed and
+the least recently used ones if the cache is larger than ``MAX_CACHE_SIZE``.
+"""
+import os
+import json
+import heapq
+import hashlib
+import logging
+import time
+import threading
+from cybercaptain.utils.columnarFileHandler import record_file_reader
+from cybercaptain.utils.attributePath import compile_attribute_path
+from cybercaptain.utils.lazyImport import lazy_import
+np = lazy_import("numpy")
+
+DEFAULT_CACHE_DIR = ".cc_aggregate_cache" # Folder in the project root for the on-disk cache
+CACHE_VERSION = 1 # Increase if the summaries change, older cache files are ignored then
+MAX_AGE_DAYS = 30 # Summaries not used for this many days are removed from the disk
+MAX_CACHE_SIZE = 256 * 1024 * 1024 # Bytes, the least recently used summaries are removed above it
+
+_memory = {} # Cache key -> summary, shared by all visualization tasks of the process
+_memory_lock = threading.Lock()
+
+class file_aggregate_cache():
+    """
+    The file aggregate cache class returns the summary of a file: its group names with their values in the order of the file.
+    Summaries are keyed by the file path, modification time and size and the attributes they were read with.
+
+    **Parameters**:
+        cache_dir : str
+            (Optional) the directory to keep the summaries on disk. Only kept in memory if not set.
+        max_age_days : int
+            (Optional) the days after which unused summaries are removed from the disk. (Default 30)
+        max_size : int
+            (Optional) the size in bytes above which the least recently used summaries are removed from the disk. (Default 256 MiB)
+    """
+    def __init__(self, cache_dir=None, max_age_days=MAX_AGE_DAYS, max_size=MAX_CACHE_SIZE):
+        self.logger = logging.getLogger("CyberCaptain")
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.max_size = max_size
+        self.pruned = False # The disk cache is pruned once, on the first write
+
+    @staticmethod
+    def clear_memory():
+        """
+        Clears the summaries cached in memory.
+        """
+        with _memory_lock:
+            _memory.clear()
+
+    def make_key(self, file_name, data_attribute, group_name_attribute):
+        """
+        Creates the cache key of a file summary.
+
+        **Returns**:
+            ``str`` the SHA-256 hex digest of the file identity and the attributes.
+        """
+        stat = os.stat(file_name)
+        identity = [os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size, data_attribute, group_name_attribute, CACHE_VERSION]
+        return hashlib.sha256(json.dumps(identity).encode("utf-8")).hexdigest()
+
+    def summarize(self, file_name, data_attribute, group_name_attribute):
+        """
+        Returns the cached summary of the file or reads the file and caches its summary.
+
+        **Parameters**:
+            file_name : str
+                The path to the file.
+            data_attribute : str
+                The dotted attribute of the values.
+            group_name_attribute : str
+                The dotted attribute of the group names.
+
+        **Returns**:
+            ``list`` of ``[group name, value]`` pairs, values of the same group in a file are summed.
+        """
+        key = self.make_key(file_name, data_attribute, group_name_attribute)
+        with _memory_lock:
+            summary = _memory.get(key)
+        if summary is not None: return summary
+
+        cache_file = os.path.join(self.cache_dir, key + ".json") if self.cache_dir else None
+        if cache_file:
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    summary = json.load(f)
+                os.utime(cache_file) # Marks the summary as used for the pruning
+                self.logger.debug("Aggregate cache hit for %s" % file_name)
+            except (OSError, ValueError):
+                summary = None
+
+        if summary is None:
+            summary = self.read_summary(file_name, data_attribute, group_name_attribute)
+            if cache_file: self.write_summary(cache_file, summary)
+
+        with _memory_lock:
+            _memory[key] = summary
+        return summary
+
+    def read_summary(self, file_name, data_attribute, group_name_attribute):
+        """
+        Reads the group names and values of a file.
+
+        **Returns**:
+            ``list`` of ``[group name, value]`` pairs.
+        """
+        data_attribute_path = compile_attribute_path(data_attribute)
+        group_name_path = compile_attribute_path(group_name_attribute)
+        values = {}
+        json_fr = record_file_reader(file_name, columns=[data_attribute, group_name_attribute])
+        try:
+            while not json_fr.isEOF():
+                json_data = json_fr.readRecord()
+                group_name = group_name_path(json_data)
+                value = data_attribute_path(json_data)
+                values[group_name] = values[group_name] + value if group_name in values else value
+        finally:
+            json_fr.close()
+        return [[group_name, value] for group_name, value in values.items()]
+
+    def write_summary(self, cache_file, summary):
+        """
+        Writes a summary to the disk cache, unserializable summaries are only kept in memory.
+        """
+        tmp_file = "%s.%d.tmp" % (cache_file, threading.get_ident())
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(summary, f)
+            os.replace(tmp_file, cache_file)
+        except (OSError, TypeError, ValueError) as e:
+            self.logger.warning("Aggregate cache could not write %s (%s)" % (cache_file, e))
+            if os.path.exists(tmp_file): os.remove(tmp_file)
+        if not self.pruned:
+            self.pruned = True
+            self.prune()
+
+    def prune(self):
+        """
+        Removes the summaries from the disk cache which were not used for ``max_age_days``
+        and the least recently used ones while the cache is larger than ``max_size``.
+
+        **Returns**:
+            ``int`` the amount of removed summaries.
+        """
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".json") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return 0
+
+        entries.sort() # Least recently used first
+        min_mtime = time.time() - self.max_age_days * 24 * 60 * 60
+        size = sum(entry_size for _, entry_size, _ in entries)
+        removed = 0
+        for mtime, entry_size, path in entries:
+            if mtime >= min_mtime and size <= self.max_size: break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            removed += 1
+        if removed: self.logger.info("Aggregate cache removed %i unused summaries from %s" % (removed, self.cache_dir))
+        return removed
+
+def assemble_matrix(summaries, threshold=None):
+    """
+    Assembles the file summaries into a groups x files matrix.
+
+    **Parameters**:
+        summaries : list
+            the summaries of the files in the plot order.
+        threshold : int
+            (Optional) values below the threshold are left out.
+
+    **Returns**:
+        ``group_names, matrix`` the group names in the order of their first occurrence and a NumPy matrix
+        with a row per group and a column per file. Missing values are 0.
+    """
+    group_rows = {}
+    cells = []
+    for column, summary in enumerate(summaries):
+        for group_name, value in summary:
+            if threshold and int(value) < int(threshold): continue # Skip this value as its < threshold
+            row = group_rows.get(group_name)
+            if row is None: row = group_rows[group_name] = len(group_rows)
+            cells.append((row, column, value))
+
+    values = np.array([cell[2] for cell in cells]) if cells else np.array([], dtype=int)
+    if values.dtype.kind not in "biuf": values = values.astype(object) # Keep non numeric values as they are
+    matrix = np.zeros((len(group_rows), len(summaries)), dtype=values.dtype if values.dtype.kind != "b" else int)
+    if cells:
+        rows, columns = zip(*((cell[0], cell[1]) for cell in cells))
+        matrix[list(rows), list(columns)] = values
+    return list(group_rows), matrix
+
+def select_top_groups(group_names, matrix, top_groups=None, others_name=None):
+    """
+    Keeps the groups with the largest sums over all files, so the plot cost does not grow with the amount of groups.
+    The groups are ranked in a single pass with a heap of the size ``top_groups``.
+
+    **Parameters**:
+        group_names : list
+            the group names of the matrix rows.
+        matrix : ndarray
+            the groups x files matrix of ``assemble_matrix``.
+        top_groups : int
+            (Optional) the amount of groups to keep, all groups are kept if not set.
+        others_name : str
+            (Optional) the name of an added group with the summed values of the left out groups, left out if not set.
+
+    **Returns**:
+        ``group_names, matrix`` the kept groups in their previous order and their rows, followed by the others group.
+    """
+    if not top_groups or len(group_names) <= int(top_groups): return group_names, matrix
+    totals = matrix.sum(axis=1)
+    keep = sorted(heapq.nlargest(int(top_groups), range(len(group_names)), key=totals.__getitem__))
+    kept_names = [group_names[row] for row in keep]
+    kept_matrix = matrix[keep]
+    if others_name is not None:
+        left_out = np.ones(len(group_names), dtype=bool)
+        left_out[keep] = False
+        kept_names.append(others_name)
+        kept_matrix = np.vstack([kept_matrix, matrix[left_out].sum(axis=0)])
+    return kept_names, kept_matrix
@@ -0,0 +1,160 @@
+"""
+This util module caches the responses of external APIs (E.g. the shodan host history or the censys series) shared by all module instances of a run.
+The injected tasks of a store module request the same metadata as the module which injected them, with the cache the API is only called once.
+Responses can additionally be kept on disk for a time to live to share them between runs.
+"""
+import logging
+import os
+import json
+import time
+import hashlib
+import threading
+
+DEFAULT_CACHE_DIR = ".cc_api_cache" # Folder in the project root for the on-disk cache
+
+_memory = {} # Cache key -> (created, response), shared by all instances of the run
+_memory_lock = threading.Lock()
+_key_locks = {} # Cache key -> lock, so concurrent callers of the same request wait for the first one
+
+class api_cache():
+    """
+    The api cache class returns the cached response of an API call or calls the API and caches its response.
+    Responses are kept in memory for the current run. If a ``ttl`` and a ``cache_dir`` are given, responses are also written to disk
+    and reused by later runs until they are older than the ``ttl``.
+
+    **Parameters**:
+        namespace : str
+            The name of the API (E.g. 'shodan'), part of the cache key.
+        ttl : int
+            (Optional) seconds a cached response is valid. ``None`` keeps the responses for the whole run, ``0`` disables the cache.
+        cache_dir : str
+            (Optional) the directory to keep the responses on disk, only used with a ``ttl``.
+    """
+    def __init__(self, namespace, ttl=None, cache_dir=None):
+        self.logger = logging.getLogger("CyberCaptain")
+        self.namespace = namespace
+        self.ttl = ttl
+        self.cache_dir = cache_dir if ttl else None
+
+    @staticmethod
+    def clear_memory():
+        """
+        Clears the responses cached in memory, E.g. at the start of a new run.
+        """
+        with _memory_lock:
+            _memory.clear()
+            _key_locks.clear()
+
+    def enabled(self):
+        """
+        Checks whether the cache is used.
+
+        **Returns**:
+            ``False`` if the cache was disabled with a ``ttl`` of 0.
+        """
+        return self.ttl != 0
+
+    def make_key(self, request):
+        """
+        Creates the cache key of a request.
+
+        **Parameters**:
+            request : tuple
+                JSON serializable values which identify the request (E.g. the method, its arguments and the account).
+
+        **Returns**:
+            ``str`` the SHA-256 hex digest of the namespace and the request, so no credentials end up in file names.
+        """
+        return hashlib.sha256(json.dumps([self.namespace, list(request)], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def is_fresh(self, created):
+        """
+        Checks whether a response cached at the given time is still valid.
+        """
+        return not self.ttl or time.time() - created <= self.ttl
+
+    def get(self, key):
+        """
+        Reads a cached response from memory or from disk.
+
+        **Parameters**:
+            key : str
+                The cache key created by ``make_key``.
+
+        **Returns**:
+            ``(True, RESPONSE)`` if a valid response is cached, ``(False, None)`` otherwise.
+        """
+        with _memory_lock:
+            entry = _memory.get(key)
+        if entry and self.is_fresh(entry[0]): return True, entry[1]
+
+        if self.cache_dir:
+            try:
+                with open(os.path.join(self.cache_dir, key + ".json"), "r", encoding="utf-8") as cache_file:
+                    entry = json.load(cache_file)
+            except (OSError, ValueError):
+                return False, None
+            if self.is_fresh(entry["created"]):
+                with _memory_lock:
+                    _memory[key] = (entry["created"], entry["response"])
+                return True, entry["response"]
+
+        return False, None
+
+    def put(self, key, response):
+        """
+        Caches a response in memory and on disk if a ``cache_dir`` is set.
+
+        **Parameters**:
+            key : str
+                The cache key created by ``make_key``.
+            response : obj
+                The JSON serializable API response.
+        """
+        created = time.time()
+        with _memory_lock:
+            _memory[key] = (created, response)
+
+        if self.cache_dir:
+            if not os.path.exists(self.cache_dir): os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, key + ".json")
+            tmp_path = "%s.%d.tmp" % (path, threading.get_ident())
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as cache_file:
+                    json.dump({"created": created, "response": response}, cache_file)
+                os.replace(tmp_path, path)
+            except (OSError, TypeError, ValueError) as e:
+                self.logger.warning("API cache could not write the response to disk (%s)" % e)
+                if os.path.exists(tmp_path): os.remove(tmp_path)
+
+    def call(self, request, api_call, cache_if=None):
+        """
+        Returns the cached response of the request or calls the API and caches the response.
+        Concurrent callers of the same request wait for the first call instead of calling the API again.
+
+        **Parameters**:
+            request : tuple
+                JSON serializable values which identify the request.
+            api_call : function
+                Calls the API and returns the response.
+            cache_if : function
+                (Optional) gets the response and returns ``False`` if it should not be cached (E.g. error responses).
+
+        **Returns**:
+            The cached or the new API response.
+        """
+        if not self.enabled(): return api_call()
+
+        key = self.make_key(request)
+        with _memory_lock:
+            key_lock = _key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            hit, response = self.get(key)
+            if hit:
+                self.logger.debug("API cache hit for %s request %s" % (self.namespace, request[0]))
+                return response
+
+            response = api_call()
+            if cache_if is None or cache_if(response): self.put(key, response)
+            return response
@@ -0,0 +1,82 @@
+"""
+This util module compiles the dotted attribute paths (E.g. 'location.country_code') used in the script configs into reusable getters.
+The path is split once per module instead of once per record.
+"""
+from functools import lru_cache
+
+_NO_DEFAULT = object()
+
+class attribute_path():
+    """
+    The attribute path class holds a precompiled dotted attribute path and reads its value from nested records.
+    A path step which is an integer is used as an index if the current value is a list (E.g. 'hostnames.0').
+
+    **Parameters**:
+        attribute : str
+            The dotted attribute path.
+    """
+    def __init__(self, attribute):
+        self.attribute = attribute
+        self.steps = tuple((key, int(key) if key.lstrip('-').isdigit() else None) for key in attribute.split('.'))
+
+    def get(self, data, default=_NO_DEFAULT):
+        """
+        Reads the value of the attribute path from the given record.
+
+        **Parameters**:
+            data : dict
+                The record to read the value from.
+            default : obj
+                (Optional) the value to return if the path does not exist in the record.
+
+        **Returns**:
+            The value found at the attribute path or the ``default`` if the path is missing.
+
+        **Raises**:
+            KeyError if the path is missing and no ``default`` is given.
+        """
+        try:
+            for key, index in self.steps:
+                if index is not None and isinstance(data, list):
+                    data = data[index]
+                else:
+                    data = data[key]
+            return data
+        except (KeyError, IndexError, TypeError):
+            if default is _NO_DEFAULT:
+                raise KeyError("Attribute %s not existing" % self.attribute)
+            return default
+
+    def __call__(self, data, default=_NO_DEFAULT):
+        return self.get(data, default)
+
+    def __repr__(self):
+        return "attribute_path(%r)" % self.attribute
+
+@lru_cache(maxsize=None)
+def compile_attribute_path(attribute):
+    """
+    Returns the compiled ``attribute_path`` for the given dotted attribute. Compiled paths are shared between all modules.
+
+    **Parameters**:
+        attribute : str
+            The dotted attribute path.
+
+    **Returns**:
+        ``attribute_path`` which can be called with a record to get its value.
+    """
+    return attribute_path(attribute)
+
+def as_attribute_path(attribute):
+    """
+    Returns the given attribute as an ``attribute_path``. Already compiled paths are returned as they are,
+    so modules can compile their paths once per task and pass them to the shared utils.
+
+    **Parameters**:
+        attribute : str or attribute_path
+            The dotted attribute path or its compiled ``attribute_path``.
+
+    **Returns**:
+        ``attribute_path`` which can be called with a record to get its value.
+    """
+    return attribute if isinstance(attribute, attribute_path) else compile_attribute_path(attribute)
@@ -0,0 +1,343 @@
+"""
+This util module handles the columnar files for the CyberCaptain modules, an alternative intermediate format to the JSON datasets newline separated files.
+The datasets are split into their nested attributes which are saved column by column in row groups, so a module can read just the attributes it needs.
+Modules open their files with ``record_file_reader`` and ``record_file_writer`` which select the format by the file content or the target extension.
+Built on the standard library only (json, zlib, struct) to not introduce more dependencies.
+"""
+import os
+import json
+import zlib
+import struct
+import shutil
+import logging
+from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.exceptions import LinePassedError, LineNotFoundError
+
+COLUMNAR_EXTENSION = ".cccol" # Targets with this extension are written in the columnar format
+COLUMNAR_MAGIC = b"CCCOL1\n"
+FOOTER_STRUCT = struct.Struct("<Q") # Length of the footer in bytes
+DEFAULT_ROW_GROUP_SIZE = 10000 # Datasets per row group
+COMPRESSION_LEVEL = 1 # zlib level of the column chunks, favours speed
+_EOF = object()
+
+def is_columnar_file(file_name):
+    """
+    Checks whether the given file is a columnar file.
+
+    **Parameters**:
+        file_name : str
+            The path to the file.
+
+    **Returns**:
+        ``True`` if the file starts with the columnar file header.
+    """
+    try:
+        with open(file_name, "rb") as f:
+            return f.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC
+    except OSError:
+        return False
+
+def record_file_reader(file_name, columns=None, where=None):
+    """
+    Opens the matching reader for a JSON datasets newline separated or a columnar file.
+
+    **Parameters**:
+        file_name : str
+            The path to the file.
+        columns : list
+            (Optional) the dotted attribute paths the module needs, other attributes are not read or decoded.
+        where : tuple
+            (Optional) ``(columns, predicate)`` to only return the datasets the predicate returns ``True`` for.
+
+    **Returns**:
+        ``columnar_file_reader`` or ``json_file_reader``.
+    """
+    if is_columnar_file(file_name): return columnar_file_reader(file_name, columns=columns, where=where)
+    return json_file_reader(file_name, columns=columns, where=where)
+
+def record_file_writer(file_name):
+    """
+    Opens the matching writer for the target, the columnar format is used for targets with the ``.cccol`` extension.
+
+    **Parameters**:
+        file_name : str
+            The path to the target.
+
+    **Returns**:
+        ``columnar_file_writer`` or ``json_file_writer``.
+    """
+    if file_name.lower().endswith(COLUMNAR_EXTENSION): return columnar_file_writer(file_name)
+    return json_file_writer(file_name)
+
+def flatten_record(record, prefix=()):
+    """
+    Splits a dataset into its leaf attributes. Lists and empty dicts are kept as values.
+
+    **Parameters**:
+        record : obj
+            The dataset.
+
+    **Returns**:
+        Generator of (path tuple, value).
+    """
+    if isinstance(record, dict) and record:
+        for key, value in record.items():
+            yield from flatten_record(value, prefix + (key,))
+    else:
+        yield prefix, record
+
+def column_matches(column, wanted):
+    """
+    Checks whether a column is needed for one of the wanted attribute paths.
+    A column is needed if it is part of a wanted attribute or a wanted attribute is part of the column (E.g. an index of a list).
+    """
+    for steps in wanted:
+        length = min(len(steps), len(column))
+        if column[:length] == steps[:length]: return True
+    return False
+
+class columnar_file_writer():
+    """
+    The columnar writer class collects the datasets into row groups and writes each attribute of a row group as a compressed column chunk.
+    It also handles the tmp files, to ensure that only complete data sets are passed on.
+
+    **Parameters**:
+        file_name : str
+            The file location and name relative from the call location.
+        row_group_size : int
+            (Optional) the amount of datasets per row group.
+    """
+    def __init__(self, file_name, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        self.file_name = file_name
+        self.row_group_size = row_group_size
+        self.logger = logging.getLogger("CyberCaptain")
+        self.logger.debug("Opening columnar file %s", file_name)
+        self.file_pointer = open("%s.tmp" % (file_name), "wb")
+        self.file_pointer.write(COLUMNAR_MAGIC)
+        self.columns = {} # path tuple -> column id
+        self.row_groups = []
+        self.num_rows = 0
+        self._reset_row_group()
+
+    def _reset_row_group(self):
+        self._chunks = {} # column id -> (row indexes, values)
+        self._rows = 0
+
+    def writeRecord(self, json_line):
+        """
+        Writes a json record to the file.
+
+        **Parameters**:
+            json_line : dict
+        """
+        for path, value in flatten_record(json_line):
+            column_id = self.columns.get(path)
+            if column_id is None: column_id = self.columns.setdefault(path, len(self.columns))
+            chunk = self._chunks.get(column_id)
+            if chunk is None: chunk = self._chunks[column_id] = ([], [])
+            chunk[0].append(self._rows)
+            chunk[1].append(value)
+        self._rows += 1
+        if self._rows >= self.row_group_size: self.flush()
+
+    def writeRecords(self, json_lines):
+        """
+        Writes a batch of json records to the file.
+
+        **Parameters**:
+            json_lines : list
+                the records to write.
+        """
+        for json_line in json_lines:
+            self.writeRecord(json_line)
+
+    def flush(self):
+        """
+        Writes the collected datasets as a row group.
+        """
+        if not self._rows: return
+        chunks = {}
+        for column_id, (rows, values) in self._chunks.items():
+            present = None if len(rows) == self._rows else rows # Most columns exist in every dataset
+            data = zlib.compress(json.dumps([present, values]).encode("utf-8"), COMPRESSION_LEVEL)
+            chunks[str(column_id)] = [self.file_pointer.tell(), len(data)]
+            self.file_pointer.write(data)
+        self.row_groups.append({"num_rows": self._rows, "chunks": chunks})
+        self.num_rows += self._rows
+        self._reset_row_group()
+
+    def close(self):
+        """
+        Writes the footer, closes the file and removes the tmp suffix.
+        """
+        self.flush()
+        columns = [list(path) for path, _ in sorted(self.columns.items(), key=lambda c: c[1])]
+        footer = json.dumps({"version": 1, "compression": "zlib", "num_rows": self.num_rows, "columns": columns, "row_groups": self.row_groups}).encode("utf-8")
+        self.file_pointer.write(footer)
+        self.file_pointer.write(FOOTER_STRUCT.pack(len(footer)))
+        self.file_pointer.write(COLUMNAR_MAGIC)
+        self.file_pointer.close()
+        shutil.move("%s.tmp" % (self.file_name), self.file_name)
+
+    def abort(self):
+        """
+        Closes the file without removing the tmp suffix.
+        """
+        self.file_pointer.close()
+
+class columnar_file_reader():
+    """
+    The columnar reader class reads the datasets of a columnar file. Only the column chunks of the wanted attributes are read and decoded.
+
+    **Parameters**:
+        file_name : str
+            The file location and name relative from the call location.
+        columns : list
+            (Optional) the dotted attribute paths to read (E.g. ['location.country_code']), all attributes if not set.
+        where : tuple
+            (Optional) ``(columns, predicate)`` to only return datasets the predicate returns ``True`` for.
+            The predicate gets the dataset with only the given columns, the other columns are read for the row groups with matches only.
+    """
+    def __init__(self, file_name, columns=None, where=None):
+        self.logger = logging.getLogger("CyberCaptain")
+        self.file_name = file_name
+        self.file_pointer = open(file_name, "rb")
+        self.logger.debug("Opening columnar file %s", file_name)
+
+        self.file_pointer.seek(-(FOOTER_STRUCT.size + len(COLUMNAR_MAGIC)), os.SEEK_END)
+        footer_length = FOOTER_STRUCT.unpack(self.file_pointer.read(FOOTER_STRUCT.size))[0]
+        self.file_pointer.seek(-(footer_length + FOOTER_STRUCT.size + len(COLUMNAR_MAGIC)), os.SEEK_END)
+        footer = json.loads(self.file_pointer.read(footer_length).decode("utf-8"))
+
+        self.num_rows = footer["num_rows"]
+        self.row_groups = footer["row_groups"]
+        self.columns = [tuple(path) for path in footer["columns"]]
+        self.wanted_columns = self.select_columns(columns)
+        self.where_columns, self.where = (self.select_columns(where[0]), where[1]) if where else (None, None)
+
+        self.read_lines = 0
+        self.filtered_rows = 0 # Datasets skipped by the where predicate
+        self._records = self._read_records()
+        self._next = next(self._records, _EOF)
+
+    def select_columns(self, columns):
+        """
+        Gets the ids of the columns needed for the given dotted attribute paths.
+
+        **Parameters**:
+            columns : list
+                the dotted attribute paths or ``None`` for all columns.
+
+        **Returns**:
+            ``list`` of column ids.
+        """
+        if columns is None: return list(range(len(self.columns)))
+        wanted = [tuple(c.split(".")) for c in columns]
+        return [i for i, path in enumerate(self.columns) if column_matches(path, wanted)]
+
+    def read_column_chunk(self, row_group, column_id):
+        """
+        Reads and decodes a column chunk of a row group.
+
+        **Returns**:
+            ``(row indexes or None, values)`` or ``None`` if the column has no values in the row group.
+        """
+        chunk = row_group["chunks"].get(str(column_id))
+        if not chunk: return None
+        self.file_pointer.seek(chunk[0])
+        return json.loads(zlib.decompress(self.file_pointer.read(chunk[1])).decode("utf-8"))
+
+    def fill_records(self, records, row_group, column_ids, rows=None):
+        """
+        Sets the values of the given columns on the datasets of a row group.
+
+        **Parameters**:
+            records : list
+                the datasets of the row group.
+            row_group : dict
+                the row group of the footer.
+            column_ids : list
+                the columns to set.
+            rows : set
+                (Optional) only set the values on these datasets.
+        """
+        for column_id in column_ids:
+            chunk = self.read_column_chunk(row_group, column_id)
+            if chunk is None: continue
+            path = self.columns[column_id]
+            present, values = chunk
+            for row, value in zip(present if present is not None else range(len(values)), values):
+                if rows is not None and row not in rows: continue
+                if not path:
+                    records[row] = value
+                    continue
+                record = records[row]
+                for key in path[:-1]:
+                    record = record.setdefault(key, {})
+                record[path[-1]] = value
+
+    def _read_records(self):
+        for row_group in self.row_groups:
+            records = [{} for _ in range(row_group["num_rows"])]
+            if self.where is None:
+                self.fill_records(records, row_group, self.wanted_columns)
+                yield from records
+                continue
+
+            self.fill_records(records, row_group, self.where_columns)
+            matches = [row for row, record in enumerate(records) if self.where(record)]
+            self.filtered_rows += len(records) - len(matches)
+            if not matches: continue
+            remaining = [c for c in self.wanted_columns if c not in self.where_columns]
+            self.fill_records(records, row_group, remaining, set(matches))
+            for row in matches: yield records[row]
+
+    def readRecord(self):
+        """
+        Reads the next dataset.
+
+        **Returns**:
+            The next dataset as a JSON object. Or null if the file has reached its end.
+        """
+        if self.isEOF():
+            self.logger.warning("EOF! Maybe check your implementation!")
+            return None
+        record = self._next
+        self._next = next(self._records, _EOF)
+        self.read_lines += 1
+        return record
+
+    def readLineRecord(self, line_number):
+        """
+        Reads the dataset with the given number, the datasets before it are skipped.
+
+        **Returns**:
+            The dataset corresponding the given number, starting with 1.
+
+        **Exceptions**:
+            * If the dataset was already read an LinePassedError will be raised.
+            * If the dataset does not exist a LineNotFoundError will be raised.
+        """
+        if self.read_lines >= line_number:
+            raise LinePassedError("Line #%i has already been read" % line_number)
+        while self.read_lines < line_number - 1 and not self.isEOF():
+            self.readRecord()
+        if self.isEOF():
+            raise LineNotFoundError("Line #%i cannot be found in %s" % (line_number, self.file_name))
+        return self.readRecord()
+
+    def isEOF(self):
+        """
+        Checks if the end of the file is reached.
+
+        **Returns**:
+            ``True`` if there are no more datasets.
+        """
+        return self._next is _EOF
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        self.file_pointer.close()
+        self.logger.info("Closed columnar file %s after reading %i datasets", self.file_name, self.read_lines)
@@ -33,6 +33,17 @@ class csv_file_writer():
         """
         self.csv_writer.writerow(csv_row)
 
+    def appendCSVFile(self, file_name):
+        """
+        Appends the rows of a CSV fragment without a header, written with the same attributes and dialect.
+
+        **Parameters**:
+            file_name : str
+                The path to the CSV fragment.
+        """
+        with open(file_name, "r") as fragment:
+            shutil.copyfileobj(fragment, self.file_pointer, 1024 * 1024)
+
     def close(self):
         """
         Closes the file and removes the tmp suffix.
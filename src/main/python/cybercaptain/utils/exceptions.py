@@ -75,3 +75,16 @@ class LineNotFoundError(Error):
     def __init__(self, message):
         super().__init__(message)
         logger.error("LineNotFoundError: %s " % (message))
+
+class ChecksumError(Error):
+    """
+    Raised when the checksum of a downloaded file does not match the expected checksum.
+
+    **Parameters**:
+        message : str
+            The message what the error was.
+    """
+
+    def __init__(self, message):
+        super().__init__(message)
+        logger.error("ChecksumError: %s " % (message))
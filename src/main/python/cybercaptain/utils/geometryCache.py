@@ -0,0 +1,115 @@
+"""
+This util module caches the parsed and preprocessed map geometries (E.g. the world GeoJSON) of the map visualizations.
+Parsing a GeoJSON file and computing the centroids of all shapes is done once per file content, the result is shared
+by all map tasks of the process and kept on disk in a pickled binary form for later runs.
+"""
+import os
+import pickle
+import hashlib
+import logging
+import threading
+from cybercaptain.utils.lazyImport import lazy_import
+gpd = lazy_import("geopandas")
+
+DEFAULT_CACHE_DIR = ".cc_map_cache" # Folder in the project root for the on-disk cache
+CACHE_VERSION = 1 # Increase if the preprocessing changes, older cache files are ignored then
+
+_memory = {} # Cache key -> preprocessed GeoDataFrame, shared by all map tasks of the process
+_file_hashes = {} # (path, mtime, size) -> SHA-256 of the file content, so unchanged files are not hashed again
+_lock = threading.Lock()
+
+def file_hash(file_name):
+    """
+    Gets the SHA-256 hex digest of a file content.
+
+    **Parameters**:
+        file_name : str
+            The path to the file.
+
+    **Returns**:
+        ``str`` the hex digest.
+    """
+    stat = os.stat(file_name)
+    key = (os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size)
+    digest = _file_hashes.get(key)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        with open(file_name, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        digest = _file_hashes[key] = sha256.hexdigest()
+    return digest
+
+def preprocess_geometry(geojson_file, simplify_tolerance=None):
+    """
+    Reads a GeoJSON file and adds the data needed by the map plots.
+
+    **Parameters**:
+        geojson_file : str
+            The path to the GeoJSON file.
+        simplify_tolerance : float
+            (Optional) the tolerance to simplify the shapes with, in the unit of the map coordinates.
+
+    **Returns**:
+        ``GeoDataFrame`` with a ``centroid`` column for the labels. The centroids are computed on the original shapes.
+    """
+    gp_map = gpd.read_file(geojson_file)
+    gp_map['centroid'] = gp_map['geometry'].centroid # Set the center value on all shapes for labels
+    if simplify_tolerance: gp_map['geometry'] = gp_map['geometry'].simplify(simplify_tolerance, preserve_topology=True)
+    return gp_map
+
+def load_geometry(geojson_file, cache_dir=None, simplify_tolerance=None):
+    """
+    Returns the preprocessed geometry of a GeoJSON file from the memory or disk cache or reads and caches it.
+
+    **Parameters**:
+        geojson_file : str
+            The path to the GeoJSON file.
+        cache_dir : str
+            (Optional) the directory to keep the preprocessed geometries on disk. Only kept in memory if not set.
+        simplify_tolerance : float
+            (Optional) the tolerance to simplify the shapes with.
+
+    **Returns**:
+        ``GeoDataFrame`` copy which can be changed by the caller (E.g. to add the plotted values).
+    """
+    logger = logging.getLogger("CyberCaptain")
+    key = "%s-%s-v%d" % (file_hash(geojson_file), simplify_tolerance or 0, CACHE_VERSION)
+
+    with _lock:
+        gp_map = _memory.get(key)
+        if gp_map is not None: return gp_map.copy()
+
+        cache_file = os.path.join(cache_dir, key + ".pickle") if cache_dir else None
+        if cache_file and os.path.isfile(cache_file):
+            try:
+                with open(cache_file, "rb") as f:
+                    gp_map = pickle.load(f)
+                logger.debug("Loaded the cached geometry of %s" % geojson_file)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+                logger.warning("Geometry cache file %s could not be read (%s)" % (cache_file, e))
+                gp_map = None
+
+        if gp_map is None:
+            gp_map = preprocess_geometry(geojson_file, simplify_tolerance)
+            if cache_file:
+                tmp_file = "%s.%d.tmp" % (cache_file, threading.get_ident())
+                try:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    with open(tmp_file, "wb") as f:
+                        pickle.dump(gp_map, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp_file, cache_file)
+                except OSError as e:
+                    logger.warning("Geometry cache could not write %s (%s)" % (cache_file, e))
+                    if os.path.exists(tmp_file): os.remove(tmp_file)
+
+        _memory[key] = gp_map
+        return gp_map.copy()
+
+def clear_memory():
+    """
+    Clears the geometries cached in memory.
+    """
+    with _lock:
+        _memory.clear()
+        _file_hashes.clear()
@@ -3,12 +3,15 @@ The helpers module contains functions we define as little helpers. These are des
 """
 import os.path
 import re
-from BTrees.OOBTree import OOBTree # pylint: disable=no-name-in-module
-from cybercaptain.utils.jsonFileHandler import json_file_reader
+import json
+from cybercaptain.utils.columnarFileHandler import record_file_reader
+from cybercaptain.utils.attributePath import as_attribute_path
 from urllib.request import urlopen
 from urllib.error import HTTPError, URLError
 from hashlib import sha1
 from pathlib import Path
+from cybercaptain.utils.lazyImport import lazy_import
+OOBTree = lazy_import("BTrees.OOBTree")
 
 def str2bool(v):
     """
@@ -111,34 +114,91 @@ def append_str_to_filename(path_or_file_name, str_to_append):
     name, ext = os.path.splitext(path_or_file_name)
     return "{name}{appended}{ext}".format(name=name, appended=str_to_append, ext=ext)
 
+# Type tags of the composite key parts, they keep keys of differently typed values apart and orderable in the B-Tree
+KEY_NONE, KEY_BOOL, KEY_NUMBER, KEY_STR, KEY_JSON = range(5)
+
+def _keyPart(value):
+    """
+    Returns the type tag and the hashable value of a single key part.
+    """
+    if value is None: return KEY_NONE, None
+    if isinstance(value, bool): return KEY_BOOL, value
+    if isinstance(value, (int, float)): return KEY_NUMBER, value
+    if isinstance(value, str): return KEY_STR, value
+    return KEY_JSON, json.dumps(value, sort_keys=True)
+
 def keyGen(attributes, data):
     """
     Traverses the data and returns the key generated based on the given attributes.
+    The key is a flat tuple holding a type tag followed by the value for every attribute (E.g. ``(KEY_STR, 'Luffy', KEY_NUMBER, 5)``).
+    Adjacent values can therefore not collide and keys of differently typed values stay comparable.
 
     **Parameters**:
         attributes : list
-            A list of attributes which define the key.
+            A list of attributes (or their compiled ``attribute_path``) which define the key.
         data : dict
             The data for which the key has to be generated for.
 
     **Returns**:
-        `str` with the concatinated attributes as a key.
+        `tuple` with the typed attribute values as a key.
         `None` if an error occured while finding the key.
     """
-    key = ""
+    key = []
     try:
         for attribute in attributes:
-            splitSet = attribute.split('.')
-            _data = data
-            for split in splitSet:
-                _data = _data[split]
-            key += str(_data)
-        return key
+            key.extend(_keyPart(as_attribute_path(attribute)(data)))
+        return tuple(key)
     except:
         pass
     return None
 
-def genBTree(src, attributes):
+def encodeKey(key):
+    """
+    Encodes a key generated by ``keyGen`` into a list of plain values so it can be written to a JSON file.
+
+    **Parameters**:
+        key : tuple
+            The key generated by ``keyGen``.
+
+    **Returns**:
+        `list` with the attribute values of the key.
+        `None` if no key was given.
+    """
+    if key is None: return None
+    return [json.loads(value) if tag == KEY_JSON else value for tag, value in zip(key[::2], key[1::2])]
+
+def decodeKey(values):
+    """
+    Decodes a list of values written by ``encodeKey`` back into the key generated by ``keyGen``.
+
+    **Parameters**:
+        values : list
+            The attribute values of the key.
+
+    **Returns**:
+        `tuple` with the typed attribute values as a key.
+        `None` if no values were given.
+    """
+    if values is None: return None
+    key = []
+    for value in values:
+        key.extend(_keyPart(value))
+    return tuple(key)
+
+def legacyKey(key):
+    """
+    Returns the concatenated string key used by previous versions for a key generated by ``keyGen``.
+
+    **Parameters**:
+        key : tuple
+            The key generated by ``keyGen``.
+
+    **Returns**:
+        `str` with the concatenated attribute values.
+    """
+    return "".join(str(value) for value in encodeKey(key))
+
+def genBTree(src, attributes, multi=False):
     """
     Generates a B-Tree from the given source file and uses the attributes to generate a key.
 
@@ -147,16 +207,28 @@ def genBTree(src, attributes):
             the path and file name to the file.
         attributes : list
             the list of attributes which define the key
+        multi : bool
+            if set to ``True`` every key holds a list with all the records sharing this key (one-to-many).
+            Otherwise only the first record of a key is kept. (Default ``False``)
 
     **Returns**:
         A complete B-Tree.
     """
-    json_fr = json_file_reader(src)
-    b_tree = OOBTree()
+    attributes = [as_attribute_path(attribute) for attribute in attributes] # Compiled once for all the records
+    json_fr = record_file_reader(src)
+    b_tree = OOBTree.OOBTree()
     while not json_fr.isEOF():
         data = json_fr.readRecord()
         key = keyGen(attributes, data)
-        if not key: continue # Key was not generated, go to next
-        b_tree.insert(key, data)
-
-    return b_tree
\ No newline at end of file
+        if key is None: continue # Key was not generated, go to next
+        if not multi:
+            b_tree.insert(key, data)
+            continue
+        records = b_tree.get(key)
+        if records is None:
+            b_tree[key] = [data]
+        else:
+            records.append(data)
+    json_fr.close()
+
+    return b_tree
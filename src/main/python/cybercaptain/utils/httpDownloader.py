@@ -0,0 +1,455 @@
+"""
+This util module downloads large files over HTTP. Files are split into byte ranges which are fetched concurrently over a pooled session.
+The progress is saved next to the target so interrupted downloads continue where they stopped.
+Alternatively the file can be streamed in order (E.g. to decompress it while downloading) without writing it to the disk.
+"""
+import base64
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cybercaptain.utils.exceptions import ChecksumError
+from cybercaptain.utils.lazyImport import lazy_import
+requests = lazy_import("requests")
+
+DEFAULT_CONNECTIONS = 4
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 60
+
+HTTP_PARTIAL_CONTENT = 206
+
+class range_downloader():
+    """
+    The range downloader fetches a file via parallel HTTP range requests and verifies its checksum.
+    If the server does not support range requests the file is downloaded over a single connection.
+
+    The download is written to ``<target>.part`` and the finished byte ranges to ``<target>.state``. If both exist from an interrupted
+    download of the same file (same url, size and ETag/Last-Modified) only the missing ranges are fetched.
+
+    **Parameters**:
+        url : str
+            The url to download from.
+        connections : int
+            (Optional) the number of concurrent connections. (Default 4)
+        part_size : int
+            (Optional) the size of a single byte range in bytes. (Default 8 MiB)
+        chunk_size : int
+            (Optional) the size of the chunks read from the response. (Default 64 KiB)
+        retries : int
+            (Optional) how many times a failed byte range is retried. (Default 3)
+        expected_sha256 : str
+            (Optional) the hex SHA-256 checksum of the file. Checksums sent by the server (``Digest``, ``Content-MD5``) are verified as well.
+        session : requests.Session
+            (Optional) the session to use, by default a session with a connection pool per downloader is created.
+    """
+    def __init__(self, url, connections=DEFAULT_CONNECTIONS, part_size=DEFAULT_PART_SIZE, chunk_size=DEFAULT_CHUNK_SIZE,
+                 retries=DEFAULT_RETRIES, expected_sha256=None, session=None):
+        self.logger = logging.getLogger("CyberCaptain")
+        self.url = url
+        self.connections = max(1, int(connections))
+        self.part_size = max(1, int(part_size))
+        self.chunk_size = max(1, int(chunk_size))
+        self.retries = max(0, int(retries))
+        self.expected_sha256 = expected_sha256
+        self.session = session if session else self.create_session(self.connections)
+
+        self.size = None
+        self.validator = None
+        self.expected_checksums = {}
+        self._progress_lock = threading.Lock()
+        self._progress_bytes = 0
+        self._progress_percent = 0
+
+    @staticmethod
+    def create_session(connections):
+        """
+        Creates a session with a connection pool big enough for all the concurrent connections.
+
+        **Parameters**:
+            connections : int
+                The number of concurrent connections.
+
+        **Returns**:
+            ``requests.Session``.
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def download(self, target):
+        """
+        Downloads the file to the given target. The target is only created once the whole file was downloaded and verified.
+
+        **Parameters**:
+            target : str
+                path to the target file.
+
+        **Returns**:
+            ``str`` the path of the target.
+
+        **Raises**:
+            ChecksumError if the checksum of the downloaded file does not match.
+            requests.RequestException if the download failed (the progress is kept for a resume).
+        """
+        part_path = target + ".part"
+        state_path = target + ".state"
+
+        response = self.probe()
+        if response.status_code == HTTP_PARTIAL_CONTENT:
+            response.close()
+            self.download_ranges(part_path, state_path)
+            hashes = None
+        else:
+            self.logger.info("Server does not support range requests for %s - downloading over a single connection", self.url)
+            hashes = self.download_stream(response, part_path)
+
+        self.verify(part_path, hashes)
+        os.replace(part_path, target)
+        if os.path.isfile(state_path): os.remove(state_path)
+        return target
+
+    def stream(self):
+        """
+        Streams the file in order without writing it to the disk. With range support the following byte ranges are prefetched
+        concurrently while the current one is consumed. An interrupted stream can not be resumed.
+
+        **Returns**:
+            A generator yielding the ``bytes`` chunks of the file in order.
+
+        **Raises**:
+            ChecksumError after the last chunk if the checksum of the streamed file does not match, the consumer has to discard its output.
+            requests.RequestException if the download failed.
+        """
+        response = self.probe()
+        hashes = {name: hashlib.new(name) for name in self.expected_checksums}
+        if response.status_code == HTTP_PARTIAL_CONTENT:
+            response.close()
+            chunks = self.stream_ranges()
+        else:
+            self.logger.info("Server does not support range requests for %s - streaming over a single connection", self.url)
+            chunks = response.iter_content(chunk_size=self.chunk_size)
+
+        self.logger.info("Started streaming %s with a total size of %s [0%%/100%%]", self.url, self.size)
+        for chunk in chunks:
+            for hash_obj in hashes.values(): hash_obj.update(chunk)
+            if response.status_code != HTTP_PARTIAL_CONTENT: self.report_progress(len(chunk))
+            yield chunk
+        response.close()
+        self.check_hashes(hashes)
+
+    def stream_ranges(self):
+        """
+        Fetches the byte ranges concurrently into the memory and yields them in order.
+        At most two ranges per connection are kept in the memory.
+
+        **Returns**:
+            A generator yielding the ``bytes`` of every range in order.
+        """
+        parts = iter([(start, min(start + self.part_size, self.size) - 1) for start in range(0, self.size, self.part_size)])
+        executor = ThreadPoolExecutor(max_workers=self.connections)
+        pending = collections.deque()
+        try:
+            for start, end in parts:
+                pending.append(executor.submit(self.fetch_part, start, end))
+                if len(pending) >= 2 * self.connections: break
+            while pending:
+                data = pending.popleft().result()
+                next_part = next(parts, None)
+                if next_part: pending.append(executor.submit(self.fetch_part, *next_part))
+                yield data
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def probe(self):
+        """
+        Requests the first byte of the file to find out if the server supports range requests and to read the size and checksums.
+        The checksums are read from the headers of the response which is returned.
+
+        **Returns**:
+            ``requests.Response`` which is either a partial response (range requests supported) or the whole file streamed.
+        """
+        response = self.session.get(self.url, headers={"Range": "bytes=0-0"}, stream=True, timeout=DEFAULT_TIMEOUT)
+        response.raise_for_status()
+
+        if response.status_code == HTTP_PARTIAL_CONTENT:
+            match = re.match(r"bytes\s+\d+-\d+/(\d+)", response.headers.get("content-range", ""))
+            if match:
+                self.size = int(match.group(1))
+                self.validator = response.headers.get("etag") or response.headers.get("last-modified")
+                self.set_expected_checksums(response.headers, partial=True)
+                return response
+            # Total size unknown, request the whole file instead
+            response.close()
+            response = self.session.get(self.url, stream=True, timeout=DEFAULT_TIMEOUT)
+            response.raise_for_status()
+
+        self.size = int(response.headers.get("content-length", 0)) or None
+        self.set_expected_checksums(response.headers)
+        return response
+
+    def set_expected_checksums(self, headers, partial=False):
+        """
+        Sets the expected checksums from the server sent checksums and the given SHA-256 checksum.
+
+        **Parameters**:
+            headers : dict
+                The response headers.
+            partial : bool
+                (Optional) if the headers are the ones of a partial response.
+        """
+        self.expected_checksums = self.parse_checksums(headers, partial)
+        if self.expected_sha256: self.expected_checksums["sha256"] = self.expected_sha256.lower()
+
+    @staticmethod
+    def parse_checksums(headers, partial=False):
+        """
+        Reads the checksums of the whole file sent by the server (``Digest: SHA-256=...`` and ``Content-MD5``).
+        The ``Content-MD5`` of a partial response is the checksum of the partial body only and is skipped.
+
+        **Parameters**:
+            headers : dict
+                The response headers.
+            partial : bool
+                (Optional) if the headers are the ones of a partial response.
+
+        **Returns**:
+            ``dict`` with the hashlib algorithm name as key and the hex checksum as value.
+        """
+        checksums = {}
+        for digest in headers.get("digest", "").split(","):
+            algorithm, _, value = digest.strip().partition("=")
+            algorithm = algorithm.lower().replace("-", "")
+            if value and algorithm in ("sha256", "md5"):
+                checksums[algorithm] = base64.b64decode(value).hex()
+        if headers.get("content-md5") and "md5" not in checksums and not partial:
+            checksums["md5"] = base64.b64decode(headers.get("content-md5")).hex()
+        return checksums
+
+    def download_stream(self, response, path):
+        """
+        Writes a streamed response to the given path over a single connection.
+
+        **Parameters**:
+            response : requests.Response
+                The streamed response of the whole file.
+            path : str
+                path to write to.
+
+        **Returns**:
+            ``dict`` with the hashes of the written data for the expected checksums.
+        """
+        self.logger.info("Started download for %s with a total size of %s [0%%/100%%]", self.url, self.size)
+        hashes = {name: hashlib.new(name) for name in self.expected_checksums}
+        with open(path, "wb") as handle:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                handle.write(chunk)
+                for hash_obj in hashes.values(): hash_obj.update(chunk)
+                self.report_progress(len(chunk))
+        response.close()
+        return hashes
+
+    def download_ranges(self, path, state_path):
+        """
+        Fetches all the byte ranges of the file concurrently and writes them at their offset into the given path.
+
+        **Parameters**:
+            path : str
+                path to write to.
+            state_path : str
+                path to the resume state.
+        """
+        state = self.load_state(state_path)
+        if not state or not os.path.isfile(path):
+            state = {"url": self.url, "size": self.size, "validator": self.validator, "part_size": self.part_size, "done": []}
+            with open(path, "wb") as handle: handle.truncate(self.size)
+        done = set(state["done"])
+
+        parts = [(index, start, min(start + self.part_size, self.size) - 1)
+                 for index, start in enumerate(range(0, self.size, self.part_size)) if index not in done]
+        self._progress_bytes = self.size - sum(end - start + 1 for _, start, end in parts)
+        if done: self.logger.info("Resuming download for %s - %s of %s bytes already downloaded", self.url, self._progress_bytes, self.size)
+        self.logger.info("Started download for %s with a total size of %s over %s connections [0%%/100%%]", self.url, self.size, self.connections)
+
+        executor = ThreadPoolExecutor(max_workers=self.connections)
+        try:
+            futures = {executor.submit(self.download_part, path, start, end): index for index, start, end in parts}
+            for future in as_completed(futures):
+                future.result()
+                done.add(futures[future])
+                state["done"] = sorted(done)
+                self.save_state(state_path, state)
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.logger.warning("Download for %s interrupted - %s of %s parts saved for a resume", self.url, len(done), len(done) + len(parts))
+            raise
+        executor.shutdown()
+
+    def download_part(self, path, start, end):
+        """
+        Fetches a single byte range and writes it at its offset. Failed ranges are retried.
+
+        **Parameters**:
+            path : str
+                path to write to.
+            start : int
+                first byte of the range.
+            end : int
+                last byte of the range (inclusive).
+        """
+        def write(chunks):
+            with open(path, "r+b") as handle:
+                handle.seek(start)
+                for chunk in chunks: handle.write(chunk)
+        self.request_range(start, end, write)
+
+    def fetch_part(self, start, end):
+        """
+        Fetches a single byte range into the memory. Failed ranges are retried.
+
+        **Parameters**:
+            start : int
+                first byte of the range.
+            end : int
+                last byte of the range (inclusive).
+
+        **Returns**:
+            ``bytes`` of the range.
+        """
+        return self.request_range(start, end, b"".join)
+
+    def request_range(self, start, end, consume):
+        """
+        Requests a single byte range and passes its chunks to the given consumer. Failed requests are retried from the beginning of the range.
+
+        **Parameters**:
+            start : int
+                first byte of the range.
+            end : int
+                last byte of the range (inclusive).
+            consume : function
+                called with an iterator over the chunks of the range, called again on a retry.
+
+        **Returns**:
+            The return value of ``consume``.
+        """
+        for attempt in range(self.retries + 1):
+            received = [0]
+            try:
+                response = self.session.get(self.url, headers={"Range": "bytes=%d-%d" % (start, end)}, stream=True, timeout=DEFAULT_TIMEOUT)
+                response.raise_for_status()
+                if response.status_code != HTTP_PARTIAL_CONTENT:
+                    raise requests.HTTPError("Server ignored the range request for bytes %d-%d" % (start, end))
+
+                def chunks():
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        received[0] += len(chunk)
+                        self.report_progress(len(chunk))
+                        yield chunk
+                result = consume(chunks())
+                response.close()
+                if received[0] != end - start + 1:
+                    raise requests.exceptions.ChunkedEncodingError("Received %d of %d bytes for bytes %d-%d" % (received[0], end - start + 1, start, end))
+                return result
+            except requests.RequestException as e:
+                self.report_progress(-received[0])
+                if attempt >= self.retries: raise
+                self.logger.warning("Download of bytes %d-%d from %s failed (%s) - retry %d/%d", start, end, self.url, e, attempt + 1, self.retries)
+
+    def load_state(self, state_path):
+        """
+        Loads the resume state if it belongs to the same file.
+
+        **Parameters**:
+            state_path : str
+                path to the resume state.
+
+        **Returns**:
+            ``dict`` with the state. ``None`` if no matching state exists.
+        """
+        if not os.path.isfile(state_path): return None
+        try:
+            with open(state_path, "r") as state_file: state = json.load(state_file)
+        except ValueError:
+            return None
+        if state.get("url") != self.url or state.get("size") != self.size or state.get("validator") != self.validator \
+            or state.get("part_size") != self.part_size:
+            self.logger.info("Found a resume state for another file at %s - start from the beginning", state_path)
+            return None
+        return state
+
+    @staticmethod
+    def save_state(state_path, state):
+        """
+        Saves the resume state atomically.
+
+        **Parameters**:
+            state_path : str
+                path to the resume state.
+            state : dict
+                the state to save.
+        """
+        with open(state_path + ".tmp", "w") as state_file: json.dump(state, state_file)
+        os.replace(state_path + ".tmp", state_path)
+
+    def verify(self, path, hashes=None):
+        """
+        Verifies the downloaded file against the expected checksums. The file is removed if a checksum does not match.
+
+        **Parameters**:
+            path : str
+                path to the downloaded file.
+            hashes : dict
+                (Optional) the hashes already calculated while downloading, otherwise the file is read again.
+
+        **Raises**:
+            ChecksumError if a checksum does not match.
+        """
+        if not self.expected_checksums: return
+        if hashes is None:
+            hashes = {name: hashlib.new(name) for name in self.expected_checksums}
+            with open(path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(DEFAULT_PART_SIZE), b""):
+                    for hash_obj in hashes.values(): hash_obj.update(chunk)
+
+        try:
+            self.check_hashes(hashes)
+        except ChecksumError:
+            os.remove(path)
+            raise
+
+    def check_hashes(self, hashes):
+        """
+        Compares the given hashes with the expected checksums.
+
+        **Parameters**:
+            hashes : dict
+                the hashes of the downloaded data per algorithm name.
+
+        **Raises**:
+            ChecksumError if a checksum does not match.
+        """
+        if not self.expected_checksums: return
+        for name, expected in self.expected_checksums.items():
+            if hashes[name].hexdigest() != expected:
+                raise ChecksumError("%s checksum of %s does not match (expected %s, got %s)" % (name, self.url, expected, hashes[name].hexdigest()))
+        self.logger.info("Verified the checksum (%s) of %s", ", ".join(self.expected_checksums), self.url)
+
+    def report_progress(self, amount):
+        """
+        Adds the given amount of bytes to the progress and logs every full percent.
+        """
+        with self._progress_lock:
+            self._progress_bytes += amount
+            if not self.size: return
+            percent = min(100, self._progress_bytes * 100 // self.size)
+            if percent > self._progress_percent:
+                self._progress_percent = percent
+                self.logger.info("Downloaded (%s) - [%s%%/100%%]", self.url, percent)
@@ -1,11 +1,100 @@
 """
 This util module handles all the JSON files for the CyberCaptain modules.
 """
+import re
 import json
 import logging
+import os
 import shutil
+from json.decoder import scanstring
 from cybercaptain.utils.exceptions import LinePassedError, LineNotFoundError
 
+_skip_whitespace = re.compile(r'[ \t\n\r]*').match
+_raw_decode = json.JSONDecoder().raw_decode
+
+class json_projection():
+    """
+    The projection decodes only the wanted attribute paths of a JSON dataset line instead of the whole dataset.
+    Unwanted values are skipped by the C decoder and the decoding stops as soon as all wanted attributes were found.
+    Before decoding, the line is checked for the keys of each path, so datasets without the wanted attributes are not decoded at all.
+
+    **Parameters**:
+        attributes : list
+            the dotted attribute paths (E.g. 'data.xssh.server_id.software'). A path step into a list decodes the whole list.
+    """
+    def __init__(self, attributes):
+        self.paths = [tuple(attribute.split(".")) for attribute in dict.fromkeys(attributes)]
+        self.tree = self.build_tree(self.paths)
+        # The pre-scan only works for keys which are written the same in the JSON line
+        self.prescan = all(re.fullmatch(r'[ -!#-\[\]-~]*', key) for path in self.paths for key in path)
+        self.path_keys = [['"%s"' % key for key in path if not key.lstrip('-').isdigit()] for path in self.paths] # Numbers can be list indexes
+        self._trees = {}
+
+    @staticmethod
+    def build_tree(paths):
+        """
+        Merges the attribute paths into a tree of dicts, ``None`` marks an attribute which is decoded completely.
+        """
+        tree = {}
+        for path in paths:
+            node = tree
+            for i, key in enumerate(path):
+                if i == len(path) - 1:
+                    node[key] = None
+                elif node.get(key, {}) is None:
+                    break # A parent attribute is decoded completely
+                else:
+                    node = node.setdefault(key, {})
+        return tree
+
+    def decode(self, line):
+        """
+        Decodes the wanted attributes of a JSON dataset line.
+
+        **Parameters**:
+            line : str
+                the JSON dataset.
+
+        **Returns**:
+            The dataset with the wanted attributes which exist in the line.
+        """
+        tree = self.tree
+        if self.prescan:
+            present = tuple(i for i, keys in enumerate(self.path_keys) if all(key in line for key in keys))
+            if not present: return {}
+            if len(present) < len(self.paths):
+                tree = self._trees.get(present)
+                if tree is None: tree = self._trees[present] = self.build_tree([self.paths[i] for i in present])
+        try:
+            return self._project(line, tree, _skip_whitespace(line, 0).end(), True)[0]
+        except (IndexError, ValueError):
+            return json.loads(line) # Raises the decoding error of a broken line or returns the complete dataset
+
+    def _project(self, s, tree, i, may_stop):
+        if s[i] != '{': return _raw_decode(s, i)
+        record = {}
+        remaining = len(tree)
+        i += 1
+        while True:
+            i = _skip_whitespace(s, i).end()
+            if s[i] == '}': return record, i + 1
+            key, i = scanstring(s, i + 1)
+            i = _skip_whitespace(s, _skip_whitespace(s, i).end() + 1).end() # Skip the colon
+            if key in tree and key not in record:
+                remaining -= 1
+                stop = may_stop and remaining == 0 # Nothing is needed after this attribute
+                if tree[key] is None:
+                    record[key], i = _raw_decode(s, i)
+                else:
+                    record[key], i = self._project(s, tree[key], i, stop)
+                if stop: return record, None
+            elif s[i] == '"':
+                i = scanstring(s, i + 1)[1]
+            else:
+                i = _raw_decode(s, i)[1]
+            i = _skip_whitespace(s, i).end()
+            if s[i] == ',': i += 1
+
 class json_file_reader():
     """
     The reader class allows to pass a file and path to read the file line by line and passes it back as a JSON object.
@@ -13,9 +102,17 @@ class json_file_reader():
     **Parameters**:
 		file_name : str
             The file location and name relative from call location.
+        columns : list
+            (Optional) the dotted attribute paths the module needs. Only these attributes are decoded, see ``json_projection``.
+        where : tuple
+            (Optional) ``(columns, predicate)`` to only return datasets the predicate returns ``True`` for.
+            The predicate gets the dataset with only the given columns, the other lines are skipped without decoding them completely.
     """
-    def __init__(self, file_name):
+    def __init__(self, file_name, columns=None, where=None):
         self.logger = logging.getLogger("CyberCaptain")
+        self.decode = json_projection(columns).decode if columns else json.loads
+        self.where_decode, self.where = (json_projection(where[0]).decode, where[1]) if where else (None, None)
+        self.filtered_rows = 0 # Datasets skipped by the where predicate
         self.line_pointer = open(file_name, "r")
         self.logger.debug("Opening file %s", file_name)
         self.next_line = self.line_pointer.readline()
@@ -24,6 +121,7 @@ class json_file_reader():
         self.current_line = 1
         self.logger.debug("Read line #%i", self.read_lines)
         self.file_name = file_name
+        self.skipFiltered()
 
     def readRecord(self):
         """
@@ -35,13 +133,24 @@ class json_file_reader():
         if self.isEOF():
             self.logger.warning("EOF! Maybe check your implementation!")
             return None
-        json_obj = json.loads(self.next_line) # save the to be passed line
+        json_obj = self.decode(self.next_line) # save the to be passed line
         self.next_line = self.line_pointer.readline() # read next line for the next call
         self.read_lines += 1
         self.current_line += 1
+        self.skipFiltered()
         #self.logger.debug("Read line #%i", self.read_lines)
         return json_obj # pass down the line as JSON Object
 
+    def skipFiltered(self):
+        """
+        Skips the next lines the where predicate does not return ``True`` for. Only their where attributes are decoded.
+        """
+        if self.where is None: return
+        while self.next_line and not self.where(self.where_decode(self.next_line)):
+            self.filtered_rows += 1
+            self.current_line += 1
+            self.next_line = self.line_pointer.readline()
+
     def readLineRecord(self, line_number):
         """
         Read the given line from the file. The ``read_lines`` counter will be increased by one.
@@ -91,14 +200,21 @@ class json_file_writer():
     **Parameters**:
         file_name : str
             The file location and name relative from the call location.
+        resume_at : int
+            (Optional) continue an aborted tmp file after the given byte offset returned by ``sync``, the rest of the tmp file is discarded.
     """
-    def __init__(self, file_name):
+    def __init__(self, file_name, resume_at=0):
         self.file_name = file_name
         self.logger = logging.getLogger("CyberCaptain")
         self.logger.debug("Opening file %s", file_name)
-        self.file_pointer = open("%s.tmp" % (file_name), "w")
+        if resume_at:
+            os.truncate("%s.tmp" % (file_name), resume_at)
+            self.file_pointer = open("%s.tmp" % (file_name), "a")
+            self.logger.debug("File %s is resumed at byte %i", file_name, resume_at)
+        else:
+            self.file_pointer = open("%s.tmp" % (file_name), "w")
         self.logger.debug("File %s is opened and ready to write to!", file_name)
-        self.first = True
+        self.first = not resume_at
 
     def writeRecord(self, json_line):
         """
@@ -114,6 +230,31 @@ class json_file_writer():
         self.file_pointer.flush() # ensure that every line is written instantly
         self.first = False
 
+    def writeRecords(self, json_lines):
+        """
+        Writes a batch of json records to the file with a single flush.
+
+        **Parameters**:
+            json_lines : list
+                the records to write.
+        """
+        if not json_lines: return
+        if not self.first: self.file_pointer.write("\n")
+        self.file_pointer.write("\n".join(json.dumps(json_line) for json_line in json_lines))
+        self.file_pointer.flush()
+        self.first = False
+
+    def sync(self):
+        """
+        Forces the written records to the disk, E.g. before saving a checkpoint.
+
+        **Returns**:
+            ``int`` the byte offset after the last written record, can be used as ``resume_at``.
+        """
+        self.file_pointer.flush()
+        os.fsync(self.file_pointer.fileno())
+        return os.fstat(self.file_pointer.fileno()).st_size
+
     def close(self):
         """
         Closes the file and removes the tmp suffix.
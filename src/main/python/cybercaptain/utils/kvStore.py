@@ -1,28 +1,181 @@
 """
-This util module handles the storage of keys and values. Built on top of the configobj library to not introduce more dependencies.
+This util module handles the storage of keys and values. Built on top of the sqlite3 standard library to not introduce more dependencies.
+Existing stores written by previous versions with the configobj library are migrated on the first open.
 """
 import logging
 import os
+import json
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
 from configobj import ConfigObj
 
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+ROOT_SECTION = ""
+BUSY_TIMEOUT = 60 # Seconds to wait for the lock of another writer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    section TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (section, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS kv_set (
+    section TEXT NOT NULL,
+    key TEXT NOT NULL,
+    member TEXT NOT NULL,
+    PRIMARY KEY (section, key, member)
+) WITHOUT ROWID;
+"""
+
+@contextmanager
+def file_lock(path):
+    """
+    Holds an exclusive inter-process lock on the given lock file while the context is active.
+
+    **Parameters**:
+        path    :   str
+            The path to the lock file, created if not existing.
+    """
+    with open(path, "a+b") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
 class kv_store():
     """
     The kvstore module allows to save keys with their string or list values to a specified store file and read from the specified file.
+    Additionally keys can hold a set of string members which can be checked for membership without loading the whole set (E.g. processed ids).
+
+    The store is a SQLite database in WAL mode, a ``put`` with force only writes the changed key instead of the whole file.
+    Several processes and threads can share the same store file, use ``transaction()`` to update multiple keys atomically.
 
     **Parameters**:
-		file_name   :   str
-            The file location and name relative from call location.
+        dir_name    :   str
+            The directory of the store file.
+        file_name   :   str
+            The file name of the store file.
     """
     def __init__(self, dir_name, file_name):
         self.logger = logging.getLogger("CyberCaptain")
-        
-        try:
-            self.confi_obj = ConfigObj(os.path.join(dir_name, file_name), create_empty=True)
-        except FileNotFoundError:
-            self.logger.error("K/V store failed to initialize due to directories in path not existing.")
+        self.path = os.path.join(dir_name, file_name)
+        self._conn = None
+        self._pending = {}
+        self._pending_sets = {}
+        self._checked_sets = set()
+        self._lock = threading.RLock()
+        self._in_transaction = False
 
         self.logger.debug("K/V-Store initialized for file %s", file_name)
 
+    @property
+    def conn(self):
+        """
+        The connection to the store file. The file is opened (and migrated if needed) on the first access.
+        """
+        with self._lock:
+            if self._conn is None:
+                try:
+                    if self.is_configobj_store(self.path):
+                        with file_lock(self.path + ".lock"):
+                            # Another process might have migrated the store while waiting for the lock
+                            if self.is_configobj_store(self.path): self.migrate_configobj(self.path)
+                    self._conn = self.connect(self.path)
+                except (sqlite3.OperationalError, FileNotFoundError):
+                    self.logger.error("K/V store failed to initialize due to directories in path not existing.")
+                    raise
+            return self._conn
+
+    @staticmethod
+    def connect(path):
+        """
+        Opens the SQLite store and creates the tables if they do not exist yet.
+
+        **Parameters**:
+            path    :   str
+                The path to the store file.
+
+        **Returns**:
+            ``sqlite3.Connection`` to the store.
+        """
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    @staticmethod
+    def is_configobj_store(path):
+        """
+        Checks whether the given file is a store written by the previous configobj based kv_store.
+
+        **Parameters**:
+            path    :   str
+                The path to the store file.
+
+        **Returns**:
+            ``True`` if the file exists, is not empty and is not a SQLite database.
+        """
+        if not os.path.isfile(path) or os.path.getsize(path) == 0: return False
+        with open(path, "rb") as store_file:
+            return store_file.read(len(SQLITE_HEADER)) != SQLITE_HEADER
+
+    def migrate_configobj(self, path):
+        """
+        Migrates a configobj store to a SQLite store at the same path. The original file is kept with the suffix ``.configobj.bak``.
+
+        **Parameters**:
+            path    :   str
+                The path to the configobj store file.
+        """
+        self.logger.info("K/V-Store migrating configobj store %s to SQLite", path)
+        config = ConfigObj(path)
+        tmp_path = path + ".migrating"
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+        conn = sqlite3.connect(tmp_path)
+        conn.executescript(SCHEMA)
+        with conn:
+            for key, value in config.items():
+                if isinstance(value, dict):
+                    for sub_key, sub_value in value.items():
+                        if isinstance(sub_value, dict):
+                            self.logger.warning("K/V-Store nested section %s.%s can not be migrated - skipped", key, sub_key)
+                            continue
+                        conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (key, sub_key, self.encode(sub_value)))
+                else:
+                    conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (ROOT_SECTION, key, self.encode(value)))
+        conn.close()
+
+        shutil.copy2(path, path + ".configobj.bak")
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def encode(value):
+        """
+        Encodes a string or list value for the store. Like configobj all values are stored as strings.
+        """
+        if isinstance(value, (list, tuple, set)): return json.dumps([str(v) for v in value])
+        return json.dumps(str(value))
+
     def put(self, key, value, section=None, force=False):
         """
         Set the value of a key.
@@ -40,16 +193,12 @@ class kv_store():
                 If force is set to ``True`` the newly added key will be directly written to the disk and not only kept in the memory.
                 If this option is not used, don't forget to explicit call dump() after finishing to put all the keys.
 
-		**Returns**:
-			``True``.
+        **Returns**:
+            ``True``.
         """
-        if section:
-            if section not in self.confi_obj.sections: self.confi_obj[section] = {}
-            self.confi_obj[section][key] = value
-        else:
-            self.confi_obj[key] = value
-
-        if force: self.dump()
+        with self._lock:
+            self._pending[(section or ROOT_SECTION, key)] = self.encode(value)
+            if force and not self._in_transaction: self.dump()
 
         return True
 
@@ -65,24 +214,199 @@ class kv_store():
             section :   str
                 specific section to from where get the value. If not set its expected to be in no group.
 
-		**Returns**:
-			``value`` if the key and its value has been found. ``None`` if no key was found.
+        **Returns**:
+            ``value`` if the key and its value has been found. ``None`` if no key was found.
+        """
+        section = section or ROOT_SECTION
+        with self._lock:
+            value = self._pending.get((section, key))
+            if value is None:
+                row = self.conn.execute("SELECT value FROM kv WHERE section = ? AND key = ?", (section, key)).fetchone()
+                if not row: return None
+                value = row[0]
+        return json.loads(value)
+
+    def add_to_set(self, key, member, section=None, force=False):
+        """
+        Adds a member to the set of a key.
+
+        **Parameters**:
+            key     :   str
+                The key of the set.
+            member  :   str
+                The member to add to the set.
+
+        **Optional**:
+            section :   str
+                specific section to where the set should be written.
+            force   :   bool
+                If force is set to ``True`` the member will be directly written to the disk and not only kept in the memory.
+
+        **Returns**:
+            ``True``.
+        """
+        section = section or ROOT_SECTION
+        with self._lock:
+            self.migrate_list_to_set(key, section)
+            self._pending_sets.setdefault((section, key), set()).add(str(member))
+            if force and not self._in_transaction: self.dump()
+
+        return True
+
+    def in_set(self, key, member, section=None):
+        """
+        Checks whether a member is in the set of a key. Uses the index instead of loading the whole set.
+
+        **Parameters**:
+            key     :   str
+                The key of the set.
+            member  :   str
+                The member to look for.
+
+        **Optional**:
+            section :   str
+                specific section from where the set should be read.
+
+        **Returns**:
+            ``True`` if the member is in the set, otherwise ``False``.
+        """
+        section = section or ROOT_SECTION
+        member = str(member)
+        with self._lock:
+            self.migrate_list_to_set(key, section)
+            if member in self._pending_sets.get((section, key), ()): return True
+            row = self.conn.execute("SELECT 1 FROM kv_set WHERE section = ? AND key = ? AND member = ?", (section, key, member)).fetchone()
+        return row is not None
+
+    def get_set(self, key, section=None):
+        """
+        Gets all the members of the set of a key.
+
+        **Parameters**:
+            key     :   str
+                The key of the set.
+
+        **Optional**:
+            section :   str
+                specific section from where the set should be read.
+
+        **Returns**:
+            ``set`` with all members, empty if the key has no set.
+        """
+        section = section or ROOT_SECTION
+        with self._lock:
+            self.migrate_list_to_set(key, section)
+            rows = self.conn.execute("SELECT member FROM kv_set WHERE section = ? AND key = ?", (section, key))
+            return {row[0] for row in rows} | self._pending_sets.get((section, key), set())
+
+    def migrate_list_to_set(self, key, section):
+        """
+        Moves a list value saved by previous versions (E.g. ``processed_ids``) into the set of the same key.
+
+        **Parameters**:
+            key     :   str
+                The key of the set.
+            section :   str
+                The section of the key.
+        """
+        if (section, key) in self._checked_sets: return
+        self._checked_sets.add((section, key))
+
+        with self.atomic() as conn:
+            row = conn.execute("SELECT value FROM kv WHERE section = ? AND key = ?", (section, key)).fetchone()
+            if not row: return
+            value = json.loads(row[0])
+            if not isinstance(value, list): return
+
+            conn.executemany("INSERT OR IGNORE INTO kv_set VALUES (?, ?, ?)", [(section, key, member) for member in value])
+            conn.execute("DELETE FROM kv WHERE section = ? AND key = ?", (section, key))
+        self.logger.debug("K/V-Store migrated list %s to a set", key)
+
+    @contextmanager
+    def atomic(self):
         """
-        if section: 
-            if section in self.confi_obj.sections and key in self.confi_obj[section].keys(): 
-                return self.confi_obj[section][key]
-            return None
-        if key in self.confi_obj.keys(): return self.confi_obj[key]
-        return None
+        Runs the statements of the context in one SQLite write transaction and yields the connection.
+        The write lock of the store file is taken at the beginning, other processes wait up to ``BUSY_TIMEOUT`` seconds for it.
+        Inside an open ``transaction()`` the statements simply join it.
+        """
+        with self._lock:
+            conn = self.conn
+            if self._in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups several ``get``, ``put`` and set calls into one atomic transaction.
+        The store file is locked for other writers from the beginning, so values read inside the transaction can not change before
+        the transaction ends (E.g. read-modify-write of a counter). All pending changes are written when the context exits without error,
+        otherwise all unpersisted changes are discarded. Nested transactions join the outer one.
+
+        Example::
+
+            with store.transaction():
+                if not store.in_set("processed_ids", dataset_id):
+                    store.add_to_set("processed_ids", dataset_id)
+                    store.put(dataset_id, target)
+        """
+        with self._lock:
+            if self._in_transaction:
+                yield self
+                return
+            try:
+                with self.atomic() as conn:
+                    self._in_transaction = True
+                    yield self
+                    self.write_pending(conn)
+            except BaseException:
+                self.reload()
+                self._checked_sets.clear() # list to set migrations were rolled back as well
+                raise
+            finally:
+                self._in_transaction = False
+
+    def write_pending(self, conn):
+        """
+        Writes all pending changes with the given connection and clears them.
+        """
+        conn.executemany("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+                         [(section, key, value) for (section, key), value in self._pending.items()])
+        conn.executemany("INSERT OR IGNORE INTO kv_set VALUES (?, ?, ?)",
+                         [(section, key, member) for (section, key), members in self._pending_sets.items() for member in members])
+        self._pending.clear()
+        self._pending_sets.clear()
 
     def dump(self):
         """
-        Saves the kvstore permanently to the disk.
+        Saves the kvstore permanently to the disk. All pending changes are written in one transaction.
+        Inside a ``transaction()`` the changes are written when the transaction ends.
         """
-        self.confi_obj.write()
+        with self._lock:
+            if self._in_transaction: return
+            with self.atomic() as conn:
+                self.write_pending(conn)
 
     def reload(self):
         """
-        Reloads the config from the specific local file. Unpersisted settings will be lost.
+        Reloads the store from the specific local file. Unpersisted settings will be lost.
+        """
+        with self._lock:
+            self._pending.clear()
+            self._pending_sets.clear()
+
+    def close(self):
+        """
+        Closes the connection to the store file. Unpersisted settings will be lost.
         """
-        self.confi_obj.reload()
+        self.reload()
+        if self._conn:
+            self._conn.close()
+            self._conn = None
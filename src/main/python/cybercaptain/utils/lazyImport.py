@@ -0,0 +1,51 @@
+"""
+This util module defers the import of heavy third party packages (E.g. matplotlib, geopandas or the API clients) until they are used.
+Validation runs and runs which skip most tasks start without importing the packages of modules which never run.
+"""
+import importlib
+
+class lazy_import():
+    """
+    The lazy import class stands in for a module and imports it on the first attribute access, submodules are imported on access too.
+    Setting attributes (E.g. to mock an API client in the tests) is passed on to the imported module.
+
+    **Parameters**:
+        module_name : str
+            The full name of the module (E.g. 'matplotlib.ticker').
+    """
+    def __init__(self, module_name):
+        object.__setattr__(self, "_module_name", module_name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        """
+        Imports the module if not done yet.
+
+        **Returns**:
+            The imported module.
+        """
+        module = object.__getattribute__(self, "_module")
+        if module is None:
+            module = importlib.import_module(object.__getattribute__(self, "_module_name"))
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, name):
+        module = self._load()
+        try:
+            return getattr(module, name)
+        except AttributeError:
+            if name.startswith("__"): raise
+            return importlib.import_module("%s.%s" % (module.__name__, name)) # Submodules not imported by the package (E.g. 'lz4.frame')
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return "lazy_import(%r)" % object.__getattribute__(self, "_module_name")
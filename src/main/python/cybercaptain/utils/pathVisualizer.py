@@ -1,7 +1,8 @@
 import os
 import datetime
 import logging
-from jinja2 import Template
+from cybercaptain.utils.lazyImport import lazy_import
+jinja2 = lazy_import("jinja2")
 
 logger = logging.getLogger("CyberCaptain")
 
@@ -67,7 +68,7 @@ def render_path_visualisation(projectRoot, configName, prepared_paths):
             A list of the prepared paths.
     """
     with open(os.path.join(os.path.dirname(__file__), 'assets/visualizer_template.html')) as file_:
-        template = Template(file_.read())
+        template = jinja2.Template(file_.read())
     
     visuFileName = "pathvisualizer_%s.html" % configName.replace(" ","")
     visuFilePath = os.path.join(projectRoot, visuFileName)
@@ -0,0 +1,53 @@
+"""
+This util module limits the rate of calls to external services (E.g. API requests or downloads) shared between threads.
+"""
+import threading
+import time
+
+class token_bucket():
+    """
+    The token bucket allows ``rate`` calls per second on average with bursts of up to ``capacity`` calls.
+    Tokens are reserved in the order the callers arrive, so waiting callers are served fairly.
+
+    **Parameters**:
+        rate : float
+            The number of tokens added per second.
+        capacity : int
+            (Optional) the maximum number of tokens which can be saved up for a burst. (Default 1)
+    """
+    def __init__(self, rate, capacity=1):
+        if rate <= 0: raise ValueError("The rate of the token bucket has to be positive")
+        self.rate = float(rate)
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """
+        Reserves the given amount of tokens without waiting.
+
+        **Parameters**:
+            tokens : int
+                (Optional) the amount of tokens. (Default 1)
+
+        **Returns**:
+            ``float`` the seconds to wait until the reserved tokens are available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self, tokens=1):
+        """
+        Takes the given amount of tokens and blocks until they are available.
+
+        **Parameters**:
+            tokens : int
+                (Optional) the amount of tokens. (Default 1)
+        """
+        wait = self.reserve(tokens)
+        if wait > 0: time.sleep(wait)
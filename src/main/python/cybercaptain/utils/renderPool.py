@@ -0,0 +1,105 @@
+"""
+This util module renders the visualization tasks in a pool of worker processes, so the plots of a run use all CPU cores.
+The workers create the modules themselves from their module config and attributes and render with the non-interactive Agg backend.
+"""
+import os
+import logging
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+def init_render_worker(debug, log_location):
+    """
+    Sets up a worker process: the headless Agg backend and the CyberCaptain logger writing to the log of the run.
+
+    **Parameters**:
+        debug : bool
+            whether the run logs debug messages to stdout.
+        log_location : str
+            the folder of the log file of the run.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    from cybercaptain.utils.logging import setup_logger
+    setup_logger(debug=debug, log_location=log_location)
+
+def render_task(module_conf, kwargs):
+    """
+    Creates and runs a visualization task (pre_check, run and post_check) in the worker process.
+
+    **Parameters**:
+        module_conf : list
+            the module path and the class name of the modules config.
+        kwargs : dict
+            the attributes of the task.
+
+    **Returns**:
+        ``True`` if the target exists or the task ran successfully, ``False`` if a check or the run failed.
+    """
+    module = getattr(importlib.import_module(module_conf[0]), module_conf[1])(**kwargs)
+    if module.target_exists(): return True
+    return bool(module.pre_check() and module.run() and module.post_check())
+
+class render_pool():
+    """
+    The render pool runs the submitted visualization tasks in worker processes, the worker processes are started with the first task.
+
+    **Parameters**:
+        processes : int
+            (Optional) the amount of worker processes (Default: the amount of CPUs).
+        debug : bool
+            (Optional) whether the run logs debug messages to stdout.
+        log_location : str
+            (Optional) the folder of the log file of the run.
+    """
+    def __init__(self, processes=None, debug=False, log_location=None):
+        self.logger = logging.getLogger("CyberCaptain")
+        self.processes = processes or os.cpu_count() or 1
+        self.debug = debug
+        self.log_location = log_location
+        self._executor = None
+        self._futures = {}
+
+    def submit(self, task_name, module_conf, kwargs):
+        """
+        Starts to render the given task in a worker process.
+
+        **Parameters**:
+            task_name : str
+                the name of the task.
+            module_conf : list
+                the module path and the class name of the modules config.
+            kwargs : dict
+                the attributes of the task.
+        """
+        if self._executor is None:
+            # Spawned workers do not inherit the threads and the pyplot state of the runner
+            self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_render_worker, initargs=(self.debug, self.log_location))
+        self._futures[task_name] = self._executor.submit(render_task, list(module_conf), dict(kwargs))
+
+    def wait(self):
+        """
+        Waits for all submitted tasks to finish.
+
+        **Returns**:
+            ``dict`` with the task names and ``True`` if the task ran successfully, ``False`` if it failed or raised an exception.
+        """
+        results = {}
+        for task_name, future in self._futures.items():
+            try:
+                results[task_name] = future.result()
+            except Exception as e:
+                self.logger.exception(e)
+                self.logger.error("[CC-RUN] - Fatal error in rendered task %s!" % task_name)
+                results[task_name] = False
+            if not results[task_name]: self.logger.warning("[CC-RUN] - Rendered task %s did not run successfully. Please recheck!" % task_name)
+        self._futures = {}
+        return results
+
+    def shutdown(self):
+        """
+        Waits for the running tasks and stops the worker processes.
+        """
+        if self._executor is not None: self._executor.shutdown(wait=True)
+        self._executor = None
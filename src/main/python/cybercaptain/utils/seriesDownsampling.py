@@ -0,0 +1,42 @@
+"""
+This util module downsamples long data series of the line visualizations, so the plot cost does not grow with the length of a series.
+The Largest-Triangle-Three-Buckets (LTTB) algorithm keeps the points which shape the line the most, peaks and drops stay visible.
+"""
+from cybercaptain.utils.lazyImport import lazy_import
+np = lazy_import("numpy")
+
+def lttb_indices(values, max_points):
+    """
+    Selects the indexes of the points to plot with the Largest-Triangle-Three-Buckets algorithm.
+    The first and last point are always kept, the points between are split into equal buckets and the point
+    of each bucket spanning the largest triangle with the previous kept point and the average of the next bucket is kept.
+
+    **Parameters**:
+        values : list
+            the y values of the series, the x values are their indexes.
+        max_points : int
+            the amount of points to keep (At least 3).
+
+    **Returns**:
+        ``ndarray`` with the ascending indexes of the kept points. All indexes if the series is not longer than ``max_points``.
+    """
+    length = len(values)
+    if max_points >= length or max_points < 3: return np.arange(length)
+
+    y = np.asarray(values, dtype=float)
+    bucket_edges = np.linspace(1, length - 1, max_points - 1).astype(int) # max_points - 2 buckets between the first and last point
+    indices = np.empty(max_points, dtype=int)
+    indices[0], indices[-1] = 0, length - 1
+
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = bucket_edges[bucket], bucket_edges[bucket + 1]
+        next_end = bucket_edges[bucket + 2] if bucket + 2 < len(bucket_edges) else length
+        next_x = (end + next_end - 1) / 2
+        next_y = y[end:next_end].mean()
+
+        x = np.arange(start, end)
+        areas = np.abs((previous - next_x) * (y[start:end] - y[previous]) - (previous - x) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
@@ -0,0 +1,90 @@
+"""
+This util module runs tasks in the background so the runner can continue with other paths in the meantime.
+It is used to fetch the datasets of injected store tasks (E.g. missing censys datasets) concurrently.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from cybercaptain.utils.rateLimiter import token_bucket
+
+class task_prefetcher():
+    """
+    The task prefetcher runs the given tasks (pre_check, run and post_check) in background threads.
+    The runner waits for the result of a prefetched task when the task is reached in its path.
+    """
+    def __init__(self):
+        self.logger = logging.getLogger("CyberCaptain")
+        self._futures = {}
+        self._executors = []
+
+    def submit(self, tasks, parallelism, rate=None):
+        """
+        Starts to run the given tasks in the background.
+
+        **Parameters**:
+            tasks : dict
+                the task names with a function creating the configured module of the task.
+            parallelism : int
+                how many of the given tasks run at the same time.
+            rate : float
+                (Optional) the maximum number of tasks started per minute.
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, parallelism), thread_name_prefix="cc-prefetch")
+        bucket = token_bucket(rate / 60.0) if rate else None
+        self._executors.append(executor)
+        for task_name, create_module in tasks.items():
+            self._futures[task_name] = executor.submit(self.run_task, task_name, create_module, bucket)
+
+    def run_task(self, task_name, create_module, bucket=None):
+        """
+        Runs a single task if its target does not exist yet.
+
+        **Parameters**:
+            task_name : str
+                the name of the task.
+            create_module : function
+                creates the configured module of the task.
+            bucket : token_bucket
+                (Optional) limits the rate the tasks are started with.
+
+        **Returns**:
+            ``True`` if the target exists or the task ran successfully, ``False`` if a check or the run failed.
+        """
+        module = create_module()
+        if module.target_exists(): return True
+        if bucket: bucket.acquire()
+        self.logger.info("[CC-RUN] - Prefetching task %s" % task_name)
+        return bool(module.pre_check() and module.run() and module.post_check())
+
+    def is_prefetched(self, task_name):
+        """
+        Checks whether the given task was submitted and not yet waited for.
+        """
+        return task_name in self._futures
+
+    def wait(self, task_name):
+        """
+        Waits for a prefetched task to finish.
+
+        **Parameters**:
+            task_name : str
+                the name of the task.
+
+        **Returns**:
+            The result of ``run_task``.
+
+        **Raises**:
+            The exception raised by the task.
+        """
+        return self._futures.pop(task_name).result()
+
+    def shutdown(self, cancel=False):
+        """
+        Waits for all the running tasks and stops the background threads.
+
+        **Parameters**:
+            cancel : bool
+                (Optional) cancel the tasks which did not start yet. (Default ``False``)
+        """
+        for executor in self._executors: executor.shutdown(wait=True, cancel_futures=cancel)
+        self._executors = []
+        self._futures = {}
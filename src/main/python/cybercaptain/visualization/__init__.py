@@ -1,7 +1,13 @@
 """
 Initializes the visualization package and makes sure that the matplotlib backend is set to 'AGG'.
+matplotlib itself is only imported when a visualization module plots, until then the backend is passed on with the MPLBACKEND environment variable.
 
 Without ensuring the correct backend it is possible that the third party GUI libraries, that matplotlib uses, will break CyberCaptain on headless server. To understand the matplotlib backend check out their documentation (https://matplotlib.org/faq/usage_faq.html#what-is-a-backend)
 """
-import matplotlib
-matplotlib.use('AGG')
+import os
+import sys
+
+if "matplotlib" in sys.modules:
+    sys.modules["matplotlib"].use('AGG')
+else:
+    os.environ["MPLBACKEND"] = "AGG"
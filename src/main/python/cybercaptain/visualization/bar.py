@@ -3,17 +3,20 @@ This module contains the visualization bar class.
 """
 import glob
 import os
-import re
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
-import matplotlib.cm as cmx
-from mpl_toolkits.mplot3d import Axes3D
-from matplotlib.ticker import FuncFormatter
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.visualization.base import visualization_base
-from cybercaptain.utils.jsonFileHandler import json_file_reader
+from cybercaptain.utils.columnarFileHandler import record_file_reader
 from cybercaptain.utils.helpers import str2bool
+from cybercaptain.utils.attributePath import compile_attribute_path
+from cybercaptain.utils.lazyImport import lazy_import
+np = lazy_import("numpy")
+matplotlib = lazy_import("matplotlib")
+colors = lazy_import("matplotlib.colors")
+cmx = lazy_import("matplotlib.cm")
+ticker = lazy_import("matplotlib.ticker")
+cycler = lazy_import("cycler")
+
+HISTOGRAM_BATCH_SIZE = 65536 # Values read into memory at once by the histogram, counted batch by batch
 
 class visualization_bar(visualization_base):
     """
@@ -34,6 +37,15 @@ class visualization_bar(visualization_base):
             Recommended to use the group-module and reuse the there set group attribute here.
         threshold:
             possibility to set a value threshold to hide smaller groups for example.
+        topGroups:
+            only plot the given amount of groups with the largest sums over all files (E.g. 20).
+        showOthers:
+            show the summed values of the groups left out by topGroups as an 'Others' group (Defaults to True).
+        bins:
+            the amount of equal width bins of the histogram (Defaults to 10).
+        binRange:
+            define a tuple to set the lower and upper edge of the histogram bins (E.g. '0, 100').
+            Values outside are not counted. Defaults to the smallest and largest value, found in a pass over the files before counting.
         figureSize:
             define a tuple to set the figure size proportion (E.g. '20, 10').
         rotateXTicks:
@@ -47,7 +59,7 @@ class visualization_bar(visualization_base):
             (Supported for: comparedbarplot, groupedbarplot, barplot3d  - Defaults to False)
             (Important: Ascending heat colors do not make sense for every plot although it is supported!)
         colormap:
-            set the string for the colormap to be used on the graphs (Reference: https://matplotlib.org/users/colormaps.html)
+            set the string for the colormap to be used on the graphs (Reference: https://matplotlib.org/users/colormaps.html). An unknown colormap is not caught by the validation (``-v``), the run fails instead.
         horizontal:
             the bool to display the barchart horizontal to the default vertical (Supported for: comparedbarplot, groupedbarplot, barplotcomparedstacked, barplotgroupedstacked)
         scaledTo100:
@@ -67,6 +79,9 @@ class visualization_bar(visualization_base):
             show the grid behind the plot (Defaults to False).
         showLegend:
             show the data legend for the chart (Defaults to True).
+
+    The group values per file are cached in memory and in the '.cc_aggregate_cache' folder of the project root,
+    summaries not used for 30 days are removed from the folder (As are the least recently used ones above 256 MiB).
     """
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -82,6 +97,10 @@ class visualization_bar(visualization_base):
         self.y_label = kwargs.get("ylabel", "")
         self.title = kwargs.get("title", "")
         self.threshold = kwargs.get("threshold")
+        self.top_groups = kwargs.get("topGroups")
+        self.show_others = str2bool(kwargs.get("showOthers", True))
+        self.bins = int(kwargs.get("bins", 10))
+        self.bin_range = [float(edge) for edge in kwargs.get("binRange")] if kwargs.get("binRange") else None
         self.figure_size = kwargs.get("figureSize", [20, 10])
         self.filenames_regex_extract = kwargs.get("filenamesRegexExtract")
         self.color_map_ascending = str2bool(kwargs.get("colormapAscending"))
@@ -112,7 +131,6 @@ class visualization_bar(visualization_base):
         success = False
 
         self.cc_log("INFO", "Bar visualization type: %s" % self.type)
-        plt.rcParams['figure.figsize'] = (self.figure_size[0], self.figure_size[1])
 
         files = glob.glob(self.src)
 
@@ -120,6 +138,8 @@ class visualization_bar(visualization_base):
             self.cc_log("ERROR", "No files to plot were found - maybe recheck wildcard if defined!")
             return False
 
+        if not self.colormap_exists(self.color_map): return False
+
         if self.type == "histogram":
             success = self.plot_histogram(files)
         elif self.type == "comparedbarplot":
@@ -158,7 +178,7 @@ class visualization_bar(visualization_base):
             ``True`` if the plot was successfully saved.
             ``False`` in case something failed.
 		"""
-        _, ax = plt.subplots()
+        fig, ax = self.new_figure()
         
         file_count, names_list, data_dict = self.get_data_from_files(files)
 
@@ -177,10 +197,10 @@ class visualization_bar(visualization_base):
             custom_colormap = self.get_heat_colormap(data_vals[i]) # Ascending Heat If Activated
 
             if self.horizontal:
-                plt.barh(x_pos, data_vals[i], height=barWidth, color=custom_colormap, edgecolor='white', label=data_keys[i])
+                ax.barh(x_pos, data_vals[i], height=barWidth, color=custom_colormap, edgecolor='white', label=data_keys[i])
                 x_pos = [p + barWidth for p in x_pos]
             else:
-                plt.bar(x_pos, data_vals[i], width=barWidth, color=custom_colormap, edgecolor='white', label=data_keys[i])
+                ax.bar(x_pos, data_vals[i], width=barWidth, color=custom_colormap, edgecolor='white', label=data_keys[i])
                 x_pos = [p + barWidth for p in x_pos]      
         
         #data_keys_expanded = data_keys*file_count
@@ -188,19 +208,19 @@ class visualization_bar(visualization_base):
         #for i in range(1, file_count):
         #    data_keys_expanded[i*len(data_keys)] = data_keys_expanded[i*len(data_keys)] + "\n"+names_list[i]
 
-        plt.xticks([0], names_list, rotation=self.rotate_xticks)
         if self.horizontal:
-            plt.yticks(np.arange(file_count), names_list, rotation=self.rotate_yticks)
+            ax.set_yticks(np.arange(file_count))
+            ax.set_yticklabels(names_list, rotation=self.rotate_yticks)
         else:
-            plt.xticks(np.arange(file_count), names_list, rotation=self.rotate_xticks)
+            ax.set_xticks(np.arange(file_count))
+            ax.set_xticklabels(names_list, rotation=self.rotate_xticks)
 
         ax.set_ylabel(self.y_label, fontweight='bold')
         ax.set_xlabel(self.x_label, fontweight='bold')
         ax.set_title(self.title, fontweight='bold')
         if self.show_legend: ax.legend(data_keys, loc = 'best')
-        if self.show_grid: plt.grid(linestyle='dotted')
-        plt.savefig(self.target, bbox_inches='tight')
-        plt.close('all')
+        if self.show_grid: ax.grid(linestyle='dotted')
+        self.save_figure(fig)
 
         return True
 
@@ -219,7 +239,7 @@ class visualization_bar(visualization_base):
             ``True`` if the plot was successfully saved.
             ``False`` in case something failed.
 		"""
-        _, ax = plt.subplots()
+        fig, ax = self.new_figure()
         
         file_count, names_list, data_dict = self.get_data_from_files(files)
 
@@ -239,24 +259,25 @@ class visualization_bar(visualization_base):
             custom_colormap = self.get_heat_colormap(plot_values) # Ascending Heat If Activated
             
             if self.horizontal:
-                plt.barh(x_pos, plot_values, height=barWidth, color=custom_colormap, edgecolor='white', label=names_list[i])
+                ax.barh(x_pos, plot_values, height=barWidth, color=custom_colormap, edgecolor='white', label=names_list[i])
                 x_pos = [x + barWidth for x in x_pos]
             else:
-                plt.bar(x_pos, plot_values, width=barWidth, color=custom_colormap, edgecolor='white', label=names_list[i])
+                ax.bar(x_pos, plot_values, width=barWidth, color=custom_colormap, edgecolor='white', label=names_list[i])
                 x_pos = [x + barWidth for x in x_pos]
 
         if self.horizontal:
-            plt.yticks(np.arange(len(data_vals)), data_keys, rotation=self.rotate_yticks)
+            ax.set_yticks(np.arange(len(data_vals)))
+            ax.set_yticklabels(data_keys, rotation=self.rotate_yticks)
         else:
-            plt.xticks(np.arange(len(data_vals)), data_keys, rotation=self.rotate_xticks)
+            ax.set_xticks(np.arange(len(data_vals)))
+            ax.set_xticklabels(data_keys, rotation=self.rotate_xticks)
 
         ax.set_ylabel(self.y_label, fontweight='bold')
         ax.set_xlabel(self.x_label, fontweight='bold')
         ax.set_title(self.title, fontweight='bold')
         if self.show_legend: ax.legend(loc = 'best')
-        if self.show_grid: plt.grid(linestyle='dotted')
-        plt.savefig(self.target, bbox_inches='tight')
-        plt.close('all')
+        if self.show_grid: ax.grid(linestyle='dotted')
+        self.save_figure(fig)
 
         return True
 
@@ -275,8 +296,8 @@ class visualization_bar(visualization_base):
             ``True`` if the plot was successfully saved.
             ``False`` in case something failed.
 		"""
-        fig = plt.figure()
-        ax = fig.add_subplot(111, projection='3d')
+        from mpl_toolkits.mplot3d import Axes3D # pylint: disable=unused-import - Registers the 3d projection
+        fig, ax = self.new_figure(projection='3d')
 
         file_count, names_list, data_dict = self.get_data_from_files(files)
 
@@ -308,9 +329,8 @@ class visualization_bar(visualization_base):
         ax.set_ylabel(self.y_label, fontweight='bold')
         ax.set_zlabel(self.z_label, fontweight='bold')
         ax.set_title(self.title, y=1.02, fontweight='bold')
-        if self.show_grid: plt.grid(linestyle='dotted')
-        plt.savefig(self.target, bbox_inches='tight')
-        plt.close('all')
+        if self.show_grid: ax.grid(linestyle='dotted')
+        self.save_figure(fig)
 
         return True
 
@@ -327,7 +347,7 @@ class visualization_bar(visualization_base):
             ``True`` if the plot was successfully saved.
             ``False`` in case something failed.
 		"""
-        _, ax = plt.subplots()
+        fig, ax = self.new_figure()
         
         file_count, names_list, data_dict = self.get_data_from_files(files)
         
@@ -358,19 +378,18 @@ class visualization_bar(visualization_base):
         if self.horizontal:
             ax.set_yticks(np.arange(len(data_keys)))
             ax.set_yticklabels(data_keys, rotation=self.rotate_yticks)
-            if self.scaled_to_100: ax.xaxis.set_major_formatter(FuncFormatter(lambda y, pos: "%d%%" % (y)))
+            if self.scaled_to_100: ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda y, pos: "%d%%" % (y)))
         else:
             ax.set_xticks(np.arange(len(data_keys)))
             ax.set_xticklabels(data_keys, rotation=self.rotate_xticks)
-            if self.scaled_to_100: ax.yaxis.set_major_formatter(FuncFormatter(lambda y, pos: "%d%%" % (y)))
+            if self.scaled_to_100: ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda y, pos: "%d%%" % (y)))
 
         ax.set_ylabel(self.y_label, fontweight='bold')
         ax.set_xlabel(self.x_label, fontweight='bold')
         ax.set_title(self.title, fontweight='bold')
         if self.show_legend: ax.legend(loc = 'best')
-        if self.show_grid: plt.grid(linestyle='dotted')
-        plt.savefig(self.target, bbox_inches='tight')
-        plt.close('all')
+        if self.show_grid: ax.grid(linestyle='dotted')
+        self.save_figure(fig)
 
         return True
 
@@ -388,7 +407,7 @@ class visualization_bar(visualization_base):
             ``True`` if the plot was successfully saved.
             ``False`` in case something failed.
 		"""
-        _, ax = plt.subplots()
+        fig, ax = self.new_figure()
         
         file_count, names_list, data_dict = self.get_data_from_files(files)
         
@@ -416,34 +435,35 @@ class visualization_bar(visualization_base):
             if self.scaled_to_100: single_data_set = [i / j * 100 for i,j in zip(single_data_set, totals)]
 
             if self.horizontal:
-                plts.append(plt.barh(ind, single_data_set, linewidth=0, height=width, left=bottom))
+                plts.append(ax.barh(ind, single_data_set, linewidth=0, height=width, left=bottom))
             else:
-                plts.append(plt.bar(ind, single_data_set, linewidth=0, width=width, bottom=bottom))      
+                plts.append(ax.bar(ind, single_data_set, linewidth=0, width=width, bottom=bottom))      
 
             for i in range(len(single_data_set)):
                 bottom[i] = bottom[i] + single_data_set[i]
 
         if self.horizontal:
-            plt.yticks(ind, names_list, rotation=self.rotate_yticks)
-            if self.scaled_to_100: ax.xaxis.set_major_formatter(FuncFormatter(lambda y, pos: "%d%%" % (y)))
+            ax.set_yticks(ind)
+            ax.set_yticklabels(names_list, rotation=self.rotate_yticks)
+            if self.scaled_to_100: ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda y, pos: "%d%%" % (y)))
         else:
-            plt.xticks(ind, names_list, rotation=self.rotate_xticks)
-            if self.scaled_to_100: ax.yaxis.set_major_formatter(FuncFormatter(lambda y, pos: "%d%%" % (y)))
-
-        plt.ylabel(self.y_label, fontweight='bold')
-        plt.xlabel(self.x_label, fontweight='bold')
-        plt.title(self.title, fontweight='bold')
-        if self.show_legend: plt.legend(plts, data_keys, loc='best', bbox_to_anchor=(1, 0.5))
-        plt.subplots_adjust(right=0.7)
-        if self.show_grid: plt.grid(linestyle='dotted')
-        plt.savefig(self.target, bbox_inches='tight')
-        plt.close('all')
+            ax.set_xticks(ind)
+            ax.set_xticklabels(names_list, rotation=self.rotate_xticks)
+            if self.scaled_to_100: ax.yaxis.set_major_formatter(ticker.FuncFormatter(lambda y, pos: "%d%%" % (y)))
+
+        ax.set_ylabel(self.y_label, fontweight='bold')
+        ax.set_xlabel(self.x_label, fontweight='bold')
+        ax.set_title(self.title, fontweight='bold')
+        if self.show_legend: ax.legend(plts, data_keys, loc='best', bbox_to_anchor=(1, 0.5))
+        fig.subplots_adjust(right=0.7)
+        if self.show_grid: ax.grid(linestyle='dotted')
+        self.save_figure(fig)
         
         return True
 
     def plot_histogram(self, files):
         """
-		Plots a histogram.
+		Plots a histogram. The values are counted into the bins batch by batch, so the memory does not grow with the amount of datasets.
 
 		**Parameters**:
 			files : list
@@ -453,97 +473,77 @@ class visualization_bar(visualization_base):
             ``True`` if the plot was successfully saved.
             ``False`` in case something failed.
 		"""
-        _, ax = plt.subplots()
-        values_list = []
+        fig, ax = self.new_figure()
+        bin_edges = self.get_histogram_bin_edges(files)
+        counts_list = []
         names_list = []
         for file in files:
-            json_fr = json_file_reader(file)
-
-            values = []
-            while not json_fr.isEOF():
-                data = json_fr.readRecord()
-
-                value = data
-                for a in self.data_attribute.split('.'):
-                    value = value[a]
-
-                # Threshold
-                if self.threshold and int(value) < int(self.threshold):
-                    continue # Skip this line as its < threshold
-                
-                values.append(value)
-
-            json_fr.close()
-            values_list.append(values)
+            counts = np.zeros(len(bin_edges) - 1, dtype=np.int64)
+            for values in self.read_histogram_values(file):
+                counts += np.histogram(values, bins=bin_edges)[0]
+            counts_list.append(counts)
             names_list.append(os.path.basename(file))
 
         self.set_color_cycle(len(names_list), ax)
-        ax.hist(values_list, label = names_list, bins=10, edgecolor='white')
+        # Plot the counted bins: one value per bin center weighted with its count
+        bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+        ax.hist([bin_centers] * len(counts_list), bins=bin_edges, weights=counts_list, label = names_list, edgecolor='white')
         ax.set_ylabel(self.y_label, fontweight='bold')
         ax.set_xlabel(self.x_label, fontweight='bold')
         ax.set_title(self.title, fontweight='bold')
         if self.show_legend: ax.legend(loc = 'best')
-        if self.show_grid: plt.grid(linestyle='dotted')
-        plt.savefig(self.target, bbox_inches='tight')
-        plt.close('all')
+        if self.show_grid: ax.grid(linestyle='dotted')
+        self.save_figure(fig)
         
         return True
 
-    def get_data_from_files(self, files):
+    def get_histogram_bin_edges(self, files):
         """
-		Gets and extracts the data from the given fileslist.
+		Returns the edges of the histogram bins, from the configured binRange or the smallest and largest value of the files.
 
 		**Parameters**:
 			files : list
-				list of filepaths to process.
+				list of file paths.
 
         **Returns**:
-            ``file_count, names_list, data_dict`` amount of files, names list of the files, grouped data dict with the values scaled in case of missing data
+            ``ndarray`` with the bins + 1 edges.
 		"""
-        data_dict = {}
-        names_list = []
-        file_count = 0
+        if self.bin_range: return np.linspace(self.bin_range[0], self.bin_range[1], self.bins + 1)
 
+        low, high = None, None
         for file in files:
-            json_fr = json_file_reader(file)
-            while not json_fr.isEOF():
-                json_data = json_fr.readRecord()
-
-                value = json_data
-                for a in self.data_attribute.split('.'):
-                    value = value[a]
+            for values in self.read_histogram_values(file):
+                if not len(values): continue
+                low = values.min() if low is None else min(low, values.min())
+                high = values.max() if high is None else max(high, values.max())
+        return np.histogram_bin_edges(np.array([low, high] if low is not None else []), bins=self.bins)
 
-                # Threshold
-                if self.threshold and int(value) < int(self.threshold):
-                    continue # Skip this line as its < threshold
-
-                group_name = json_data
-                for a in self.group_name_attribute.split('.'):
-                    group_name = group_name[a]
+    def read_histogram_values(self, file):
+        """
+		Reads the values of the data attribute in batches, values below the threshold are left out.
 
-                if group_name in data_dict:
-                    data_dict[group_name].append(value)
-                else:
-                    data_dict[group_name] = [0] * file_count
-                    data_dict[group_name].append(value)
+		**Parameters**:
+			file : str
+				the file path.
 
-            for gn in data_dict:
-                if len(data_dict[gn]) < file_count+1: # Will not be appended as filecount isnt incremented yet, +1 added
-                    data_dict[gn].append(0)
+        **Returns**:
+            Generator of ``ndarray`` with up to ``HISTOGRAM_BATCH_SIZE`` values.
+		"""
+        data_attribute_path = compile_attribute_path(self.data_attribute)
+        json_fr = record_file_reader(file, columns=[self.data_attribute])
+        try:
+            while not json_fr.isEOF():
+                values = []
+                while len(values) < HISTOGRAM_BATCH_SIZE and not json_fr.isEOF():
+                    values.append(data_attribute_path(json_fr.readRecord()))
+                values = np.array(values, dtype=float)
 
+                # Threshold
+                if self.threshold: values = values[np.trunc(values) >= int(self.threshold)] # Skip values < threshold
+                yield values
+        finally:
             json_fr.close()
 
-            # Add filenames list to names list or extract regex if defined
-            name = None
-            if self.filenames_regex_extract:
-                name = re.search(self.filenames_regex_extract, os.path.basename(file))
-                if name: name = name.group(0)
-            if not name: name = os.path.basename(file)
-            names_list.append(name)
-            
-            file_count += 1
-        return file_count, names_list, data_dict
-
     def set_color_cycle(self, amount, ax, colormap_name="tab20"):
         """
 		Sets the color cycle for the plot according to the amount needed.
@@ -558,8 +558,8 @@ class visualization_bar(visualization_base):
                 Default 'tab20'
 		"""
         if self.color_map: colormap_name = self.color_map
-        cmap = plt.get_cmap(colormap_name)
-        ax.set_prop_cycle(plt.cycler('color', cmap(np.linspace(0, 1, amount))))
+        cmap = matplotlib.colormaps[colormap_name]
+        ax.set_prop_cycle(cycler.cycler('color', cmap(np.linspace(0, 1, amount))))
 
     def get_heat_colormap(self, values, colormap="Reds"):
         """
@@ -578,7 +578,7 @@ class visualization_bar(visualization_base):
         if self.color_map: colormap = self.color_map
         if not self.color_map_ascending: return None
         cNorm  = colors.Normalize(vmin=min(values), vmax=max(values))
-        scalarMap = cmx.ScalarMappable(norm=cNorm, cmap=plt.get_cmap(colormap))
+        scalarMap = cmx.ScalarMappable(norm=cNorm, cmap=matplotlib.colormaps[colormap])
         return [scalarMap.to_rgba(v) for v in values] 
 
     def validate(self, kwargs):
@@ -603,6 +603,22 @@ class visualization_bar(visualization_base):
                 int(kwargs.get("threshold"))
             except:
                 raise ValidationError(self, ["threshold"], "Parameter has to be an int!")
+        if kwargs.get("topGroups"):
+            try:
+                if int(kwargs.get("topGroups")) < 1: raise ValueError()
+            except:
+                raise ValidationError(self, ["topGroups"], "Parameter has to be an int greater than zero!")
+        if kwargs.get("bins") is not None:
+            try:
+                if int(kwargs.get("bins")) < 1: raise ValueError()
+            except:
+                raise ValidationError(self, ["bins"], "Parameter has to be an int greater than zero!")
+        if kwargs.get("binRange"):
+            try:
+                if not isinstance(kwargs.get("binRange"), list) or len(kwargs.get("binRange")) != 2: raise ValueError()
+                if float(kwargs.get("binRange")[0]) >= float(kwargs.get("binRange")[1]): raise ValueError()
+            except:
+                raise ValidationError(self, ["binRange"], "Parameter has to be a list of two ascending numbers (E.g. 0, 100)!")
         if kwargs.get("figureSize"):
             if not isinstance(kwargs.get("figureSize"), list) or len(kwargs.get("figureSize")) != 2:
                 raise ValidationError(self, ["figureSize"], "Parameter has to be a list of two (E.g. 20, 10)!")
@@ -616,8 +632,6 @@ class visualization_bar(visualization_base):
                 int(kwargs.get("rotateYTicks"))
             except:
                 raise ValidationError(self, ["rotateYTicks"], "Parameter has to be an int!")
-        if kwargs.get("colormap"):
-            if kwargs.get("colormap") not in plt.colormaps(): raise ValidationError(self, ["colormap"], "Colormap has to be existing, check the matplotlibb docu!")
 
         # Optional
         #if not kwargs.get("title"):
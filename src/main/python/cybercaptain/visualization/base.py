@@ -1,7 +1,16 @@
 """
 This module contains the visualization base class.
 """
+import os
+import re
 from cybercaptain.base import cybercaptain_base
+from cybercaptain.utils.aggregateCache import file_aggregate_cache, assemble_matrix, select_top_groups, DEFAULT_CACHE_DIR
+from cybercaptain.utils.lazyImport import lazy_import
+matplotlib = lazy_import("matplotlib")
+figure = lazy_import("matplotlib.figure")
+
+DEFAULT_FIGURE_SIZE = (20, 10)
+OTHERS_GROUP_NAME = "Others" # Group of the summed values of the groups left out by topGroups
 
 class visualization_base(cybercaptain_base):
     """
@@ -24,6 +33,81 @@ class visualization_base(cybercaptain_base):
 		"""
         raise NotImplementedError("data_visualization: Subclass must implement the run method")
 
+    def new_figure(self, figsize=None, **subplot_kw):
+        """
+		Creates a figure with a single subplot. The figure is independent of the pyplot state and needs no GUI backend,
+		so several plots can be rendered at the same time (E.g. in worker processes).
+
+		**Parameters**:
+			figsize : tuple
+				(Optional) the figure size, defaults to the ``figureSize`` attribute of the child class or (20, 10).
+			subplot_kw : dict
+				(Optional) passed to the subplot (E.g. projection='3d').
+
+        **Returns**:
+            ``fig, ax`` the matplotlib figure and its axes.
+		"""
+        if figsize is None: figsize = getattr(self, "figure_size", None) or DEFAULT_FIGURE_SIZE
+        fig = figure.Figure(figsize=tuple(float(x) for x in figsize))
+        return fig, fig.add_subplot(111, **subplot_kw)
+
+    def save_figure(self, fig):
+        """
+		Saves the figure to the target of the module.
+
+		**Parameters**:
+			fig : matplotlib Figure
+				the figure created with ``new_figure``.
+		"""
+        fig.savefig(self.target, bbox_inches='tight')
+
+    def colormap_exists(self, colormap):
+        """
+		Checks if the colormap is existing in matplotlib. Checked when running and not in the validation, so matplotlib is not imported to validate the config.
+
+		**Parameters**:
+			colormap : str
+				the name of the colormap, ``None`` if not configured.
+
+        **Returns**:
+            ``True`` if the colormap is existing or not configured.
+            ``False`` if the colormap is not existing.
+		"""
+        if not colormap or colormap in matplotlib.colormaps: return True
+        self.cc_log("ERROR", "Colormap (%s) has to be existing, check the matplotlib docu!" % colormap)
+        return False
+
+    def get_data_from_files(self, files):
+        """
+		Gets and extracts the data from the given fileslist with the ``dataAttribute``, ``groupNameAttribute``, ``threshold`` and ``topGroups`` of the child class.
+		The summaries of unchanged files are taken from the aggregate cache, only new or changed files are read.
+
+		**Parameters**:
+			files : list
+				list of filepaths to process.
+
+        **Returns**:
+            ``file_count, names_list, data_dict`` amount of files, names list of the files, grouped data dict with a NumPy row of the values per file, 0 in case of missing data
+		"""
+        cache_dir = os.path.join(self.projectRoot, DEFAULT_CACHE_DIR) if self.projectRoot else None
+        aggregate_cache = file_aggregate_cache(cache_dir)
+        summaries = [aggregate_cache.summarize(file, self.data_attribute, self.group_name_attribute) for file in files]
+        group_names, matrix = assemble_matrix(summaries, self.threshold)
+        group_names, matrix = select_top_groups(group_names, matrix, self.top_groups, OTHERS_GROUP_NAME if self.show_others else None)
+        data_dict = dict(zip(group_names, matrix))
+
+        # Add filenames list to names list or extract regex if defined
+        names_list = []
+        for file in files:
+            name = None
+            if self.filenames_regex_extract:
+                name = re.search(self.filenames_regex_extract, os.path.basename(file))
+                if name: name = name.group(0)
+            if not name: name = os.path.basename(file)
+            names_list.append(name)
+
+        return len(files), names_list, data_dict
+
     def validate(self, kwargs):
         """
         The validate mehtod checks all to processing common attributes and passes this on to the parent class to check CyberCaptain common attributes.
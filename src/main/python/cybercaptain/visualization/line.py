@@ -2,16 +2,17 @@
 This module contains the visualization line class.
 """
 import glob
-import re
-import os
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.colors as colors
-import matplotlib.cm as cmx
 from cybercaptain.utils.exceptions import ValidationError
 from cybercaptain.visualization.base import visualization_base
-from cybercaptain.utils.jsonFileHandler import json_file_reader
 from cybercaptain.utils.helpers import str2bool
+from cybercaptain.utils.seriesDownsampling import lttb_indices
+from cybercaptain.utils.lazyImport import lazy_import
+np = lazy_import("numpy")
+matplotlib = lazy_import("matplotlib")
+colors = lazy_import("matplotlib.colors")
+cmx = lazy_import("matplotlib.cm")
+ticker = lazy_import("matplotlib.ticker")
+cycler = lazy_import("cycler")
 
 class visualization_line(visualization_base):
     """
@@ -42,6 +43,12 @@ class visualization_line(visualization_base):
             define the used markerstyle (Default: solid dot - Reference: https://matplotlib.org/api/_as_gen/matplotlib.pyplot.plot.html)
         threshold:
             possibility to set a value threshold to hide smaller groups for example.
+        topGroups:
+            only plot the given amount of groups with the largest sums over all files (E.g. 20).
+        showOthers:
+            show the summed values of the groups left out by topGroups as an 'Others' group (Defaults to True).
+        maxPoints:
+            downsample lines with more points to the given amount with the LTTB algorithm, peaks and drops are kept (E.g. 500).
         figureSize:
             define a tuple to set the figure size proportion (E.g. '20, 10').
         rotateXTicks:
@@ -52,11 +59,14 @@ class visualization_line(visualization_base):
             normalizes given values and set a color depending on their value (Ascending heat - possible to combine with 'colormap').
             (Supported: None) 
         colormap:
-            set the string for the colormap to be used on the graphs (Reference: https://matplotlib.org/users/colormaps.html).
+            set the string for the colormap to be used on the graphs (Reference: https://matplotlib.org/users/colormaps.html). An unknown colormap is not caught by the validation (``-v``), the run fails instead.
         showGrid:
             show the grid behind the plot (Defaults to False).
         showLegend:
             show the data legend for the chart (Defaults to True).
+
+    The group values per file are cached in memory and in the '.cc_aggregate_cache' folder of the project root,
+    summaries not used for 30 days are removed from the folder (As are the least recently used ones above 256 MiB).
     """
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -74,6 +84,9 @@ class visualization_line(visualization_base):
         self.line_style = kwargs.get("lineStyle", "-")
         self.marker_style = kwargs.get("markerStyle", "o")
         self.threshold = kwargs.get("threshold")
+        self.top_groups = kwargs.get("topGroups")
+        self.show_others = str2bool(kwargs.get("showOthers", True))
+        self.max_points = int(kwargs.get("maxPoints")) if kwargs.get("maxPoints") else None
         self.figure_size = kwargs.get("figureSize", [20, 10])
         self.filenames_regex_extract = kwargs.get("filenamesRegexExtract")
         self.color_map_ascending = kwargs.get("colormapAscending")
@@ -94,7 +107,6 @@ class visualization_line(visualization_base):
         success = False
 
         self.cc_log("INFO", "Line visualization type: %s" % self.type)
-        plt.rcParams['figure.figsize'] = (self.figure_size[0], self.figure_size[1])
        
         files = glob.glob(self.src)
 
@@ -102,6 +114,8 @@ class visualization_line(visualization_base):
             self.cc_log("ERROR", "No files to plot were found - maybe recheck wildcard if defined!")
             return False
 
+        if not self.colormap_exists(self.color_map): return False
+
         if self.type == "groupedlineplot":
             success = self.plot_groupedlineplot(files)
         elif self.type == "comparedlineplot":
@@ -129,7 +143,7 @@ class visualization_line(visualization_base):
             ``True`` if the plot was successfully saved.
             ``False`` in case something failed.
 		"""
-        _, ax = plt.subplots()
+        fig, ax = self.new_figure()
 
         file_count, names_list, data_dict = self.get_data_from_files(files)
 
@@ -142,20 +156,18 @@ class visualization_line(visualization_base):
 
         self.set_color_cycle(len(data_keys), ax)
 
-        ticks = np.arange(len(data_keys))
         for i in range(file_count):
             plot_values = [ x[i] for x in data_vals ]
             #custom_colormap = self.get_heat_colormap(plot_values) # Ascending Heat If Activated
-            plt.plot(ticks, plot_values, linestyle=self.line_style, marker=self.marker_style, label = names_list[i])
+            self.plot_series(ax, plot_values, names_list[i])
 
-        plt.xticks(ticks, data_keys, rotation=self.rotate_xticks)
+        self.set_index_ticks(ax, data_keys)
         ax.set_ylabel(self.y_label, fontweight='bold')
         ax.set_xlabel(self.x_label, fontweight='bold')
         ax.set_title(self.title, fontweight='bold')
         if self.show_legend: ax.legend(loc = 'best')
-        if self.show_grid: plt.grid(linestyle='dotted')
-        plt.savefig(self.target, bbox_inches='tight')
-        plt.close('all')
+        if self.show_grid: ax.grid(linestyle='dotted')
+        self.save_figure(fig)
 
         return True
 
@@ -171,7 +183,7 @@ class visualization_line(visualization_base):
             ``True`` if the plot was successfully saved.
             ``False`` in case something failed.
 		"""
-        _, ax = plt.subplots()
+        fig, ax = self.new_figure()
 
         file_count, names_list, data_dict = self.get_data_from_files(files)
 
@@ -186,21 +198,53 @@ class visualization_line(visualization_base):
 
         for i in range(len(data_keys)):
             #custom_colormap = self.get_heat_colormap(data_vals[i]) # Ascending Heat If Activated
-            #plt.scatter(np.arange(file_count), data_vals[i], cmap=custom_colormap, vmin=min(data_vals[i]),vmax=max(data_vals[i]) )
-            plt.plot(np.arange(file_count), data_vals[i], linestyle=self.line_style, marker=self.marker_style, label = data_keys[i])
+            #ax.scatter(np.arange(file_count), data_vals[i], cmap=custom_colormap, vmin=min(data_vals[i]),vmax=max(data_vals[i]) )
+            self.plot_series(ax, data_vals[i], data_keys[i])
 
-        plt.xticks(np.arange(file_count), names_list, rotation=self.rotate_xticks)
+        self.set_index_ticks(ax, names_list)
        
         ax.set_ylabel(self.y_label, fontweight='bold')
         ax.set_xlabel(self.x_label, fontweight='bold')
         ax.set_title(self.title, fontweight='bold')
         if self.show_legend: ax.legend(loc = 'best')
-        if self.show_grid: plt.grid(linestyle='dotted')
-        plt.savefig(self.target, bbox_inches='tight')
-        plt.close('all')
+        if self.show_grid: ax.grid(linestyle='dotted')
+        self.save_figure(fig)
 
         return True
 
+    def plot_series(self, ax, values, label):
+        """
+		Plots a line over the indexes of the values, lines with more than ``maxPoints`` points are downsampled.
+
+		**Parameters**:
+			ax : MatplotLib Axes Object
+				the axes subplot object to plot on.
+			values : list
+				the values of the line.
+			label : str
+				the label of the line.
+		"""
+        indices = lttb_indices(values, self.max_points) if self.max_points else np.arange(len(values))
+        ax.plot(indices, np.asarray(values)[indices], linestyle=self.line_style, marker=self.marker_style, label = label)
+
+    def set_index_ticks(self, ax, names):
+        """
+		Sets the names as the x-ticks. If the lines are downsampled only a part of the names is shown.
+
+		**Parameters**:
+			ax : MatplotLib Axes Object
+				the axes subplot object to set the ticks on.
+			names : list
+				the names of the indexes.
+		"""
+        if not self.max_points or len(names) <= self.max_points:
+            ax.set_xticks(np.arange(len(names)))
+            ax.set_xticklabels(names, rotation=self.rotate_xticks)
+            return
+        ax.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
+        ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, pos: names[int(x)] if 0 <= x < len(names) else ""))
+        ax.tick_params(axis='x', labelrotation=self.rotate_xticks)
+
     def set_color_cycle(self, amount, ax, colormap_name="tab20"):
         """
 		Sets the color cycle for the plot according to the amount needed.
@@ -215,8 +259,8 @@ class visualization_line(visualization_base):
                 Default 'tab20'
 		"""
         if self.color_map: colormap_name = self.color_map
-        cmap = plt.get_cmap(colormap_name)
-        ax.set_prop_cycle(plt.cycler('color', cmap(np.linspace(0, 1, amount))))
+        cmap = matplotlib.colormaps[colormap_name]
+        ax.set_prop_cycle(cycler.cycler('color', cmap(np.linspace(0, 1, amount))))
 
     def get_heat_colormap(self, values, colormap="Reds"):
         """
@@ -235,64 +279,9 @@ class visualization_line(visualization_base):
         if self.color_map: colormap = self.color_map
         if not self.color_map_ascending: return None
         cNorm  = colors.Normalize(vmin=min(values), vmax=max(values))
-        scalarMap = cmx.ScalarMappable(norm=cNorm, cmap=plt.get_cmap(colormap))
+        scalarMap = cmx.ScalarMappable(norm=cNorm, cmap=matplotlib.colormaps[colormap])
         return [scalarMap.to_rgba(v) for v in values] 
 
-    def get_data_from_files(self, files):
-        """
-		Gets and extracts the data from the given fileslist.
-
-		**Parameters**:
-			files : list
-				list of filepaths to process.
-
-        **Returns**:
-            ``file_count, names_list, data_dict`` amount of files, names list of the files, grouped data dict with the values scaled in case of missing data
-		"""
-        data_dict = {}
-        names_list = []
-        file_count = 0
-
-        for file in files:
-            json_fr = json_file_reader(file)
-            while not json_fr.isEOF():
-                json_data = json_fr.readRecord()
-
-                value = json_data
-                for a in self.data_attribute.split('.'):
-                    value = value[a]
-
-                # Threshold
-                if self.threshold and int(value) < int(self.threshold):
-                    continue # Skip this line as its < threshold
-
-                group_name = json_data
-                for a in self.group_name_attribute.split('.'):
-                    group_name = group_name[a]
-
-                if group_name in data_dict:
-                    data_dict[group_name].append(value)
-                else:
-                    data_dict[group_name] = [0] * file_count
-                    data_dict[group_name].append(value)
-
-            for gn in data_dict:
-                if len(data_dict[gn]) < file_count+1: # Will not be appended as filecount isnt incremented yet, +1 added
-                    data_dict[gn].append(0)
-
-            json_fr.close()
-
-            # Add filenames list to names list or extract regex if defined
-            name = None
-            if self.filenames_regex_extract:
-                name = re.search(self.filenames_regex_extract, os.path.basename(file))
-                if name: name = name.group(0)
-            if not name: name = os.path.basename(file)
-            names_list.append(name)
-            
-            file_count += 1
-        return file_count, names_list, data_dict
-
     def validate(self, kwargs):
         """
         The validate method checks if all the input arguments are corret.
@@ -315,6 +304,16 @@ class visualization_line(visualization_base):
                 int(kwargs.get("threshold"))
             except:
                 raise ValidationError(self, ["threshold"], "Parameter has to be an int!")
+        if kwargs.get("topGroups"):
+            try:
+                if int(kwargs.get("topGroups")) < 1: raise ValueError()
+            except:
+                raise ValidationError(self, ["topGroups"], "Parameter has to be an int greater than zero!")
+        if kwargs.get("maxPoints"):
+            try:
+                if int(kwargs.get("maxPoints")) < 3: raise ValueError()
+            except:
+                raise ValidationError(self, ["maxPoints"], "Parameter has to be an int of at least 3!")
         if kwargs.get("figureSize"):
             if not isinstance(kwargs.get("figureSize"), list) or len(kwargs.get("figureSize")) != 2:
                 raise ValidationError(self, ["figureSize"], "Parameter has to be a list of two (E.g. 20, 10)!")
@@ -323,8 +322,6 @@ class visualization_line(visualization_base):
                 int(kwargs.get("rotateXTicks"))
             except:
                 raise ValidationError(self, ["rotateXTicks"], "Parameter has to be an int!")
-        if kwargs.get("colormap"):
-            if kwargs.get("colormap") not in plt.colormaps(): raise ValidationError(self, ["colormap"], "Colormap has to be existing, check the matplotlibb docu!")
   
         # Optional
         #if not kwargs.get("title"):
@@ -2,14 +2,14 @@
 This module contains the visualization map class.
 """
 import os
-import pandas as gpf
-import geopandas as gpd
-import matplotlib.pyplot as plt
-import iso3166
 from cybercaptain.utils.helpers import str2bool
-from cybercaptain.utils.jsonFileHandler import json_file_reader
+from cybercaptain.utils.columnarFileHandler import record_file_reader
+from cybercaptain.utils.geometryCache import load_geometry, DEFAULT_CACHE_DIR
+from cybercaptain.utils.attributePath import compile_attribute_path
 from cybercaptain.utils.exceptions import ValidationError, ConfigurationError
 from cybercaptain.visualization.base import visualization_base
+from cybercaptain.utils.lazyImport import lazy_import
+iso3166 = lazy_import("iso3166")
 
 EUROPE_GEOJSON  =   os.path.join(os.path.dirname(__file__), "assets/europe.geojson")
 WORLD_GEOJSON   =   os.path.join(os.path.dirname(__file__), "assets/world.geojson")
@@ -36,9 +36,9 @@ class visualization_map(visualization_base):
         countryCodeAttribute: str
             the json attribute name where the country code can be found (E.g. 'location.code' will look in the given src and json line for the nested ["location"]["code"]).
         groupedValueAttribute: str
-            the json attribute name where the grouped value (int) can be found (E.g. 'vulns.count' will look in the given src and json line for the nested ["vulns"]["count"]).
+            the json attribute name where the grouped value (int) can be found (E.g. 'vulns.count' will look in the given src and json line for the nested ["vulns"]["count"]). The values of datasets with the same country are summed, so ungrouped datasets can be plotted directly.
         colormap: str
-            the selected matplotlib colormap name (https://matplotlib.org/examples/color/colormaps_reference.html).
+            the selected matplotlib colormap name (https://matplotlib.org/examples/color/colormaps_reference.html). An unknown colormap is not caught by the validation (``-v``), the run fails instead.
         displayLegend: bool
             enable to display the colorbased legend on the plot.
         displayLabels: bool
@@ -47,14 +47,16 @@ class visualization_map(visualization_base):
             configure the grouped value threshold to show the label.
         title: str
             configure the title to show.
+        simplifyTolerance: float
+            (Optional) simplify the shapes with this tolerance in degrees to plot faster (E.g. 0.05).
+
+    The parsed map geometry is cached per GeoJSON content in memory and in the '.cc_map_cache' folder of the project root.
         
     """
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.validate(kwargs)
 
-        self.alpha2_country_codes = iso3166.countries_by_alpha2
-
         # If subclass needs special variables define here
         self.selected_map = kwargs.get("map") # Currently supported: 'europe', 'world'
         self.geojson_map = self.get_geojson_for_attribute(kwargs.get("map"))
@@ -69,6 +71,7 @@ class visualization_map(visualization_base):
         self.display_labels = str2bool(kwargs.get("displayLabels"))
         self.labels_threshold = kwargs.get("labelsThreshold")
         self.title = kwargs.get("title")
+        self.simplify_tolerance = float(kwargs.get("simplifyTolerance", 0))
 
 
     def run(self):
@@ -80,6 +83,7 @@ class visualization_map(visualization_base):
             ``False`` if the run was not successful.
         """
         self.cc_log("INFO", "Data Visualization Map: Started")
+        if not self.colormap_exists(self.colormap): return False
 
         try:
             if self.type == "heatmap":
@@ -105,58 +109,18 @@ class visualization_map(visualization_base):
             ``True`` if the target with the plot was successfully written.
             ``False`` if the plot was not written to the target and it failed.
         """
-        plt.rcParams['figure.figsize'] = (20, 10)
-
         self.cc_log("DEBUG", "Trying to read %s gejson file" % self.geojson_map)
-        gp_map = gpd.read_file(self.geojson_map)
+        cache_dir = os.path.join(self.projectRoot, DEFAULT_CACHE_DIR) if self.projectRoot else None
+        gp_map = load_geometry(self.geojson_map, cache_dir, self.simplify_tolerance) # Parsed once, with the centroids of all shapes
 
-        gp_map['grouped_value'] = 0 # Init all shapes on the map with a grouped_value of 0
-        gp_map['centroid'] = gp_map['geometry'].centroid # Set the center value on all shapes for labels
+        # Read the source once and aggregate the grouped values per country before they are set on the map
+        country_values = self.aggregate_country_values()
+        if country_values is None: return False
 
-        # Loop through source file and read the given country code & grouped value attributes and set them on the map
-        self.cc_log("DEBUG", "Trying to read %s src file" % self.src)
-        json_fr = json_file_reader(self.src)
-
-        self.cc_log("DEBUG", "Creating the heatmap...")
-        while not json_fr.isEOF():
-            data = json_fr.readRecord()
-
-            country_code = data
-            for a in self.country_code_attribute.split('.'):
-                country_code = country_code[a]
-
-            grouped_value = data
-            for a in self.grouped_value_attribute.split('.'):
-                grouped_value = grouped_value[a]
-
-            # Geopandas method to set the grouped value to where the given country code matches
-            
-            # Check country code if ISO_A2 or ISO_A3 or undefined (-99) or something else
-            country_code = str(country_code)
-            if country_code == "-99" or country_code == "null" or country_code == "None":
-                self.cc_log("WARNING", "There is an undefined country code, we skip this dataset - Please recheck to have an accurate plot!")
-                continue
-
-            if len(country_code) > 3 or len(country_code) < 2:
-                self.cc_log("ERROR", "The given country code (%s) has a length of %s which is not a valid iso3166_A3 or iso3166_A2 code - Please recheck!" % (country_code, len(country_code)))
-                return False
-
-            if len(country_code) == 2:
-                # ISO_A2 Code - Try to convert
-                country_code_old = country_code
-                if country_code not in self.alpha2_country_codes:
-                    self.cc_log("WARNING", "There given iso3166 alpha2 code (%s) does not match any alpha3 code, we skip this dataset - Please recheck to have an accurate plot!" % (country_code))
-                    continue
-
-                country_code = self.alpha2_country_codes[country_code].alpha3
-                self.cc_log("DEBUG", "Converted alpha2 country code '%s' to alpha3 code '%s'" % (country_code_old, country_code))
-
-            gp_map.loc[gp_map['ISO_A3'] == country_code, 'grouped_value'] = int(grouped_value)
-
-        json_fr.close()
+        gp_map['grouped_value'] = gp_map['ISO_A3'].map(country_values).fillna(0).astype(int) # Shapes without a value get a grouped_value of 0
 
         # Plot the map
-        fig, ax = plt.subplots(1)
+        fig, ax = self.new_figure(figsize=(20, 10))
         gp_map.plot(ax=ax, column='grouped_value', cmap=self.colormap, edgecolor='black', linewidth=0.2, legend=self.display_legend)
 
         self.cc_log("DEBUG", "Heatmap created!")
@@ -173,15 +137,88 @@ class visualization_map(visualization_base):
             ax.axis('off')
 
         if self.title:
-            plt.title(self.title)
+            ax.set_title(self.title)
 
         # Save the plot to the given target
-        fig.savefig(self.target, bbox_inches='tight')
-        plt.close('all')
+        self.save_figure(fig)
 
         self.cc_log("INFO", 'Data Visualization Map: Finished Run Heatmap Success')
         return True
 
+    def aggregate_country_values(self):
+        """
+        Reads the country code and grouped value attributes of the src and sums the grouped values per ISO 3166-1 alpha-3 country code.
+
+        **Returns**:
+            ``dict`` with the alpha-3 country codes and their summed grouped value.
+            ``None`` if the src contains an invalid country code.
+        """
+        self.cc_log("DEBUG", "Trying to read %s src file" % self.src)
+        json_fr = record_file_reader(self.src, columns=[self.country_code_attribute, self.grouped_value_attribute])
+        country_code_path = compile_attribute_path(self.country_code_attribute)
+        grouped_value_path = compile_attribute_path(self.grouped_value_attribute)
+
+        self.cc_log("DEBUG", "Creating the heatmap...")
+        country_values = {}
+        converted_codes = {} # Country code of the src -> alpha-3 code or None to skip, each code is only checked once
+        skipped = 0
+        try:
+            while not json_fr.isEOF():
+                data = json_fr.readRecord()
+                country_code = str(country_code_path(data))
+
+                if country_code not in converted_codes:
+                    converted_codes[country_code] = self.convert_country_code(country_code)
+                alpha3_code = converted_codes[country_code]
+                if alpha3_code is None:
+                    skipped += 1
+                    continue
+
+                country_values[alpha3_code] = country_values.get(alpha3_code, 0) + int(grouped_value_path(data))
+        except ValueError as e:
+            self.cc_log("ERROR", str(e))
+            return None
+        finally:
+            json_fr.close()
+
+        if skipped: self.cc_log("WARNING", "Skipped %d datasets with an undefined or unknown country code - Please recheck to have an accurate plot!" % skipped)
+        return country_values
+
+    def convert_country_code(self, country_code):
+        """
+        Converts the country code of the src to an ISO 3166-1 alpha-3 code.
+
+        **Parameters**:
+            country_code : str
+                ISO 3166-1 alpha-2 or alpha-3 country code.
+
+        **Returns**:
+            ``str`` the alpha-3 country code.
+            ``None`` if the country code is undefined (-99) or an unknown alpha-2 code.
+
+        **Raises**:
+            ``ValueError`` if the country code is neither an alpha-2 nor an alpha-3 code.
+        """
+        # Check country code if ISO_A2 or ISO_A3 or undefined (-99) or something else
+        if country_code == "-99" or country_code == "null" or country_code == "None":
+            self.cc_log("WARNING", "There is an undefined country code, we skip these datasets - Please recheck to have an accurate plot!")
+            return None
+
+        if len(country_code) > 3 or len(country_code) < 2:
+            raise ValueError("The given country code (%s) has a length of %s which is not a valid iso3166_A3 or iso3166_A2 code - Please recheck!" % (country_code, len(country_code)))
+
+        if len(country_code) == 2:
+            # ISO_A2 Code - Try to convert
+            if country_code not in iso3166.countries_by_alpha2:
+                self.cc_log("WARNING", "There given iso3166 alpha2 code (%s) does not match any alpha3 code, we skip these datasets - Please recheck to have an accurate plot!" % (country_code))
+                return None
+
+            alpha3_code = iso3166.countries_by_alpha2[country_code].alpha3
+            self.cc_log("DEBUG", "Converted alpha2 country code '%s' to alpha3 code '%s'" % (country_code, alpha3_code))
+            return alpha3_code
+
+        return country_code
+
     def get_geojson_for_attribute(self, attribute):
         """
         Get the source for the geojson file according to the map location attribute.
@@ -223,7 +260,11 @@ class visualization_map(visualization_base):
             if not kwargs.get("countryCodeAttribute"): raise ValidationError(self, ["countryCodeAttribute"], "Parameter cannot be empty!")
             if not kwargs.get("groupedValueAttribute"): raise ValidationError(self, ["groupedValueAttribute"], "Parameter cannot be empty!")
             if not kwargs.get("colormap"): raise ValidationError(self, ["colormap"], "Parameter cannot be empty!")
-            if kwargs.get("colormap") not in plt.colormaps(): raise ValidationError(self, ["colormap"], "Colormap has to be existing, check the matplotlibb docu!")
+            if kwargs.get("simplifyTolerance"):
+                try:
+                    if float(kwargs.get("simplifyTolerance")) < 0: raise ValueError()
+                except (ValueError, TypeError):
+                    raise ValidationError(self, ["simplifyTolerance"], "Parameter has to be a positive number!")
             if kwargs.get("labelsThreshold"):
                 try:
                     int(kwargs.get("labelsThreshold"))
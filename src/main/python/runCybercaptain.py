@@ -10,6 +10,7 @@ import sys
 import time
 import logging
 import glob
+import functools
 
 from configobj import ConfigObj, ConfigObjError
 
@@ -19,6 +20,9 @@ from cybercaptain.utils.logging import setup_logger, shutdown_logger
 from cybercaptain.utils.exceptions import ValidationError, ConfigurationError
 from cybercaptain.utils.kvStore import kv_store
 from cybercaptain.utils.pathVisualizer import run_path_visualisation
+from cybercaptain.utils.taskPrefetcher import task_prefetcher
+from cybercaptain.utils.apiCache import api_cache
+from cybercaptain.utils.renderPool import render_pool
 
 DEFAULT_MODULES_CONFIG_FILE = "modules.ccc" # Default modules config file name
 DEFAULT_MODULES_CONFIG_PATH = os.path.dirname(os.path.realpath(__file__)) + "/" +DEFAULT_MODULES_CONFIG_FILE # Default modules config location
@@ -73,6 +77,7 @@ class CyberCaptain:
 		self.overwritechecksum = overwritechecksum
 		self.ignoreChecksum = ignoreChecksum
 		self.pathVisualize = pathVisualize
+		self.debug = debug
 
 		self.loaded_conf = None
 		self.loaded_modules_conf = None
@@ -155,16 +160,26 @@ class CyberCaptain:
 		if not os.path.isdir(config['projectRoot']):
 			raise ConfigurationError("The projectRoot path seems to not be existing - please create!")
 
+		# Validate the amount of render processes for the visualizations
+		if "renderProcesses" in config:
+			try:
+				if int(config["renderProcesses"]) < 0: raise ValueError()
+			except ValueError:
+				raise ConfigurationError("Please define renderProcesses as a positive number or 0 to render in the runner process!")
+
 		# Validate modules config
 		if "restricted_target_modules" not in modules_config: modules_config["restricted_target_modules"] = []
 		if "wildcard_src_modules" not in modules_config: modules_config["wildcard_src_modules"] = []
+		if "directory_src_modules" not in modules_config: modules_config["directory_src_modules"] = []
 		
 		# Validate sources and targets
 		all_sources = [config[s]["src"] for s in config.sections if "src" in config[s]]
 		all_targets = [config[s]["target"] for s in config.sections]
+		directory_sources = [config[s]["src"] for s in config.sections if "src" in config[s] and self.is_directory_src(s, config[s]["src"], modules_config)]
 
 		# Validate if all sources and targets have a file extension - introduced by #72 to be able to inject placeholder ourselves
-		if not self.paths_have_file_extensions(all_sources): raise ConfigurationError("Please define a file extension for all sources!")
+		# Existing directories as the SRC of the directory src modules are the exception, as they are read and never generated
+		if not self.paths_have_file_extensions([src for src in all_sources if src not in directory_sources]): raise ConfigurationError("Please define a file extension for all sources!")
 		if not self.paths_have_file_extensions(all_targets): raise ConfigurationError("Please define a file extension for all targets!")
 
 		if len(all_targets) != len(set(all_targets)):
@@ -187,10 +202,10 @@ class CyberCaptain:
 			if s_module.lower() in modules_config["restricted_target_modules"] and config[s]["target"] in all_sources: # Special rules for the restricted modules
 				raise ConfigurationError("The configured module (%s) is a restricted module but its TARGET is used as a SRC in another module!" % (s_module.lower()))
 		
-			if (s_module.lower() not in modules_config["no_src_modules"]) and (not fileExists(config[s]["src"])): # File does not exist already
+			if (s_module.lower() not in modules_config["no_src_modules"]) and (not fileExists(config[s]["src"])) and (config[s]["src"] not in directory_sources): # File or read directory does not exist already
 				if config[s]["src"] not in all_targets and not is_valid_url(config[s]["src"]): # File will never be generated but also check if its a URL as there isnt ever a file if URL
 					if s_module.lower() in modules_config["wildcard_src_modules"]: # Special rules for the wildcard SRC modules
-						if len(fnmatch.filter(all_targets, config[s]["src"])) <= 0 and len(glob.glob(config[s]["src"])) <= 0: # Check all targets for a matching file with the wildcard source
+						if len(fnmatch.filter(all_targets, config[s]["src"])) <= 0 and len(glob.glob(config[s]["src"], recursive=True)) <= 0: # Check all targets for a matching file with the wildcard source
 							raise ConfigurationError("Wildcard matching source file (%s) will never be generated (or file does not exist as a TARGET or module not defined as a wildcard_src_modules in the modules config), please recheck!" % (config[s]["src"]))
 					else:
 						raise ConfigurationError("Source file (%s) will never be generated (or file does not exist as a TARGET or module not defined as a wildcard_src_modules in the modules config or if its a first module the src might be not existing), please recheck!" % (config[s]["src"]))
@@ -244,11 +259,26 @@ class CyberCaptain:
 		self.logger.info("[CC-RUN] - Detected %s path(s)!" % (len(task_paths)))
 
 		task_paths_counter = 0
+		api_cache.clear_memory() # API responses are shared between the modules of a single run
+		prefetcher = task_prefetcher() # Issue 72 - Runs the store tasks of injected paths in the background
+		render_processes = int(config.get("renderProcesses", 0)) # Opt-in, by default the visualizations are rendered in the runner process
+		renderer = render_pool(render_processes, self.debug, self.get_log_location()) if render_processes > 0 else None # Visualizations are rendered in worker processes
 		while task_paths_counter < len(task_paths):
 			self.logger.info("[CC-RUN] - Running Path: %s" % " -> ".join(list(reversed(task_paths[task_paths_counter]))))
 			for n in list(reversed(task_paths[task_paths_counter])): # Reverse the task list and start from top to bottom
 				s_module, s_name, *identifier = n.split(" ")
 
+				# Task is fetched in the background - wait for it, the target exists afterwards and the task is skipped below
+				if prefetcher.is_prefetched(n):
+					try:
+						if not prefetcher.wait(n):
+							self.logger.warning("[CC-RUN] - Prefetched task %s did not run successfully or was skipped - rest of the path will be skipped. Please recheck!" % n)
+							break
+					except Exception as e:
+						self.logger.exception(e)
+						self.logger.error("[CC-RUN] - Fatal error in prefetched task %s - skip the path!" % n)
+						break
+
 				module = self.get_class_by_module_conf_key(modules_conf[s_module])(**{**config[n], **root_confs, **{'moduleName': s_name}}) # Module for respective task & Issue 67 - root confs & moduleName appended
 
 				if not module.target_exists():
@@ -273,11 +303,18 @@ class CyberCaptain:
 						if additional_paths:
 							self.logger.info("[CC-RUN] - Extending the current run with %d additional path(s)" % len(additional_paths))
 							task_paths.extend(additional_paths)
+							self.prefetch_additional_paths(prefetcher, additional_paths, config, root_confs, modules_conf, module)
 							# Append the current task we are on to the newly injected paths ending as we need to process the injected first
 							task_paths.append(task_paths[task_paths_counter])
 							self.logger.info("[CC-RUN] - This current path will be skipped and run after the additional paths!")
 							break # Skip this path - As it will be run at the end again
 							
+						# Visualization targets are never a src of another task, the path continues while the plot is rendered
+						if renderer and "new_figure" in dir(module):
+							self.logger.info("[CC-RUN] - Task %s is rendered in a worker process" % n)
+							renderer.submit(n, modules_conf[s_module], {**config[n], **root_confs, **{'moduleName': s_name}})
+							continue
+
 						if not module.pre_check(): # Issue 71 - Precheck
 							self.logger.error("[CC-RUN] - Task %s did not pass the pre check - rest of the path will be skipped. Please recheck!" % n)
 							break # Module pre check did not return true, skip path and log incident
@@ -296,6 +333,10 @@ class CyberCaptain:
 			self.logger.info("[CC-RUN] - Path finished!")
 			task_paths_counter += 1
 
+		prefetcher.shutdown()
+		if renderer:
+			renderer.wait()
+			renderer.shutdown()
 		self.logger.info("[CC-RUN] - >> CyberCaptain finished!")
 
 	def get_all_task_paths(self, config, modules_conf):
@@ -415,6 +456,43 @@ class CyberCaptain:
 			self.logger.debug("[CC-RUN] - Module task [%s] does not offer additional paths" % task_name)
 			return None
 
+	def prefetch_additional_paths(self, prefetcher, additional_paths, config, root_confs, modules_conf, module):
+		"""
+		This method starts to run the store tasks of injected additional paths in the background if the module offers the prefetch_additional_tasks functionality.
+		The paths are still run one after another, the downstream tasks of an already fetched path can run while the following datasets are fetched.
+
+		**Parameters**: 
+		prefetcher: task_prefetcher
+			the prefetcher of the current run.
+		additional_paths: list
+			the additional paths returned by check_and_get_additional_paths.
+		config: dict
+			the loaded script config file.
+		root_confs: dict
+			the root config variables passed to the modules.
+		modules_conf: dict
+			the loaded modules config file.
+		module: obj
+			the module which injected the additional paths.
+
+		**Returns**:
+			``True`` if the store tasks are prefetched. ``False`` if the module does not allow prefetching.
+		"""
+		if "prefetch_additional_tasks" not in dir(module): return False
+		prefetch = module.prefetch_additional_tasks() # Dict with {"parallelism": INT, "rate": TASKS_PER_MINUTE}
+		if not prefetch: return False
+
+		tasks = {}
+		for additional_path in additional_paths:
+			task_name = additional_path[-1] # Paths are reversed, the injected store task is the last one
+			s_module, s_name, *identifier = task_name.split(" ")
+			module_class = self.get_class_by_module_conf_key(modules_conf[s_module])
+			tasks[task_name] = functools.partial(module_class, **{**config[task_name], **root_confs, **{'moduleName': s_name}})
+
+		self.logger.info("[CC-RUN] - Prefetching %d additional task(s) with %d in parallel" % (len(tasks), prefetch["parallelism"]))
+		prefetcher.submit(tasks, prefetch["parallelism"], prefetch.get("rate"))
+		return True
+
 	def append_project_root_path_walker(self, section, key):
 		"""
 		This method is used for the configobj walker to go through the whole file (section and keys) and append the project root paths to target and sources.
@@ -597,6 +675,24 @@ class CyberCaptain:
 		return (module_name.split(" ")[0] in modules_conf["wildcard_src_modules"])
 
 
+	def is_directory_src(self, section_name, src, modules_conf):
+		"""
+		This method returns a boolean if the SRC is an existing directory of a module registered as a directory src module in the module config.
+
+		**Parameters**: 
+		section_name: str
+			the key of the section containing the module name.
+		src: str
+			the SRC of the section.
+		modules_conf: configObj
+			is the loaded modules config configObj.
+
+		**Returns**: 
+      		``True`` if the SRC is a directory read by a directory src module and ``False`` if not.
+		"""
+		return (section_name.split(" ")[0].lower() in modules_conf["directory_src_modules"]) and os.path.isdir(src)
+
+
 	def checksum_check(self, project_name, project_path, ccs_path):
 		"""
 		This method returns a boolean if the checksum of the script config file matches the previous run or if it has changed.
@@ -613,18 +709,23 @@ class CyberCaptain:
 
 			curr_checksum = make_sha1(content)
 
-			if self.overwritechecksum:
-				self.logger.warning("[CC-RUN] - Checksum overwritting flag set, set from  %s to %s" % (store.get("projectChecksum"), curr_checksum))
-				store.put(key="projectChecksum", value=curr_checksum, force=True)
+			# Check and set the checksum atomically as another CyberCaptain process might run on the same project
+			try:
+				with store.transaction():
+					if self.overwritechecksum:
+						self.logger.warning("[CC-RUN] - Checksum overwritting flag set, set from  %s to %s" % (store.get("projectChecksum"), curr_checksum))
+						store.put(key="projectChecksum", value=curr_checksum, force=True)
 
-			prev_checksum = store.get("projectChecksum")
+					prev_checksum = store.get("projectChecksum")
 
-			if prev_checksum is not None and prev_checksum != curr_checksum:
-				self.logger.warning("[CC-RUN] - The project script config checksum does not match (Old: %s - New: %s)" %(prev_checksum, curr_checksum))
-				if not self.ignoreChecksum: return False
-				self.logger.warning("[CC-RUN] - We are ignoring the checksum check!")
-			else:
-				store.put(key="projectChecksum", value=curr_checksum, force=True)
+					if prev_checksum is not None and prev_checksum != curr_checksum:
+						self.logger.warning("[CC-RUN] - The project script config checksum does not match (Old: %s - New: %s)" %(prev_checksum, curr_checksum))
+						if not self.ignoreChecksum: return False
+						self.logger.warning("[CC-RUN] - We are ignoring the checksum check!")
+					else:
+						store.put(key="projectChecksum", value=curr_checksum, force=True)
+			finally:
+				store.close()
 			self.logger.info("[CC-RUN] - Script config checksum check finished!")
 			return True
 		else:
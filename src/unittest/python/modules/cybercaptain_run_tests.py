@@ -1,10 +1,12 @@
 import unittest, os, shutil
 import argparse
+from unittest.mock import patch
 
 from runCybercaptain import CyberCaptain, create_parser, main as ccMain
 from configobj import ConfigObjError
 
 from cybercaptain.utils.exceptions import ValidationError, ConfigurationError
+from cybercaptain.utils.kvStore import kv_store
 
 TEST_OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), 'assets/output')
 TEST_INPUT_FOLDER = os.path.join(os.path.dirname(__file__), 'assets')
@@ -23,6 +25,8 @@ TESTDATA_CONFIG_SCRIPT_NVALID_REST_TRGT = os.path.join(TESTDATA_CONFIG_FOLDER, '
 TESTDATA_CONFIG_SCRIPT_NVALID_WC_NCREATED = os.path.join(TESTDATA_CONFIG_FOLDER, 'script_not_valid_wildcard_ncreated.ccs')
 TESTDATA_CONFIG_SCRIPT_VALID_OVERWRITTING = os.path.join(TESTDATA_CONFIG_FOLDER, 'script_valid_overwrittings.ccs')
 TESTDATA_CONFIG_SCRIPT_VALID_WC = os.path.join(TESTDATA_CONFIG_FOLDER, 'script_valid_wc_test.ccs')
+TESTDATA_CONFIG_SCRIPT_VALID_LOCAL_DIR = os.path.join(TESTDATA_CONFIG_FOLDER, 'script_valid_local_directory.ccs')
+TESTDATA_CONFIG_SCRIPT_VALID_LOCAL_GLOB = os.path.join(TESTDATA_CONFIG_FOLDER, 'script_valid_local_glob.ccs')
 TESTDATA_CONFIG_SCRIPT_VALID_TESTRUN = os.path.join(TESTDATA_CONFIG_FOLDER, 'script_valid_testrun.ccs')
 TESTDATA_CONFIG_SCRIPT_NVALID_TRGTNOTUSED = os.path.join(TESTDATA_CONFIG_FOLDER, 'script_not_valid_target_notused.ccs')
 
@@ -130,6 +134,14 @@ class CyberCaptainRunTest(unittest.TestCase):
         # Wildcard Source And In Target
         cc10 = CyberCaptain(TESTDATA_CONFIG_SCRIPT_VALID_WC, TESTDATA_CONFIG_MODULES_VALID, True, {"count":"1", "test_output_path": TEST_OUTPUT_FOLDER}, False)
 
+        # Directory And Recursive Glob Source Of The Local Store Module
+        cc11 = CyberCaptain(TESTDATA_CONFIG_SCRIPT_VALID_LOCAL_DIR, TESTDATA_CONFIG_MODULES_VALID, True, {"count":"1", "test_output_path": TEST_OUTPUT_FOLDER}, False)
+        cc12 = CyberCaptain(TESTDATA_CONFIG_SCRIPT_VALID_LOCAL_GLOB, TESTDATA_CONFIG_MODULES_VALID, True, {"count":"1", "test_output_path": TEST_OUTPUT_FOLDER}, False)
+
+        # Directory Source But Module Not in modules config directory_src_modules
+        with self.assertRaises(ConfigurationError):
+            cc13 = CyberCaptain(TESTDATA_CONFIG_SCRIPT_VALID_LOCAL_DIR, TESTDATA_CONFIG_MODULES_MISSES, True, {"count":"1", "test_output_path": TEST_OUTPUT_FOLDER}, False)
+
     def test_cc_run_config_method(self):
         # Needs custom placeholder {test_output_path} to set the output path to clean up after & test_input_path for input file
 
@@ -198,8 +210,10 @@ class CyberCaptainRunTest(unittest.TestCase):
             {"count":"1", "test_output_path": TEST_OUTPUT_FOLDER, "test_input_path": TEST_INPUT_FOLDER}, False, False, False)
         self.assertEquals(cc_checksum_check.checksum_check("TEST_CHECKSUM", TEST_OUTPUT_FOLDER, TESTDATA_CONFIG_SCRIPT_VALID_TESTRUN), True)
 
-        # 'Second Run' - Script config changed -> Return False
-        self.assertEquals(cc_checksum_check.checksum_check("TEST_CHECKSUM", TEST_OUTPUT_FOLDER, TESTDATA_CONFIG_SCRIPT_VALID_TESTRUN_CHANGED), False)
+        # 'Second Run' - Script config changed -> Return False (and the kv store is still closed)
+        with patch.object(kv_store, "close", autospec=True, side_effect=kv_store.close) as store_close:
+            self.assertEquals(cc_checksum_check.checksum_check("TEST_CHECKSUM", TEST_OUTPUT_FOLDER, TESTDATA_CONFIG_SCRIPT_VALID_TESTRUN_CHANGED), False)
+        store_close.assert_called_once()
 
         # 'Third run' - Ignorechecksum flag set -> Continue
         cc_checksum_check = CyberCaptain(TESTDATA_CONFIG_SCRIPT_VALID_TESTRUN_CHANGED, TESTDATA_CONFIG_MODULES_VALID, False,
@@ -0,0 +1,167 @@
+import unittest, os, shutil
+import importlib.util
+from unittest.mock import patch
+
+from cybercaptain.export.arrow import export_arrow
+from cybercaptain.export.feather import export_feather
+from cybercaptain.export.parquet import export_parquet
+from cybercaptain.utils.exceptions import ValidationError
+from cybercaptain.utils.jsonFileHandler import json_file_reader
+from cybercaptain.utils.columnarFileHandler import columnar_file_writer
+
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), '../assets/output')
+TESTDATA_SRC = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_arrow.json')
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Append Needed Args - Related to Root Config projectName / projectRoot / moduleName
+def append_needed_args(existing_args):
+    return {**existing_args, 'projectRoot':os.path.join(os.path.dirname(__file__), '../assets/output'), 'projectName': "UNITTEST.cckv", 'moduleName': "UNITEST_MODULE"}
+
+class ExportArrowValidationTest(unittest.TestCase):
+    """
+    Test the columnar export validation.
+    """
+    def test_validate_method(self):
+        """
+        Test if the validation works.
+        """
+        with self.assertRaises(ValidationError):
+            export_arrow(**append_needed_args({"src": ".", "target": "."}))
+
+        with self.assertRaises(ValidationError):
+            export_arrow(**append_needed_args({"src": ".", "target": ".", "exportedAttributes": "all", "compression": "snappy"}))
+
+        with self.assertRaises(ValidationError):
+            export_feather(**append_needed_args({"src": ".", "target": ".", "exportedAttributes": "all", "batchSize": "NOTANINT"}))
+
+        with self.assertRaises(ValidationError):
+            export_parquet(**append_needed_args({"src": ".", "target": ".", "exportedAttributes": "all", "columnTypes": "int64"}))
+
+        ep = export_parquet(**append_needed_args({"src": ".", "target": ".", "exportedAttributes": "all", "compression": "snappy"}))
+        self.assertEqual(ep.compression, "snappy")
+        self.assertEqual(export_feather(**append_needed_args({"src": ".", "target": ".", "exportedAttributes": "ip"})).compression, "lz4")
+
+    def test_get_leaf_keys(self):
+        """
+        Test that only the attributes with values which are not objects are found.
+        """
+        ea = export_arrow(**append_needed_args({"src": ".", "target": ".", "exportedAttributes": "all"}))
+        keys = list(ea.getLeafKeys({"ip": "1.1.1.1", "location": {"country": "CH", "geo": {}}, "ports": [22]}))
+        self.assertEqual(keys, ["ip", "location.country", "location.geo", "ports"])
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+class ExportArrowRunTest(unittest.TestCase):
+    """
+    Test the columnar export run methods.
+    """
+    def setUp(self):
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+        with open(TESTDATA_SRC, 'w') as f:
+            for i in range(10):
+                f.write('{"ip":"10.0.0.%d","port":%d,"location":{"country":"%s"}}\n' % (i, 22 if i % 2 else 443, "CH" if i % 3 else "DE"))
+            f.write('{"ip":"10.0.0.10"}\n')
+
+    def tearDown(self):
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def test_run_arrow(self):
+        """
+        Test that the Arrow and Feather files have typed and dictionary encoded columns.
+        """
+        import pyarrow as pa
+        for module, target in [(export_arrow, 'export.arrow'), (export_feather, 'export.feather')]:
+            target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, target)
+            arguments = append_needed_args({"src": TESTDATA_SRC, "target": target, "exportedAttributes": "all",
+                "columnTypes": {"port": "int32"}, "batchSize": 4})
+            self.assertTrue(module(**arguments).run())
+
+            table = pa.ipc.open_file(target).read_all()
+            self.assertEqual(table.column_names, ["ip", "port", "location.country"])
+            self.assertEqual(table.schema.field("port").type, pa.int32())
+            self.assertTrue(pa.types.is_dictionary(table.schema.field("location.country").type))
+            self.assertEqual(table.schema.field("ip").type, pa.string()) # Only distinct values, so not dictionary encoded
+            self.assertEqual(table.column("location.country").to_pylist()[:4], ["DE", "CH", "CH", "DE"])
+            self.assertEqual(table.column("port").to_pylist()[-2:], [22, None])
+
+    def test_run_parquet(self):
+        """
+        Test that the Parquet file has a row group per batch and the exported attributes.
+        """
+        import pyarrow.parquet as pq
+        target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export.parquet')
+        arguments = append_needed_args({"src": TESTDATA_SRC, "target": target, "exportedAttributes": ["ip", "location.country"], "batchSize": 4})
+        self.assertTrue(export_parquet(**arguments).run())
+
+        self.assertEqual(pq.ParquetFile(target).num_row_groups, 3)
+        table = pq.read_table(target)
+        self.assertEqual(table.column("ip").to_pylist()[-1], "10.0.0.10")
+        self.assertEqual(table.column("location.country").to_pylist()[-1], None)
+
+    def test_run_columnar(self):
+        """
+        Test that a columnar src is exported like the same JSON src.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        columnar_src = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_arrow.cccol')
+        columnar_fw = columnar_file_writer(columnar_src, row_group_size=4)
+        json_fr = json_file_reader(TESTDATA_SRC)
+        while not json_fr.isEOF():
+            columnar_fw.writeRecord(json_fr.readRecord())
+        json_fr.close()
+        columnar_fw.close()
+
+        tables = []
+        for src in [TESTDATA_SRC, columnar_src]:
+            target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export.arrow')
+            self.assertTrue(export_arrow(**append_needed_args({"src": src, "target": target, "exportedAttributes": "all", "batchSize": 4})).run())
+            tables.append(pa.ipc.open_file(target).read_all())
+            target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export.parquet')
+            self.assertTrue(export_parquet(**append_needed_args({"src": src, "target": target, "exportedAttributes": ["ip", "port"]})).run())
+            tables.append(pq.read_table(target))
+        self.assertTrue(tables[0].equals(tables[2]))
+        self.assertTrue(tables[1].equals(tables[3]))
+
+    def test_run_type_mismatch(self):
+        """
+        Test that values not fitting the column type fail the run without leaving a file.
+        """
+        target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export.arrow')
+        arguments = append_needed_args({"src": TESTDATA_SRC, "target": target, "exportedAttributes": ["ip"], "columnTypes": {"ip": "int64"}})
+        self.assertFalse(export_arrow(**arguments).run())
+        self.assertFalse(os.path.exists(target))
+        self.assertFalse(os.path.exists(target + ".tmp"))
+
+        arguments = append_needed_args({"src": TESTDATA_SRC, "target": target, "exportedAttributes": ["ip"], "columnTypes": {"ip": "NOTATYPE"}})
+        self.assertFalse(export_arrow(**arguments).run())
+        self.assertFalse(os.path.exists(target))
+
+    def test_run_mixed_types(self):
+        """
+        Test that columns with mixed types in the inferred datasets are exported as strings.
+        """
+        import pyarrow as pa
+        with open(TESTDATA_SRC, 'a') as f:
+            f.write('{"ip":"10.0.0.11","port":"ssh"}\n')
+        target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export.arrow')
+        arguments = append_needed_args({"src": TESTDATA_SRC, "target": target, "exportedAttributes": ["ip", "port"], "dictionaryEncode": "port"})
+        self.assertTrue(export_arrow(**arguments).run())
+
+        table = pa.ipc.open_file(target).read_all()
+        self.assertEqual(table.schema.field("port").type, pa.dictionary(pa.int32(), pa.string()))
+        self.assertEqual(table.column("port").to_pylist()[:2], ["443", "22"])
+        self.assertEqual(table.column("port").to_pylist()[-2:], [None, "ssh"])
+
+    def test_run_removes_tmp_target(self):
+        """
+        Test that the temporary file is removed if the run fails with any exception.
+        """
+        target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export.arrow')
+        ea = export_arrow(**append_needed_args({"src": TESTDATA_SRC, "target": target, "exportedAttributes": ["ip"]}))
+        with patch.object(export_arrow, "toRecordBatch", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                ea.run()
+        self.assertFalse(os.path.exists(target))
+        self.assertFalse(os.path.exists(target + ".tmp"))
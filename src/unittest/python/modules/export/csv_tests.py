@@ -1,7 +1,9 @@
-import unittest, os, shutil
+import unittest, os, shutil, csv
 
-from cybercaptain.export.csv import export_csv
+from unittest.mock import patch
+from cybercaptain.export.csv import export_csv, find_chunks
 from cybercaptain.utils.jsonFileHandler import json_file_reader
+from cybercaptain.utils.columnarFileHandler import columnar_file_writer
 from cybercaptain.utils.exceptions import ConfigurationError
 
 TESTDATA_CONFIG_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
@@ -130,3 +132,121 @@ class ExportCSVAdvancedUtilTest(unittest.TestCase):
         ec = export_csv(**arguments)
         act_val = ec.getAttributes(TESTDATA_VALID_PATH)
         self.assertEqual(act_val.sort(), exp_val.sort()) # only the content must be the same, how it is arranged does not matter
+
+class ExportCSVRunTest(unittest.TestCase):
+    """
+    Test the CSV export run method.
+    """
+    def setUp(self):
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def tearDown(self):
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def test_run_all_attributes(self):
+        """
+        Tests that all attributes are exported in the order they appear and missing ones are filled.
+        """
+        src = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_all.json')
+        target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_all.csv')
+        with open(src, 'w') as f:
+            f.write('{"Ship":{"Captain":{"Name":"Blackbeard"}},"Crew":12}\n')
+            f.write('{"Crew":0,"Port":"Nassau"}\n')
+            f.write('{"Ship":{"Captain":{"Name":"Anne, Bonny","Age":30}}}\n')
+
+        arguments = append_needed_args({"src": src, "target": target, "exportedAttributes": "all"})
+        self.assertTrue(export_csv(**arguments).run())
+
+        with open(target) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["Ship", "Ship.Captain", "Ship.Captain.Name", "Crew", "Port", "Ship.Captain.Age"])
+        self.assertEqual(rows[1], ["{'Captain': {'Name': 'Blackbeard'}}", "{'Name': 'Blackbeard'}", "Blackbeard", "12", "CC-empty", "CC-empty"])
+        self.assertEqual(rows[2], ["CC-empty", "CC-empty", "CC-empty", "0", "Nassau", "CC-empty"])
+        self.assertEqual(rows[3][2:], ["Anne, Bonny", "CC-empty", "CC-empty", "30"])
+        self.assertEqual(sorted(os.listdir(TESTDATA_GEN_OUTPUT_FOLDER)), ['export_csv_all.csv', 'export_csv_all.json'])
+
+    def test_run_chunks(self):
+        """
+        Tests that the chunks exported in parallel are concatenated in order and falsy values are not filled.
+        """
+        src = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_chunks.json')
+        with open(src, 'w') as f:
+            for i in range(200):
+                f.write('{"id":%d,"ship":{"crew":%d,"flag":%s},"port":%s}\n' % (i, i % 3, "false" if i % 2 else "true", '""' if i % 5 else '"Nassau"'))
+            f.write('{"id":200}')
+
+        with patch('cybercaptain.export.csv.CHUNK_SIZE', 500):
+            self.assertGreater(len(find_chunks(src, 500)), 3)
+            exported = []
+            for parallelism in [1, 3]:
+                target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_chunks-%d.csv' % parallelism)
+                arguments = append_needed_args({"src": src, "target": target, "parallelism": parallelism,
+                    "exportedAttributes": ["id", "ship.crew", "ship.flag", "port"]})
+                self.assertTrue(export_csv(**arguments).run())
+                with open(target) as f:
+                    exported.append(list(csv.reader(f)))
+
+        self.assertEqual(exported[0], exported[1])
+        rows = exported[0]
+        self.assertEqual(rows[0], ["id", "ship.crew", "ship.flag", "port"])
+        self.assertEqual([row[0] for row in rows[1:]], [str(i) for i in range(201)])
+        self.assertEqual(rows[1], ["0", "0", "True", "Nassau"])
+        self.assertEqual(rows[2], ["1", "1", "False", ""])
+        self.assertEqual(rows[-1], ["200", "CC-empty", "CC-empty", "CC-empty"])
+        self.assertFalse([f for f in os.listdir(TESTDATA_GEN_OUTPUT_FOLDER) if '.part' in f])
+
+    def test_run_failed(self):
+        """
+        Tests that no parts or tmp file are left when the parts can not be appended to the target.
+        """
+        src = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_failed.json')
+        with open(src, 'w') as f:
+            for i in range(50):
+                f.write('{"id":%d}\n' % i)
+
+        target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_failed.csv')
+        arguments = append_needed_args({"src": src, "target": target, "parallelism": 1, "exportedAttributes": ["id"]})
+        with patch('cybercaptain.export.csv.CHUNK_SIZE', 100), \
+                patch('cybercaptain.export.csv.csv_file_writer.appendCSVFile', side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                export_csv(**arguments).run()
+        self.assertEqual(os.listdir(TESTDATA_GEN_OUTPUT_FOLDER), ['export_csv_failed.json'])
+
+    def test_run_columnar(self):
+        """
+        Tests that a columnar src is exported like the same JSON src.
+        """
+        src = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_columnar.json')
+        with open(src, 'w') as f:
+            for i in range(20):
+                f.write('{"id":%d,"ship":{"crew":%d},"port":%s}\n' % (i, i % 3, '""' if i % 5 else '"Nassau"'))
+        columnar_src = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_columnar.cccol')
+        columnar_fw = columnar_file_writer(columnar_src, row_group_size=7)
+        json_fr = json_file_reader(src)
+        while not json_fr.isEOF():
+            columnar_fw.writeRecord(json_fr.readRecord())
+        json_fr.close()
+        columnar_fw.close()
+
+        for exported_attributes in [["id", "ship.crew", "port", "missing"], "all", 2]:
+            exported = []
+            for source in [src, columnar_src]:
+                target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_columnar.csv')
+                arguments = append_needed_args({"src": source, "target": target, "parallelism": 3, "exportedAttributes": exported_attributes})
+                self.assertTrue(export_csv(**arguments).run())
+                with open(target) as f:
+                    exported.append(list(csv.reader(f)))
+            self.assertEqual(exported[0], exported[1])
+            self.assertEqual(len(exported[1]), 21)
+        self.assertEqual(exported[1][0], ["id", "ship", "ship.crew", "port"])
+
+    def test_find_chunks(self):
+        """
+        Tests that the chunks start and end at line breaks and cover the whole file.
+        """
+        src = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'export_csv_chunks.json')
+        with open(src, 'wb') as f:
+            f.write(b'{"a":1}\n{"a":22}\n{"a":333}\n')
+        self.assertEqual(find_chunks(src, 10), [(0, 17), (17, 27)])
+        self.assertEqual(find_chunks(src, 100), [(0, 27)])
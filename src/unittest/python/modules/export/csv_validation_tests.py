@@ -26,3 +26,14 @@ class ExportCSVValidationTest(unittest.TestCase):
 
         with self.assertRaises(ValidationError):
             export_csv(**arguments)
+
+        # Invalid parallelism Argument
+        arguments = append_needed_args({
+            "src":"",
+            "target":"",
+            "exportedAttributes":"all",
+            "parallelism":0
+        })
+
+        with self.assertRaises(ValidationError):
+            export_csv(**arguments)
@@ -45,3 +45,15 @@ class ProcessingCleanDropTest(unittest.TestCase):
         self.processing = processing_clean(**arg2)
         self.assertEqual(self.processing.clean_json({"w_renamed":500,"t":{"tn":"1"}}), (False, {"w_renamed":500,"t":{"tn":"1"}}))
 
+    def test_drop_lists(self):
+        """
+        Test if the cleaner drops attributes in lists of objects and list elements
+        """
+        arguments = {'src': '.',
+                     'format': '.',
+                     'drop': ['data.ssl.key', 'data.http', 'hostnames.0', 'hostnames.-1'],
+                     'ignoreMissingKeys': "true",
+                     'target': '.'}
+        self.processing = processing_clean(**arguments)
+        line = {"hostnames":["a","b","c"],"data":[{"port":22,"ssl":{"cert":"c","key":"k"}},{"port":80,"ssl":{"cert":"d"},"http":{}}]}
+        self.assertEqual(self.processing.clean_json(line), (True, {"hostnames":["b"],"data":[{"port":22,"ssl":{"cert":"c"}},{"port":80,"ssl":{"cert":"d"}}]}))
@@ -45,8 +45,17 @@ class ProcessingCleanKeepTest(unittest.TestCase):
         self.processing = processing_clean(**arg2)
         self.assertEqual(self.processing.clean_json({"w_renamed":500,"t":{"tn":"1"}}), (False, {}))
 
+    def test_keep_lists(self):
+        """
+        Test if the cleaner keeps attributes in lists of objects and list elements
+        """
+        arguments = {'src': '.',
+                     'format': '.',
+                     'keep': ['data.port', 'data.ssl.cert', 'hostnames.0', 'w', 'w.x'],
+                     'target': '.'}
+        self.processing = processing_clean(**arguments)
+        line = {"w":{"x":1,"y":2},"hostnames":["a","b"],"data":[{"port":22,"ssl":{"cert":"c","key":"k"}},{"port":80,"ssl":{"cert":"d"},"http":{}}]}
+        self.assertEqual(self.processing.clean_json(line), (True, {"w":{"x":1,"y":2},"hostnames":["a"],"data":[{"port":22,"ssl":{"cert":"c"}},{"port":80,"ssl":{"cert":"d"}}]}))
 
-
-
-
-        
\ No newline at end of file
+        with self.assertRaises(KeyError):
+            self.processing.clean_json({"w":1,"hostnames":[],"data":[]})
@@ -1,9 +1,11 @@
-import unittest, os
+import unittest, os, shutil
 
 from cybercaptain.processing.diff import processing_diff
 from cybercaptain.utils.exceptions import ValidationError
+from cybercaptain.utils.attributePath import compile_attribute_path
 
 TESTDATA_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(TESTDATA_FOLDER, 'output')
 
 class ProcessingDiffArgTest(unittest.TestCase):
     """
@@ -20,12 +22,21 @@ class ProcessingDiffArgTest(unittest.TestCase):
                      'target': '.'}
         self.processing = processing_diff(**arguments)
 
+    def setUp(self):
+        # Work on a copy of the store as it gets migrated on the first access
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+        shutil.copy(os.path.join(TESTDATA_FOLDER, 'DiffTest'), TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def tearDown(self):
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
     def test_target_exists(self):
         """
         Test if the target_exists works.
         """
         arguments = {'projectName': 'DiffTest',
-                     'projectRoot': TESTDATA_FOLDER,
+                     'projectRoot': TESTDATA_GEN_OUTPUT_FOLDER,
                      'moduleName': 'Diff1',
                      'src': '.',
                      'keyAttributes': 'Cruiser',
@@ -35,7 +46,7 @@ class ProcessingDiffArgTest(unittest.TestCase):
         self.assertFalse(diff1.target_exists())
 
         arguments['src'] = TESTDATA_FOLDER + '/diff_test_2'
-        arguments['target'] = TESTDATA_FOLDER + '/DiffTest'
+        arguments['target'] = TESTDATA_GEN_OUTPUT_FOLDER + '/DiffTest'
         diff2 = processing_diff(**arguments)
         self.assertFalse(diff2.target_exists())
 
@@ -81,3 +92,5 @@ class ProcessingDiffArgTest(unittest.TestCase):
         expected = {"test1": "test"}
         got = self.processing.getDataByAttributes(attributes, data)
         self.assertEqual(expected, got)
+        got = self.processing.getDataByAttributes([compile_attribute_path("test1")], data)
+        self.assertEqual(expected, got)
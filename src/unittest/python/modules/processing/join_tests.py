@@ -2,9 +2,13 @@ import unittest, os, shutil
 
 from BTrees.OOBTree import OOBTree # pylint: disable=no-name-in-module
 from cybercaptain.processing.join import processing_join
+from cybercaptain.utils.jsonFileHandler import json_file_reader
 
 TESTDATA_CONFIG_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
 TESTDATA_CONFIG_VALID_PATH = os.path.join(TESTDATA_CONFIG_FOLDER, 'ProcessingJoinTest.cctf')
+TESTDATA_CONFIG_RIGHT_PATH = os.path.join(TESTDATA_CONFIG_FOLDER, 'ProcessingJoinTestRight.cctf')
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(TESTDATA_CONFIG_FOLDER, 'output')
+TESTDATA_TARGET_FILENAME = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'ProcessingJoinOut.cctf')
 
 class ProcessingJoinTest(unittest.TestCase):
     """
@@ -19,30 +23,72 @@ class ProcessingJoinTest(unittest.TestCase):
                      'target': '.'}
         self.processing = processing_join(**arguments)
 
+    def setUp(self):
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def tearDown(self):
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def run_join(self, join_type):
+        arguments = {'src': TESTDATA_CONFIG_VALID_PATH,
+                     'left-joinon': 'name',
+                     'right-joinon': 'crew',
+                     'joinwith': TESTDATA_CONFIG_RIGHT_PATH,
+                     'joinType': join_type,
+                     'target': TESTDATA_TARGET_FILENAME}
+        self.assertTrue(processing_join(**arguments).run())
+
+        records = []
+        json_fr = json_file_reader(TESTDATA_TARGET_FILENAME)
+        while not json_fr.isEOF():
+            records.append(json_fr.readRecord())
+        json_fr.close()
+        return records
+
     def testCorrectJoin(self):
         """
         Tests if the join works correctly.
         """
         b_tree = OOBTree()
-        b_tree.update({1: "Monkey D. Luffy", 2: "Roronoa Zoro", 3: "Nami"})
-        failed_counter = 0
+        b_tree.update({1: ["Monkey D. Luffy", "Gomu Gomu"], 2: ["Roronoa Zoro"], 3: ["Nami"]})
+        matched_keys = set()
         key = 1
         data = {"from":"East Blue"}
-        (mod_data, mod_tree, failed_counter) = self.processing.join(b_tree, key, data, failed_counter)
-        self.assertEqual(mod_data, {"from":"East Blue", "right_data":"Monkey D. Luffy"})
-        self.assertEqual(len(mod_tree), 2)
-        self.assertEqual(failed_counter, 0)
+        joined = [dict(d) for d in self.processing.join(b_tree, key, data, matched_keys)]
+        self.assertEqual(joined, [{"from":"East Blue", "right_data":"Monkey D. Luffy"}, {"from":"East Blue", "right_data":"Gomu Gomu"}])
+        self.assertEqual(len(b_tree), 3)
+        self.assertEqual(matched_keys, {1})
 
     def testFailedJoin(self):
         """
         Tests if the join works correctly.
         """
         b_tree = OOBTree()
-        b_tree.update({1: "Monkey D. Luffy", 2: "Roronoa Zoro", 3: "Nami"})
-        failed_counter = 0
+        b_tree.update({1: ["Monkey D. Luffy"], 2: ["Roronoa Zoro"], 3: ["Nami"]})
+        matched_keys = set()
         key = 10
         data = {"from":"East Blue"}
-        (mod_data, mod_tree, failed_counter) = self.processing.join(b_tree, key, data, failed_counter)
-        self.assertEqual(mod_data, {"from":"East Blue"})
-        self.assertEqual(len(mod_tree), 3)
-        self.assertEqual(failed_counter, 1)
+        joined = list(self.processing.join(b_tree, key, data, matched_keys))
+        self.assertEqual(joined, [])
+        self.assertEqual(data, {"from":"East Blue"})
+        self.assertEqual(len(matched_keys), 0)
+
+    def testJoinTypes(self):
+        """
+        Tests the inner, left, right and full join with a one-to-many right side.
+        """
+        luffy = {"name": "Luffy", "bounty": 500000000}
+        zoro = {"name": "Zoro", "bounty": 320000000}
+        nami = {"name": "Nami", "bounty": 66000000}
+        matched = [
+            {**luffy, "right_data": {"crew": "Luffy", "fruit": "Gomu Gomu"}},
+            {**luffy, "right_data": {"crew": "Luffy", "fruit": "Nika"}},
+            {**zoro, "right_data": {"crew": "Zoro", "fruit": "None"}}
+        ]
+        sanji = {"right_data": {"crew": "Sanji", "fruit": "None"}}
+
+        self.assertEqual(self.run_join("inner"), matched)
+        self.assertEqual(self.run_join("left"), matched + [nami])
+        self.assertEqual(self.run_join("right"), matched + [sanji])
+        self.assertEqual(self.run_join("full"), matched + [nami, sanji])
@@ -56,3 +56,13 @@ class ProcessingJoinArgTest(unittest.TestCase):
 
         with self.assertRaises(ValidationError):
             self.processing.validate(arg5)
+
+        arg6 = {'src': '.',
+                'left-joinon': 'Cruiser',
+                'right-joinon': 'Cruiser',
+                'joinwith': 'Sail',
+                'joinType': 'sideways',
+                'target': '.'}
+
+        with self.assertRaises(ValidationError):
+            self.processing.validate(arg6)
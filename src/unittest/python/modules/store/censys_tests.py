@@ -1,8 +1,9 @@
-import unittest, os, shutil, requests, responses, censys
+import unittest, os, shutil, requests, responses, censys, censys.data
 from unittest.mock import patch, MagicMock                                       
 
 from cybercaptain.store.censys import store_censys
 from cybercaptain.utils.exceptions import ValidationError
+from cybercaptain.utils.apiCache import api_cache
 
 TEST_OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), '../assets/output')
 TEST_INPUT_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
@@ -69,6 +70,7 @@ class StoreCensysTest(unittest.TestCase):
     def setUp(self):
         if not os.path.exists(TEST_OUTPUT_FOLDER):
             os.makedirs(TEST_OUTPUT_FOLDER)
+        api_cache.clear_memory()
 
     def tearDown(self):
         shutil.rmtree(TEST_OUTPUT_FOLDER)
@@ -104,6 +106,54 @@ class StoreCensysTest(unittest.TestCase):
 
         self.assertMultiLineEqual(expected_output, output)
 
+    @responses.activate
+    def test_censys_download_decompress_lz4_method(self):
+        # MOCK STREAM DOWNLOAD - decompressed while downloading, compressed copy kept as archive
+        with open(TESTDATA_DOWNLOADED_COMPRESSED_FILE, 'rb') as dl_file:
+            responses.add(
+                responses.GET, 'http://unittest.test',
+                body=dl_file.read(), status=200, headers={"content-length": str(os.path.getsize(TESTDATA_DOWNLOADED_COMPRESSED_FILE))},
+                stream=True
+            )
+        self.censys_module.download_decompress_lz4('http://unittest.test', TESTDATA_OUTPUT_DOWNLOADED_UNCOMPRESSED_FILE, 100,
+            archive_target=TESTDATA_OUTPUT_DOWNLOADED_COMPRESSED_FILE)
+
+        with open(TESTDATA_DOWNLOADED_UNCOMPRESSED_FILE,'r') as f:
+            expected_output = f.read()
+
+        with open(TESTDATA_OUTPUT_DOWNLOADED_UNCOMPRESSED_FILE,'r') as f2:
+            output = f2.read()
+
+        self.assertMultiLineEqual(expected_output, output)
+
+        with open(TESTDATA_DOWNLOADED_COMPRESSED_FILE,'rb') as f, open(TESTDATA_OUTPUT_DOWNLOADED_COMPRESSED_FILE,'rb') as f2:
+            self.assertEqual(f.read(), f2.read())
+
+    @responses.activate
+    def test_censys_download_dataset_resumable(self):
+        # MOCK DOWNLOAD - downloaded to the compressed file and decompressed afterwards
+        with open(TESTDATA_DOWNLOADED_COMPRESSED_FILE, 'rb') as dl_file:
+            responses.add(
+                responses.GET, 'http://unittest.test',
+                body=dl_file.read(), status=200, headers={"content-length": str(os.path.getsize(TESTDATA_DOWNLOADED_COMPRESSED_FILE))},
+                stream=True
+            )
+        self.censys_module.resumable_download = True
+        self.censys_module.download_dataset('http://unittest.test', TESTDATA_OUTPUT_DOWNLOADED_UNCOMPRESSED_FILE)
+
+        with open(TESTDATA_DOWNLOADED_UNCOMPRESSED_FILE,'r') as f, open(TESTDATA_OUTPUT_DOWNLOADED_UNCOMPRESSED_FILE,'r') as f2:
+            self.assertMultiLineEqual(f.read(), f2.read())
+        self.assertFalse(os.path.exists(TESTDATA_OUTPUT_DOWNLOADED_UNCOMPRESSED_FILE + ".lz4"))
+
+    @responses.activate
+    def test_censys_download_decompress_lz4_empty(self):
+        # MOCK EMPTY STREAM DOWNLOAD - without a complete lz4 frame no target is created
+        responses.add(responses.GET, 'http://unittest.test', body=b"", status=200, headers={"content-length": "0"}, stream=True)
+        with self.assertRaises(EOFError):
+            self.censys_module.download_decompress_lz4('http://unittest.test', TESTDATA_OUTPUT_DOWNLOADED_UNCOMPRESSED_FILE, 100)
+        self.assertFalse(os.path.exists(TESTDATA_OUTPUT_DOWNLOADED_UNCOMPRESSED_FILE))
+        self.assertFalse(os.path.exists(TESTDATA_OUTPUT_DOWNLOADED_UNCOMPRESSED_FILE + ".tmp"))
+
     @responses.activate
     def test_censys_run_via_api(self):
         # Mock: Setup custom censys data class
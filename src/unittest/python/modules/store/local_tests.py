@@ -1,4 +1,5 @@
-import unittest, os, shutil
+import unittest, os, shutil, gzip, json
+import lz4.frame
 
 from cybercaptain.store.local import store_local
 from cybercaptain.utils.exceptions import ValidationError
@@ -31,6 +32,7 @@ class StoreLocalTest(unittest.TestCase):
         arguments = append_needed_args({
             "src":TESTDATA_CONFIG_VALID_PATH,
             "format":"json",
+            "copyMode":"normalize",
             "target":TESTDATA_TARGET_FILENAME
         })
         sl = store_local(**arguments).run()
@@ -49,22 +51,110 @@ class StoreLocalTest(unittest.TestCase):
             "target":TESTDATA_TARGET_FILENAME
         })
 
-        with self.assertRaises(NotImplementedError):
+        with self.assertRaises(ValidationError):
             sl2 = store_local(**arguments).run()
 
     def test_local_validate_method(self):
         arguments = append_needed_args({
             "src":TESTDATA_CONFIG_VALID_PATH,
-            "format":".",
+            "format":"JSON",
             "target":"."
         })
         sl3 = store_local(**arguments)
 
+        for file_format in [".", "xml", None]:
+            arguments = append_needed_args({
+                "src":TESTDATA_CONFIG_VALID_PATH,
+                "format":file_format,
+                "target":"."
+            })
+            with self.assertRaises(ValidationError):
+                store_local(**arguments)
 
         arguments = append_needed_args({
             "src":"NOTEXISTING.ccsf",
-            "format":".",
+            "format":"json",
             "target":"."
         })
         with self.assertRaises(ValidationError):  
-            sl4 = store_local(**arguments)
\ No newline at end of file
+            sl4 = store_local(**arguments)
+
+        arguments = append_needed_args({
+            "src":TESTDATA_CONFIG_VALID_PATH,
+            "format":"json",
+            "copyMode":"move",
+            "target":"."
+        })
+        with self.assertRaises(ValidationError):
+            store_local(**arguments)
+
+    def read_records(self, path):
+        with open(path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def test_local_copy_method(self):
+        # JSON datasets are copied without decoding them
+        arguments = append_needed_args({
+            "src":TESTDATA_CONFIG_VALID_PATH,
+            "format":"json",
+            "target":TESTDATA_TARGET_FILENAME
+        })
+        self.assertTrue(store_local(**arguments).run())
+
+        with open(TESTDATA_CONFIG_VALID_PATH, 'rb') as f, open(TESTDATA_TARGET_FILENAME, 'rb') as f2:
+            self.assertEqual(f.read(), f2.read())
+
+        os.remove(TESTDATA_TARGET_FILENAME)
+        arguments["copyMode"] = "link"
+        self.assertTrue(store_local(**arguments).run())
+        self.assertTrue(os.path.samefile(TESTDATA_CONFIG_VALID_PATH, TESTDATA_TARGET_FILENAME))
+
+    def test_local_directory_method(self):
+        # Compressed and uncompressed parts of a directory are concatenated in sorted order
+        records = self.read_records(TESTDATA_CONFIG_VALID_PATH)
+        source_dir = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'archive')
+        os.makedirs(os.path.join(source_dir, 'sub'))
+        lines = [json.dumps(r) for r in records]
+        with gzip.open(os.path.join(source_dir, 'a.json.gz'), 'wt') as f:
+            f.write("\n".join(lines[:3]))
+        with open(os.path.join(source_dir, 'b.json'), 'w') as f:
+            f.write("\n".join(lines[3:6]))
+        with lz4.frame.open(os.path.join(source_dir, 'sub', 'c.json.lz4'), 'wt') as f:
+            f.write("\n".join(lines[6:]) + "\n")
+        with open(os.path.join(source_dir, '.hidden'), 'w') as f:
+            f.write("not a dataset")
+
+        for copy_mode, parallelism in [("copy", 2), ("normalize", 1)]:
+            arguments = append_needed_args({
+                "src":source_dir,
+                "format":"json",
+                "copyMode":copy_mode,
+                "parallelism":parallelism,
+                "target":TESTDATA_TARGET_FILENAME
+            })
+            self.assertTrue(store_local(**arguments).run())
+            self.assertEqual(self.read_records(TESTDATA_TARGET_FILENAME), records)
+            self.assertEqual(sorted(os.listdir(TESTDATA_GEN_OUTPUT_FOLDER)), ['StoreLocalOuts.cctf', 'archive'])
+            os.remove(TESTDATA_TARGET_FILENAME)
+
+        # Glob pattern
+        arguments["src"] = os.path.join(source_dir, '**', '*.lz4')
+        self.assertTrue(store_local(**arguments).run())
+        self.assertEqual(self.read_records(TESTDATA_TARGET_FILENAME), records[6:])
+
+    def test_local_csv_method(self):
+        # CSV and TSV rows are converted to datasets with the header as attributes
+        source = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'hosts.tsv.gz')
+        with gzip.open(source, 'wt', newline='') as f:
+            f.write("ip\tport\tbanner\n1.1.1.1\t80\tnginx\n2.2.2.2\t22\t\"SSH\tOpenSSH\"\n")
+
+        arguments = append_needed_args({
+            "src":source,
+            "format":"tsv",
+            "target":TESTDATA_TARGET_FILENAME
+        })
+        self.assertTrue(store_local(**arguments).run())
+        self.assertEqual(self.read_records(TESTDATA_TARGET_FILENAME), [
+            {"ip": "1.1.1.1", "port": "80", "banner": "nginx"},
+            {"ip": "2.2.2.2", "port": "22", "banner": "SSH\tOpenSSH"}
+        ])
@@ -1,8 +1,9 @@
-import unittest, os, shutil, requests, responses, shodan
+import unittest, os, shutil, json, requests, responses, shodan
 from unittest.mock import patch, MagicMock                                       
 
 from cybercaptain.store.shodan import store_shodan
 from cybercaptain.utils.exceptions import ValidationError
+from cybercaptain.utils.apiCache import api_cache
 
 TEST_OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), '../assets/output')
 TEST_INPUT_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
@@ -37,6 +38,9 @@ class _mock_shodan_data_api():
             return {"data": [{"timestamp": "2018-06-20T22:28:09.514418", "html": "TEST", "port": 80},{"timestamp": "2018-06-19T22:28:09.514418", "html": "TEST2", "port": 80}], "ip_str": "1.1.1.1", "ports": [443, 80]}
         return {"data": [{"timestamp": "2018-06-20T22:28:09.514418", "html": "TEST", "port": 80}], "ip_str": "1.1.1.1", "ports": [443, 80]}
 
+    def search(self, query, page=1, minify=False):
+        return {"matches": self.search_cursor(query) if page == 1 else [], "total": 6}
+
     def search_cursor(self, query, minify=False, retries=1):        
         return [
             {"hostnames":[], "port": 80, "location":{"country_code":"CH"}, "ip_str": "1.1.1.1"},
@@ -60,6 +64,7 @@ class StoreShodanTest(unittest.TestCase):
     def setUp(self):
         if not os.path.exists(TEST_OUTPUT_FOLDER):
             os.makedirs(TEST_OUTPUT_FOLDER)
+        api_cache.clear_memory()
 
         # Test inject_additional_tasks Method With Mocked Class
         self.old_shodan_class = shodan.Shodan
@@ -499,4 +504,115 @@ class StoreShodanTest(unittest.TestCase):
         })
 
         ss = store_shodan(**arguments)
-        self.assertEquals(ss.inject_additional_tasks(), False)
\ No newline at end of file
+        self.assertEquals(ss.inject_additional_tasks(), False)
+    def test_shodan_api_cache(self):
+        # The injected tasks reuse the host history requested while injecting them
+        host_calls = []
+        class _counting_shodan_api(_mock_shodan_data_api):
+            def host(self, ip, history=False, minify=False):
+                host_calls.append((ip, history))
+                return super().host(ip, history=history, minify=minify)
+        shodan.Shodan = _counting_shodan_api
+
+        arguments = append_needed_args({
+            "apiKey":"xy",
+            "type": "ip_lookup",
+            "getByLatest": "True",
+            "getAllMissingDatasets": "True",
+            "ip": "1.1.1.1",
+            "port": 80,
+            "target": TESTDATA_OUTPUT_IPLOOKUP
+        })
+
+        additional_tasks = store_shodan(**arguments).inject_additional_tasks()
+        self.assertEqual(len(additional_tasks), 2)
+        for task in additional_tasks:
+            self.assertIsNotNone(store_shodan(**task["attributes"]).get_ip_lookup_data_by_dataset_ts(task["attributes"]["getByDatasetTs"]))
+        self.assertEqual(host_calls, [("1.1.1.1", True)])
+
+        # Disabled cache calls the API each time
+        arguments["apiCacheTtl"] = 0
+        ss = store_shodan(**arguments)
+        ss.inject_additional_tasks()
+        ss.inject_additional_tasks()
+        self.assertEqual(len(host_calls), 3)
+
+    def test_shodan_bulk_ip_lookup(self):
+        class _bulk_shodan_api(_mock_shodan_data_api):
+            def host(self, ip, history=False, minify=False):
+                if ip == "2.2.2.2": raise shodan.APIError("No information available for that IP.")
+                result = super().host(ip, history=history, minify=minify)
+                result["ip_str"] = ip
+                return result
+        shodan.Shodan = _bulk_shodan_api
+
+        targets_file = os.path.join(TEST_OUTPUT_FOLDER, "bulk_targets.txt")
+        with open(targets_file, "w") as f:
+            f.write("# Targets\n5.5.5.5:443\n2.2.2.2:80\n1.1.1.1:80\n")
+
+        arguments = append_needed_args({
+            "apiKey":"xy",
+            "type": "bulk_ip_lookup",
+            "targets": ["1.1.1.1:80", "4.4.4.4:80"],
+            "targetsFile": targets_file,
+            "queryRate": 100,
+            "concurrency": 3,
+            "target": TESTDATA_OUTPUT_IPLOOKUP
+        })
+
+        ss = store_shodan(**arguments)
+        self.assertEqual(ss.get_bulk_targets(), [("1.1.1.1", 80), ("4.4.4.4", 80), ("5.5.5.5", 443), ("2.2.2.2", 80)])
+        self.assertTrue(ss.run())
+
+        with open(TESTDATA_OUTPUT_IPLOOKUP, "r") as f:
+            banners = [json.loads(line) for line in f]
+        self.assertEqual(len(banners), 2)
+        self.assertTrue(ss.kv_store.in_set("processed_banners", "4.4.4.4:80@2018-06-20T22:28:09.514418", section="UNITEST_MODULE"))
+        self.assertEqual(ss.kv_store.get("1.1.1.1:80", section="UNITEST_MODULE"), "2018-06-20T22:28:09.514418")
+
+        # Already processed banners are not written again
+        self.assertFalse(store_shodan(**arguments).run())
+
+        # Targets are needed and have to be in the form IP:PORT
+        del arguments["targets"], arguments["targetsFile"]
+        with self.assertRaises(ValidationError):
+            store_shodan(**arguments)
+        arguments["targets"] = ["1.1.1.1"]
+        self.assertFalse(store_shodan(**arguments).run())
+
+    def test_shodan_search_query_resume(self):
+        # A failed page keeps the downloaded pages and the next run continues at the failed page
+        requested_pages = []
+        class _paged_shodan_api(_mock_shodan_data_api):
+            failures = 2
+            def search(self, query, page=1, minify=False):
+                requested_pages.append(page)
+                if page == 3 and _paged_shodan_api.failures:
+                    _paged_shodan_api.failures -= 1
+                    raise shodan.APIError("Request timed out")
+                return {"matches": self.search_cursor(query)[(page - 1) * 2:page * 2], "total": 600}
+        shodan.Shodan = _paged_shodan_api
+
+        arguments = append_needed_args({
+            "apiKey":"xy",
+            "type": "search_query",
+            "query": "xy EQ 12",
+            "limit": 100,
+            "retries": 1,
+            "checkpointPages": 1,
+            "target": TESTDATA_OUTPUT_SEARCHQUERY1
+        })
+
+        self.assertFalse(store_shodan(**arguments).run())
+        self.assertFalse(os.path.exists(TESTDATA_OUTPUT_SEARCHQUERY1))
+        self.assertEqual(requested_pages, [1, 2, 3, 3])
+
+        ss = store_shodan(**arguments)
+        self.assertEqual(ss.get_search_checkpoint(), (3, 4, os.path.getsize(TESTDATA_OUTPUT_SEARCHQUERY1 + ".tmp")))
+        self.assertTrue(ss.run())
+        self.assertEqual(requested_pages, [1, 2, 3, 3, 3, 4])
+
+        with open(TESTDATA_OUTPUT_SEARCHQUERY1, "r") as f:
+            banners = [json.loads(line) for line in f]
+        self.assertEqual(banners, _mock_shodan_data_api("xy").search_cursor("xy EQ 12"))
+        self.assertEqual(ss.get_search_checkpoint(), (1, 0, 0))
@@ -0,0 +1,102 @@
+"""
+Testing the per file aggregate cache of the visualizations
+"""
+import unittest
+import os
+import shutil
+import time
+import numpy as np
+from cybercaptain.utils.aggregateCache import file_aggregate_cache, assemble_matrix, select_top_groups
+
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), '../assets/output')
+TESTDATA_CACHE_DIR = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, '.cc_aggregate_cache')
+TESTDATA_FILENAME = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'aggregate_day1.ccvf')
+
+class AggregateCacheTest(unittest.TestCase):
+    """
+    Test the file aggregate cache class.
+    """
+    def setUp(self):
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+        file_aggregate_cache.clear_memory()
+
+    def tearDown(self):
+        file_aggregate_cache.clear_memory()
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def write_file(self, content):
+        with open(TESTDATA_FILENAME, 'w') as f:
+            f.write(content)
+
+    def test_summarize(self):
+        """
+        Test that unchanged files are taken from memory or disk and changed files are read again
+        """
+        self.write_file('{"group":"ssh","value":{"count":3}}\n{"group":"http","value":{"count":1}}\n{"group":"ssh","value":{"count":2}}\n')
+        cache = file_aggregate_cache(TESTDATA_CACHE_DIR)
+        self.assertEqual(cache.summarize(TESTDATA_FILENAME, "value.count", "group"), [["ssh", 5], ["http", 1]])
+        self.assertEqual(len(os.listdir(TESTDATA_CACHE_DIR)), 1)
+
+        stat = os.stat(TESTDATA_FILENAME)
+        cache.read_summary = None # A cache hit must not read the file
+        file_aggregate_cache.clear_memory()
+        self.assertEqual(cache.summarize(TESTDATA_FILENAME, "value.count", "group"), [["ssh", 5], ["http", 1]])
+
+        self.write_file('{"group":"ftp","value":{"count":7}}\n')
+        os.utime(TESTDATA_FILENAME, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(file_aggregate_cache(TESTDATA_CACHE_DIR).summarize(TESTDATA_FILENAME, "value.count", "group"), [["ftp", 7]])
+
+    def test_prune(self):
+        """
+        Test that summaries not used for the max age and the least recently used above the max size are removed
+        """
+        os.makedirs(TESTDATA_CACHE_DIR)
+        now = time.time()
+        for name, age_days in [("old", 40), ("used", 5), ("recent", 1)]:
+            with open(os.path.join(TESTDATA_CACHE_DIR, name + ".json"), 'w') as f:
+                f.write("[]" * 50) # 100 bytes
+            os.utime(os.path.join(TESTDATA_CACHE_DIR, name + ".json"), (now, now - age_days * 24 * 60 * 60))
+
+        cache = file_aggregate_cache(TESTDATA_CACHE_DIR, max_age_days=30, max_size=150)
+        self.assertEqual(cache.prune(), 2)
+        self.assertEqual(os.listdir(TESTDATA_CACHE_DIR), ["recent.json"])
+
+        # Pruned on the first written summary only
+        self.write_file('{"group":"ssh","value":{"count":3}}\n')
+        cache = file_aggregate_cache(TESTDATA_CACHE_DIR, max_size=0)
+        cache.summarize(TESTDATA_FILENAME, "value.count", "group")
+        self.assertTrue(cache.pruned)
+        self.assertEqual(os.listdir(TESTDATA_CACHE_DIR), [])
+
+    def test_assemble_matrix(self):
+        """
+        Test the groups x files matrix with missing values and the threshold
+        """
+        group_names, matrix = assemble_matrix([[["ssh", 5], ["http", 1]], [], [["http", 8], ["ftp", 2]]])
+        self.assertEqual(group_names, ["ssh", "http", "ftp"])
+        self.assertTrue(np.array_equal(matrix, [[5, 0, 0], [1, 0, 8], [0, 0, 2]]))
+
+        group_names, matrix = assemble_matrix([[["ssh", 5], ["http", 1]], [["http", 8], ["ftp", 2]]], threshold=5)
+        self.assertEqual(group_names, ["ssh", "http"])
+        self.assertTrue(np.array_equal(matrix, [[5, 0], [0, 8]]))
+
+        group_names, matrix = assemble_matrix([])
+        self.assertEqual((group_names, matrix.shape), ([], (0, 0)))
+
+    def test_select_top_groups(self):
+        """
+        Test that the groups with the largest sums are kept in their order and the others are summed up
+        """
+        group_names = ["ssh", "http", "ftp", "smtp"]
+        matrix = np.array([[5, 0], [1, 8], [0, 2], [4, 4]])
+        top_names, top_matrix = select_top_groups(group_names, matrix, 2, "Others")
+        self.assertEqual(top_names, ["http", "smtp", "Others"])
+        self.assertTrue(np.array_equal(top_matrix, [[1, 8], [4, 4], [5, 2]]))
+
+        top_names, top_matrix = select_top_groups(group_names, matrix, 2)
+        self.assertEqual(top_names, ["http", "smtp"])
+        self.assertTrue(np.array_equal(top_matrix, [[1, 8], [4, 4]]))
+
+        self.assertEqual(select_top_groups(group_names, matrix, 4, "Others")[0], group_names)
+        self.assertEqual(select_top_groups(group_names, matrix)[0], group_names)
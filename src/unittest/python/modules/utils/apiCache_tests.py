@@ -0,0 +1,72 @@
+"""
+Testing the API response cache
+"""
+import unittest
+import os
+import json
+import shutil
+from cybercaptain.utils.apiCache import api_cache
+
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), '../assets/output')
+TESTDATA_CACHE_DIR = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, '.cc_api_cache')
+
+class ApiCacheTest(unittest.TestCase):
+    """
+    Test the api cache class.
+    """
+    def setUp(self):
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+        api_cache.clear_memory()
+        self.calls = []
+
+    def tearDown(self):
+        api_cache.clear_memory()
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def api_call(self, response):
+        def call():
+            self.calls.append(response)
+            return response
+        return call
+
+    def test_memory_cache(self):
+        """
+        Test that instances share the responses and error responses are not cached
+        """
+        self.assertEqual(api_cache("shodan").call(("host", "1.1.1.1"), self.api_call({"ip": 1})), {"ip": 1})
+        self.assertEqual(api_cache("shodan").call(("host", "1.1.1.1"), self.api_call({"ip": 2})), {"ip": 1})
+        self.assertEqual(api_cache("censys").call(("host", "1.1.1.1"), self.api_call({"ip": 3})), {"ip": 3})
+        self.assertEqual(len(self.calls), 2)
+
+        not_error = lambda response: "error_code" not in response
+        api_cache("censys").call(("view_series", "x"), self.api_call({"error_code": 404}), cache_if=not_error)
+        api_cache("censys").call(("view_series", "x"), self.api_call({"error_code": 404}), cache_if=not_error)
+        self.assertEqual(len(self.calls), 4)
+
+        api_cache("shodan", ttl=0).call(("host", "1.1.1.1"), self.api_call({"ip": 4}))
+        self.assertEqual(len(self.calls), 5)
+
+    def test_disk_cache(self):
+        """
+        Test that responses on disk are reused by the next run until the ttl expired
+        """
+        cache = api_cache("shodan", ttl=3600, cache_dir=TESTDATA_CACHE_DIR)
+        cache.call(("host", "1.1.1.1", "SECRET_KEY"), self.api_call({"ip": 1}))
+        self.assertEqual(len(os.listdir(TESTDATA_CACHE_DIR)), 1)
+        self.assertNotIn("SECRET_KEY", os.listdir(TESTDATA_CACHE_DIR)[0])
+
+        api_cache.clear_memory() # Next run
+        self.assertEqual(cache.call(("host", "1.1.1.1", "SECRET_KEY"), self.api_call({"ip": 2})), {"ip": 1})
+        self.assertEqual(len(self.calls), 1)
+
+        # Expire the response on disk
+        api_cache.clear_memory()
+        path = os.path.join(TESTDATA_CACHE_DIR, os.listdir(TESTDATA_CACHE_DIR)[0])
+        with open(path) as f:
+            entry = json.load(f)
+        entry["created"] -= 7200
+        with open(path, "w") as f:
+            json.dump(entry, f)
+        self.assertEqual(cache.call(("host", "1.1.1.1", "SECRET_KEY"), self.api_call({"ip": 3})), {"ip": 3})
+        self.assertEqual(len(self.calls), 2)
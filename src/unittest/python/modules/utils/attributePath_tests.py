@@ -0,0 +1,54 @@
+"""
+Testing the attribute path compiler
+"""
+import unittest
+from cybercaptain.utils.attributePath import attribute_path, compile_attribute_path, as_attribute_path
+
+class AttributePathTest(unittest.TestCase):
+    """
+    Test the attribute path util.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def test_get_values(self):
+        """
+        Test reading flat, nested and list indexed attributes.
+        """
+        record = {"name": "Luffy", "ship": {"name": "Going Merry", "crew": ["Zoro", "Nami"]}, "0": "zero"}
+
+        self.assertEqual(attribute_path("name")(record), "Luffy")
+        self.assertEqual(attribute_path("ship.name")(record), "Going Merry")
+        self.assertEqual(attribute_path("ship.crew.1")(record), "Nami")
+        self.assertEqual(attribute_path("ship.crew.-1")(record), "Nami")
+        self.assertEqual(attribute_path("0")(record), "zero") # Integer steps are still dict keys on dicts
+
+    def test_missing_values(self):
+        """
+        Test the missing key handling with and without default.
+        """
+        record = {"ship": {"name": "Going Merry", "crew": ["Zoro"]}}
+
+        with self.assertRaises(KeyError):
+            attribute_path("ship.captain")(record)
+        with self.assertRaises(KeyError):
+            attribute_path("ship.crew.5")(record)
+        with self.assertRaises(KeyError):
+            attribute_path("ship.name.first")(record)
+
+        self.assertEqual(attribute_path("ship.captain")(record, None), None)
+        self.assertEqual(attribute_path("ship.crew.5").get(record, "CC-empty"), "CC-empty")
+
+    def test_compile_is_shared(self):
+        """
+        Test that the compiled paths are cached.
+        """
+        self.assertIs(compile_attribute_path("ship.name"), compile_attribute_path("ship.name"))
+
+    def test_as_attribute_path(self):
+        """
+        Test that compiled paths are passed through and attributes are compiled.
+        """
+        compiled = attribute_path("ship.name")
+        self.assertIs(as_attribute_path(compiled), compiled)
+        self.assertIs(as_attribute_path("ship.name"), compile_attribute_path("ship.name"))
@@ -0,0 +1,114 @@
+"""
+Testing the columnar file reader and writer
+"""
+import unittest
+import os
+import shutil
+from cybercaptain.utils.columnarFileHandler import columnar_file_writer, columnar_file_reader, record_file_reader, record_file_writer, is_columnar_file
+from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.exceptions import LinePassedError, LineNotFoundError
+from cybercaptain.processing.group import processing_group
+from cybercaptain.processing.filter import processing_filter
+
+TESTDATA_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
+TESTDATA_SRC = os.path.join(TESTDATA_FOLDER, 'input_data_10.ccsf')
+TESTDATA_SRC_CLEANED = os.path.join(TESTDATA_FOLDER, 'input_data_10_cleaned.ccsf')
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(TESTDATA_FOLDER, 'output')
+TESTDATA_COLUMNAR = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'records.cccol')
+
+def read_all(reader):
+    records = []
+    while not reader.isEOF():
+        records.append(reader.readRecord())
+    reader.close()
+    return records
+
+class ColumnarFileHandlerTest(unittest.TestCase):
+    """
+    Test the columnar file handler.
+    """
+    def setUp(self):
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+        self.records = read_all(json_file_reader(TESTDATA_SRC))
+
+    def tearDown(self):
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def write_columnar(self, records, row_group_size=3):
+        writer = columnar_file_writer(TESTDATA_COLUMNAR, row_group_size=row_group_size)
+        writer.writeRecords(records)
+        writer.close()
+
+    def test_roundtrip(self):
+        """
+        Test that the datasets are read as they were written, including missing attributes and non dict values
+        """
+        records = self.records + [{"ip": "1.1.1.1", "data": {}}, {"ip": None, "hostnames": ["a", "b"]}, "no dict", None]
+        self.write_columnar(records)
+        self.assertTrue(is_columnar_file(TESTDATA_COLUMNAR))
+        self.assertEqual(read_all(columnar_file_reader(TESTDATA_COLUMNAR)), records)
+        self.assertFalse(os.path.exists(TESTDATA_COLUMNAR + ".tmp"))
+
+    def test_projection(self):
+        """
+        Test that only the wanted attributes are read
+        """
+        self.write_columnar(self.records + [{"hostnames": ["a", "b"]}])
+        projected = read_all(columnar_file_reader(TESTDATA_COLUMNAR, columns=["ip", "data.xssh.server_id.software", "hostnames.1"]))
+
+        self.assertEqual(projected[0], {"ip": "196.18.152.57", "data": {"xssh": {}}})
+        self.assertEqual(projected[1], {"ip": "35.184.140.4", "data": {"xssh": {"server_id": {"software": "OpenSSH_7.4p1"}}}})
+        self.assertEqual(projected[-1], {"hostnames": ["a", "b"]})
+
+    def test_where(self):
+        """
+        Test that the predicate only returns the matching datasets with all wanted attributes
+        """
+        self.write_columnar(self.records)
+        reader = columnar_file_reader(TESTDATA_COLUMNAR, where=(["ip"], lambda r: r["ip"].startswith("1")))
+        self.assertEqual(read_all(reader), [r for r in self.records if r["ip"].startswith("1")])
+        self.assertEqual(reader.filtered_rows, len([r for r in self.records if not r["ip"].startswith("1")]))
+
+    def test_read_line_record(self):
+        """
+        Test that the dataset with the given number is read and passed or missing ones raise
+        """
+        self.write_columnar(self.records)
+        reader = columnar_file_reader(TESTDATA_COLUMNAR)
+        self.assertEqual(reader.readLineRecord(5), self.records[4])
+        with self.assertRaises(LinePassedError):
+            reader.readLineRecord(5)
+        with self.assertRaises(LineNotFoundError):
+            reader.readLineRecord(len(self.records) + 1)
+        reader.close()
+
+    def test_record_file_handlers(self):
+        """
+        Test that the format is selected by the target extension and the file content
+        """
+        self.assertIsInstance(record_file_writer(TESTDATA_COLUMNAR), columnar_file_writer)
+        json_target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'records.cctf')
+        json_fw = record_file_writer(json_target)
+        self.assertIsInstance(json_fw, json_file_writer)
+        json_fw.writeRecord({"ip": "1.1.1.1"})
+        json_fw.close()
+        self.assertIsInstance(record_file_reader(json_target), json_file_reader)
+
+    def test_modules(self):
+        """
+        Test that a columnar intermediate file gives the same results as a JSON one
+        """
+        json_target = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'filtered.cctf')
+        for target in [json_target, TESTDATA_COLUMNAR]:
+            processing_filter(src=TESTDATA_SRC_CLEANED, target=target, filterby="data.xssh.server_id.software", rule="RE OpenSSH_7").run()
+        self.assertTrue(is_columnar_file(TESTDATA_COLUMNAR))
+        self.assertEqual(read_all(record_file_reader(TESTDATA_COLUMNAR)), read_all(record_file_reader(json_target)))
+
+        grouped = []
+        for src in [json_target, TESTDATA_COLUMNAR]:
+            target = src + ".grouped"
+            processing_group(src=src, target=target, groupby="data.xssh.server_id.software").run()
+            grouped.append(read_all(record_file_reader(target)))
+        self.assertEqual(grouped[0], grouped[1])
+        self.assertTrue(len(grouped[0]) > 0)
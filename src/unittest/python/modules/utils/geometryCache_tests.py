@@ -0,0 +1,47 @@
+"""
+Testing the map geometry cache
+"""
+import unittest
+import os
+import shutil
+from cybercaptain.utils import geometryCache
+from cybercaptain.utils.geometryCache import load_geometry
+
+TESTDATA_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(TESTDATA_FOLDER, 'output')
+TESTDATA_CACHE_DIR = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, '.cc_map_cache')
+TESTDATA_GEOJSON = os.path.join(TESTDATA_FOLDER, 'test.geojson')
+
+class GeometryCacheTest(unittest.TestCase):
+    """
+    Test the geometry cache.
+    """
+    def setUp(self):
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+        geometryCache.clear_memory()
+
+    def tearDown(self):
+        geometryCache.clear_memory()
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def test_load_geometry(self):
+        """
+        Test that the geometry is preprocessed once and returned as independent copies from memory and disk
+        """
+        gp_map = load_geometry(TESTDATA_GEOJSON, TESTDATA_CACHE_DIR)
+        self.assertIn('centroid', gp_map.columns)
+        self.assertIn('ISO_A3', gp_map.columns)
+        self.assertEqual(len(os.listdir(TESTDATA_CACHE_DIR)), 1)
+
+        gp_map['grouped_value'] = 1
+        self.assertNotIn('grouped_value', load_geometry(TESTDATA_GEOJSON, TESTDATA_CACHE_DIR).columns)
+
+        geometryCache.clear_memory()
+        gp_map_disk = load_geometry(TESTDATA_GEOJSON, TESTDATA_CACHE_DIR)
+        self.assertTrue(gp_map_disk['geometry'].equals(gp_map['geometry']))
+        self.assertEqual(list(gp_map_disk['ISO_A3']), list(gp_map['ISO_A3']))
+
+        simplified = load_geometry(TESTDATA_GEOJSON, TESTDATA_CACHE_DIR, simplify_tolerance=1.0)
+        self.assertEqual(len(simplified), len(gp_map))
+        self.assertEqual(len(os.listdir(TESTDATA_CACHE_DIR)), 2)
@@ -1,9 +1,11 @@
 import unittest, os
 
-from cybercaptain.utils.helpers import str2bool, fileExists, is_valid_url, make_sha1, keyGen, genBTree
+from cybercaptain.utils.attributePath import compile_attribute_path
+from cybercaptain.utils.helpers import str2bool, fileExists, is_valid_url, make_sha1, keyGen, genBTree, encodeKey, decodeKey, legacyKey
 TESTDATA_OUT_FILENAME = os.path.join(os.path.dirname(__file__), '../assets/utilsHelpersTestFile.ccc')
 TESTDATA_CONFIG_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
 TESTDATA_CONFIG_VALID_PATH = os.path.join(TESTDATA_CONFIG_FOLDER, 'ProcessingJoinTest.cctf')
+TESTDATA_CONFIG_RIGHT_PATH = os.path.join(TESTDATA_CONFIG_FOLDER, 'ProcessingJoinTestRight.cctf')
 
 class UtilsHelpersTest(unittest.TestCase):
     """
@@ -50,14 +52,32 @@ class UtilsHelpersTest(unittest.TestCase):
         Tests if the B-Tree is generated correctly.
         """
         b_tree = genBTree(TESTDATA_CONFIG_VALID_PATH, ["name"])
-        self.assertEqual(list(b_tree.items()), [("Luffy", {"name": "Luffy", "bounty": 500000000}), ("Nami", {"name": "Nami", "bounty": 66000000}), ("Zoro", {"name": "Zoro", "bounty": 320000000})])
+        self.assertEqual(list(b_tree.values()), [{"name": "Luffy", "bounty": 500000000}, {"name": "Nami", "bounty": 66000000}, {"name": "Zoro", "bounty": 320000000}])
+        self.assertEqual([encodeKey(key) for key in b_tree.keys()], [["Luffy"], ["Nami"], ["Zoro"]])
+
+        b_tree = genBTree(TESTDATA_CONFIG_RIGHT_PATH, ["crew"], multi=True)
+        self.assertEqual(len(b_tree[decodeKey(["Luffy"])]), 2)
+        self.assertEqual(b_tree[decodeKey(["Sanji"])], [{"crew": "Sanji", "fruit": "None"}])
 
     def testKeyGen(self):
         """
         Tests if the keys are generated properly.
         """
         key = keyGen(["name", "bounty"], {"name": "Luffy", "bounty": 500000000})
-        self.assertEqual(key, "Luffy500000000")
+        self.assertEqual(encodeKey(key), ["Luffy", 500000000])
+        self.assertEqual(decodeKey(encodeKey(key)), key)
+        self.assertEqual(legacyKey(key), "Luffy500000000")
 
         key = keyGen(["name"], {"name": "Luffy", "bounty": 500000000})
-        self.assertEqual(key, "Luffy")
+        self.assertEqual(encodeKey(key), ["Luffy"])
+        self.assertIsNone(keyGen(["crew"], {"name": "Luffy"}))
+
+        # Adjacent and differently typed values must not collide
+        self.assertNotEqual(keyGen(["a", "b"], {"a": "1", "b": "23"}), keyGen(["a", "b"], {"a": "12", "b": "3"}))
+        self.assertNotEqual(keyGen(["a"], {"a": 1}), keyGen(["a"], {"a": "1"}))
+        key = keyGen(["a"], {"a": {"b": [1, 2]}})
+        self.assertEqual(decodeKey(encodeKey(key)), key)
+
+        # Compiled attribute paths generate the same keys
+        data = {"name": "Luffy", "ship": {"name": "Going Merry"}}
+        self.assertEqual(keyGen([compile_attribute_path("name"), compile_attribute_path("ship.name")], data), keyGen(["name", "ship.name"], data))
@@ -0,0 +1,164 @@
+"""
+Testing the HTTP range downloader against a local HTTP server
+"""
+import unittest
+import os
+import re
+import json
+import shutil
+import base64
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from cybercaptain.utils.httpDownloader import range_downloader
+from cybercaptain.utils.exceptions import ChecksumError
+
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(os.path.dirname(__file__), '../assets/output')
+TESTDATA_TARGET = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'downloaded.bin')
+TESTDATA_CONTENT = bytes(range(256)) * 40 # 10240 bytes
+PART_SIZE = 1000
+
+class _range_request_handler(BaseHTTPRequestHandler):
+    """
+    Serves the test content with optional range request support.
+    """
+    def do_GET(self):
+        server = self.server
+        requested_range = self.headers.get("Range")
+        server.requested_ranges.append(requested_range)
+
+        if requested_range and server.supports_ranges:
+            start, end = map(int, re.match(r"bytes=(\d+)-(\d+)", requested_range).groups())
+            end = min(end, len(server.content) - 1)
+            if (start, end) in server.fail_once:
+                server.fail_once.remove((start, end))
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = server.content[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%s" % (start, end, "*" if server.unknown_size else len(server.content)))
+        else:
+            body = server.content
+            self.send_response(200)
+
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"unittest"')
+        if server.digest: self.send_header("Digest", "SHA-256=" + server.digest)
+        if server.content_md5: self.send_header("Content-MD5", base64.b64encode(hashlib.md5(body).digest()).decode())
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class HttpDownloaderTest(unittest.TestCase):
+    """
+    Test the range downloader class.
+    """
+    def setUp(self):
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _range_request_handler)
+        self.server.content = TESTDATA_CONTENT
+        self.server.supports_ranges = True
+        self.server.requested_ranges = []
+        self.server.fail_once = set()
+        self.server.unknown_size = False
+        self.server.content_md5 = False
+        self.server.digest = base64.b64encode(hashlib.sha256(TESTDATA_CONTENT).digest()).decode()
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.url = "http://127.0.0.1:%d/dataset.lz4" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def read_target(self):
+        with open(TESTDATA_TARGET, "rb") as f:
+            return f.read()
+
+    def test_range_download(self):
+        """
+        Test the download over concurrent range requests with a retried range
+        """
+        self.server.fail_once.add((2000, 2999))
+        range_downloader(self.url, connections=4, part_size=PART_SIZE).download(TESTDATA_TARGET)
+
+        self.assertEqual(self.read_target(), TESTDATA_CONTENT)
+        self.assertEqual(len(self.server.requested_ranges), 1 + 11 + 1) # probe + 11 parts + retry
+        self.assertFalse(os.path.exists(TESTDATA_TARGET + ".part"))
+        self.assertFalse(os.path.exists(TESTDATA_TARGET + ".state"))
+
+    def test_resume(self):
+        """
+        Test that an interrupted download only fetches the missing ranges
+        """
+        with open(TESTDATA_TARGET + ".part", "wb") as f:
+            f.write(TESTDATA_CONTENT[:3000] + b"\0" * (len(TESTDATA_CONTENT) - 3000))
+        with open(TESTDATA_TARGET + ".state", "w") as f:
+            json.dump({"url": self.url, "size": len(TESTDATA_CONTENT), "validator": '"unittest"', "part_size": PART_SIZE, "done": [0, 1, 2]}, f)
+
+        range_downloader(self.url, connections=2, part_size=PART_SIZE).download(TESTDATA_TARGET)
+
+        self.assertEqual(self.read_target(), TESTDATA_CONTENT)
+        self.assertNotIn("bytes=0-999", self.server.requested_ranges)
+        self.assertNotIn("bytes=2000-2999", self.server.requested_ranges)
+        self.assertIn("bytes=3000-3999", self.server.requested_ranges)
+
+    def test_checksum(self):
+        """
+        Test the verification of the expected and the server sent checksums
+        """
+        with self.assertRaises(ChecksumError):
+            range_downloader(self.url, part_size=PART_SIZE, expected_sha256="0" * 64).download(TESTDATA_TARGET)
+        self.assertFalse(os.path.exists(TESTDATA_TARGET))
+
+        self.server.digest = base64.b64encode(hashlib.sha256(b"another file").digest()).decode()
+        with self.assertRaises(ChecksumError):
+            range_downloader(self.url, part_size=PART_SIZE).download(TESTDATA_TARGET)
+        self.assertFalse(os.path.exists(TESTDATA_TARGET))
+
+    def test_content_md5(self):
+        """
+        Test that the Content-MD5 of the partial probe response is skipped and the one of the whole file is verified
+        """
+        self.server.content_md5 = True
+        downloader = range_downloader(self.url, part_size=PART_SIZE)
+        downloader.download(TESTDATA_TARGET)
+        self.assertEqual(self.read_target(), TESTDATA_CONTENT)
+        self.assertNotIn("md5", downloader.expected_checksums)
+
+        # Size unknown in the partial probe response, the checksums of the whole file response are used
+        os.remove(TESTDATA_TARGET)
+        self.server.unknown_size = True
+        downloader = range_downloader(self.url, part_size=PART_SIZE)
+        downloader.download(TESTDATA_TARGET)
+        self.assertEqual(self.read_target(), TESTDATA_CONTENT)
+        self.assertEqual(downloader.expected_checksums["md5"], hashlib.md5(TESTDATA_CONTENT).hexdigest())
+
+    def test_no_range_support(self):
+        """
+        Test the fallback to a single connection if the server ignores range requests
+        """
+        self.server.supports_ranges = False
+        range_downloader(self.url, part_size=PART_SIZE, expected_sha256=hashlib.sha256(TESTDATA_CONTENT).hexdigest()).download(TESTDATA_TARGET)
+
+        self.assertEqual(self.read_target(), TESTDATA_CONTENT)
+        self.assertEqual(len(self.server.requested_ranges), 1)
+
+    def test_stream(self):
+        """
+        Test streaming the file in order over concurrent range requests
+        """
+        chunks = list(range_downloader(self.url, connections=3, part_size=PART_SIZE).stream())
+        self.assertEqual(b"".join(chunks), TESTDATA_CONTENT)
+        self.assertEqual(len(chunks), 11)
+        self.assertFalse(os.path.exists(TESTDATA_TARGET))
+
+        self.server.digest = base64.b64encode(hashlib.sha256(b"another file").digest()).decode()
+        with self.assertRaises(ChecksumError):
+            list(range_downloader(self.url, part_size=PART_SIZE).stream())
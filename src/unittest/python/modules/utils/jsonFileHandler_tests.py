@@ -6,12 +6,14 @@ import os
 import shutil
 import json
 
-from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer
+from cybercaptain.utils.jsonFileHandler import json_file_reader, json_file_writer, json_projection
+from cybercaptain.utils.attributePath import compile_attribute_path
 from cybercaptain.utils.exceptions import LinePassedError, LineNotFoundError
 
 TESTDATA_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
 TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(TESTDATA_FOLDER, '../output')
 TESTDATA_SRC_FILENAME = os.path.join(TESTDATA_FOLDER, 'json_file_reader.json')
+TESTDATA_WIDE_FILENAME = os.path.join(TESTDATA_FOLDER, 'input_data_10.ccsf')
 TESTDATA_TARGET_FILENAME = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'json_file_writer.json')
 
 class FileReaderTest(unittest.TestCase):
@@ -110,3 +112,57 @@ class FileWriterTest(unittest.TestCase):
         self.fw.writeRecord('{"a" : 1}')
         self.fw.abort()
         self.assertTrue(os.path.exists(TESTDATA_TARGET_FILENAME+'.tmp'), "File must be found!")
+
+class JsonProjectionTest(unittest.TestCase):
+    """
+    Test the partial decoding of the wanted attributes.
+    """
+    def setUp(self):
+        with open(TESTDATA_WIDE_FILENAME, 'r') as f:
+            self.lines = f.read().splitlines()
+
+    def assert_projection(self, attributes, line):
+        record = json.loads(line)
+        projected = json_projection(attributes).decode(line)
+        for attribute in attributes:
+            path = compile_attribute_path(attribute)
+            self.assertEqual(path(projected, "MISSING"), path(record, "MISSING"))
+        return projected
+
+    def test_projection(self):
+        """
+        Test that the wanted attributes are decoded as with the complete decoding
+        """
+        for attributes in [["ip"], ["data.xssh.server_id.software"], ["error", "ip"], ["data.xssh.server_id", "data.xssh.server_id.version"],
+                           ["data.xssh.server_key_exchange.kex_algorithms.1", "timestamp"], ["data.xssh.algorithm_selection.dh_kex_algorithm"]]:
+            for line in self.lines:
+                self.assert_projection(attributes, line)
+
+        projected = json_projection(["ip", "data.xssh.server_id.software"]).decode(self.lines[1])
+        self.assertEqual(projected, {"ip": "35.184.140.4", "data": {"xssh": {"server_id": {"software": "OpenSSH_7.4p1"}}}})
+        self.assertEqual(json_projection(["not_existing"]).decode(self.lines[1]), {})
+
+    def test_formatting(self):
+        """
+        Test lines with whitespace, escaped keys and broken lines
+        """
+        line = ' { "a" : [1, {"b": "}"}] ,\t"k\\u00fc" : { "c\\"d" : 2 , "e": null } , "f" : "x" } '
+        self.assertEqual(self.assert_projection(["k\u00fc.c\"d", "f"], line), {"k\u00fc": {"c\"d": 2}, "f": "x"})
+        self.assertEqual(self.assert_projection(["a.1.b"], line), {"a": [1, {"b": "}"}]})
+        self.assertEqual(json_projection(["f"]).decode('["f", "no dataset"]'), ["f", "no dataset"])
+        with self.assertRaises(ValueError):
+            json_projection(["a"]).decode('{"a": [1, 2}')
+
+    def test_reader(self):
+        """
+        Test the reader with columns and a where predicate
+        """
+        json_fr = json_file_reader(TESTDATA_WIDE_FILENAME, columns=["ip"], where=(["data.xssh.server_id.software"], lambda r: "OpenSSH_7" in compile_attribute_path("data.xssh.server_id.software")(r, "")))
+        records = []
+        while not json_fr.isEOF():
+            records.append(json_fr.readRecord())
+        json_fr.close()
+
+        expected = [{"ip": json.loads(l)["ip"]} for l in self.lines if '"software":"OpenSSH_7' in l]
+        self.assertEqual(records, expected)
+        self.assertEqual(json_fr.filtered_rows, len(self.lines) - len(expected))
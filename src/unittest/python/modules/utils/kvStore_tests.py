@@ -4,11 +4,23 @@ Testing the KV Store
 import unittest
 import shutil
 import os
+import multiprocessing
 from cybercaptain.utils.kvStore import kv_store
 
 TESTDATA_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(TESTDATA_FOLDER, 'output')
 TESTDATA_STORE_EXIST_FILENAME = 'kvstore_exist.ccdb'
 
+def increment_counter(dir_name, file_name, times):
+    """
+    Increments the counter in the given store within a transaction (run in a separate process).
+    """
+    store = kv_store(dir_name, file_name)
+    for _ in range(times):
+        with store.transaction():
+            store.put("counter", int(store.get("counter") or 0) + 1)
+    store.close()
+
 class KvStoreTest(unittest.TestCase):
     """
     Test the k/v store class.
@@ -17,10 +29,15 @@ class KvStoreTest(unittest.TestCase):
         super().__init__(*args, **kwargs)
 
     def setUp(self):
-        self.kvstore = kv_store(TESTDATA_FOLDER, TESTDATA_STORE_EXIST_FILENAME)
+        # Work on a copy as the existing (configobj) store gets migrated on the first access
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+        shutil.copy(os.path.join(TESTDATA_FOLDER, TESTDATA_STORE_EXIST_FILENAME), TESTDATA_GEN_OUTPUT_FOLDER)
+        self.kvstore = kv_store(TESTDATA_GEN_OUTPUT_FOLDER, TESTDATA_STORE_EXIST_FILENAME)
 
     def tearDown(self):
-        pass
+        self.kvstore.close()
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
 
     def test_get_values(self):
         """
@@ -84,4 +101,72 @@ class KvStoreTest(unittest.TestCase):
         self.kvstore.reload()
         self.assertEqual(self.kvstore.get("testvalue2", section="test_section"), '1')
         self.assertEqual(self.kvstore.put("testvalue2", '2', section="test_section", force=True), True)
-        self.kvstore.reload()
\ No newline at end of file
+        self.kvstore.reload()
+    def test_migration(self):
+        """
+        Test the migration of the existing configobj store to SQLite
+        """
+        store_path = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, TESTDATA_STORE_EXIST_FILENAME)
+        self.assertTrue(kv_store.is_configobj_store(store_path))
+        self.assertEqual(self.kvstore.get("testvalue1", section="test_section"), 'Test2')
+        self.assertFalse(kv_store.is_configobj_store(store_path))
+        self.assertTrue(os.path.isfile(store_path + ".configobj.bak"))
+
+        # Reopening the migrated store keeps the values
+        self.kvstore.close()
+        self.kvstore = kv_store(TESTDATA_GEN_OUTPUT_FOLDER, TESTDATA_STORE_EXIST_FILENAME)
+        self.assertEqual(self.kvstore.get("testvalue3"), ["test1", "test2", "test3"])
+
+    def test_sets(self):
+        """
+        Test the set membership methods
+        """
+        # Existing list values are moved into the set
+        self.assertTrue(self.kvstore.in_set("testvalue3", "test1"))
+        self.assertFalse(self.kvstore.in_set("testvalue3", "test4"))
+        self.assertEqual(self.kvstore.get("testvalue3"), None)
+
+        # Add Members - No Persist
+        self.assertEqual(self.kvstore.add_to_set("testvalue3", "test4"), True)
+        self.assertTrue(self.kvstore.in_set("testvalue3", "test4"))
+        self.kvstore.reload()
+        self.assertFalse(self.kvstore.in_set("testvalue3", "test4"))
+
+        # Add Members - Persist
+        self.assertEqual(self.kvstore.add_to_set("new_set", "member1", section="test_section", force=True), True)
+        self.kvstore.add_to_set("new_set", "member1", section="test_section", force=True)
+        self.kvstore.reload()
+        self.assertTrue(self.kvstore.in_set("new_set", "member1", section="test_section"))
+        self.assertEqual(self.kvstore.get_set("new_set", section="test_section"), {"member1"})
+        self.assertEqual(self.kvstore.get_set("not_existing_set"), set())
+
+    def test_transactions(self):
+        """
+        Test the atomic transactions
+        """
+        # Commit - all values persisted even without force
+        with self.kvstore.transaction():
+            self.kvstore.put("testvalue1", 'TestChanged')
+            self.kvstore.add_to_set("new_set", "member1")
+        self.kvstore.reload()
+        self.assertEqual(self.kvstore.get("testvalue1"), 'TestChanged')
+        self.assertTrue(self.kvstore.in_set("new_set", "member1"))
+
+        # Rollback - nothing persisted even with force
+        with self.assertRaises(ValueError):
+            with self.kvstore.transaction():
+                self.kvstore.put("testvalue1", 'TestRolledBack', force=True)
+                self.kvstore.put("testvalue2", '100', force=True)
+                raise ValueError("Abort")
+        self.assertEqual(self.kvstore.get("testvalue1"), 'TestChanged')
+        self.assertEqual(self.kvstore.get("testvalue2"), '1')
+
+    def test_concurrent_processes(self):
+        """
+        Test that concurrent processes updating the same store do not lose updates
+        """
+        self.kvstore.put("counter", 0, force=True)
+        processes = [multiprocessing.Process(target=increment_counter, args=(TESTDATA_GEN_OUTPUT_FOLDER, TESTDATA_STORE_EXIST_FILENAME, 25)) for _ in range(4)]
+        for process in processes: process.start()
+        for process in processes: process.join()
+        self.assertEqual(self.kvstore.get("counter"), '100')
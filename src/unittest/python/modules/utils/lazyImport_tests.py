@@ -0,0 +1,95 @@
+"""
+Testing the lazy imports of the third party packages
+"""
+import unittest
+import os
+import sys
+import subprocess
+from cybercaptain.utils.lazyImport import lazy_import
+
+SRC_FOLDER = os.path.join(os.path.dirname(__file__), '../../../../main/python')
+HEAVY_PACKAGES = ["matplotlib", "geopandas", "pandas", "numpy", "shodan", "censys", "geoip2", "BTrees", "jinja2", "pyarrow"]
+IMPORT_TIME_BUDGET = 5 # Seconds, generous to not fail on slow machines
+
+# Imports the runner and all modules of the modules config and prints the heavy packages which got imported
+IMPORT_SCRIPT = """
+import sys, time, importlib, configobj
+start = time.perf_counter()
+import runCybercaptain
+for name, conf in configobj.ConfigObj("modules.ccc").items():
+    if isinstance(conf, list) and conf[0].startswith("cybercaptain."): importlib.import_module(conf[0])
+elapsed = time.perf_counter() - start
+print(",".join(p for p in %r if p in sys.modules))
+print(elapsed)
+""" % (HEAVY_PACKAGES,)
+
+# Creates and so validates the visualization modules with a colormap and the Arrow export with column types and prints the heavy packages which got imported
+VALIDATE_SCRIPT = """
+import sys
+from cybercaptain.visualization.bar import visualization_bar
+from cybercaptain.visualization.line import visualization_line
+from cybercaptain.visualization.map import visualization_map
+from cybercaptain.export.arrow import export_arrow
+root_confs = {"projectRoot": ".", "projectName": "UNITTEST.cckv", "moduleName": "UNITTEST_MODULE"}
+visualization_bar(src=".", target="bar.png", type="groupedbarplot", dataAttribute=".", groupNameAttribute=".", colormap="viridis", **root_confs)
+visualization_line(src=".", target="line.png", type="groupedlineplot", dataAttribute=".", groupNameAttribute=".", colormap="viridis", **root_confs)
+visualization_map(src=".", target="map.png", map="world", type="heatmap", countryCodeAttribute=".", groupedValueAttribute=".", colormap="viridis", **root_confs)
+export_arrow(src=".", target="export.arrow", exportedAttributes="all", columnTypes={"port": "int32"}, **root_confs)
+print(",".join(p for p in %r if p in sys.modules))
+""" % (HEAVY_PACKAGES,)
+
+class LazyImportTest(unittest.TestCase):
+    """
+    Test the lazy import class.
+    """
+    def test_import_on_access(self):
+        """
+        Test that the module is imported on the first attribute access only
+        """
+        sys.modules.pop("colorsys", None)
+        colorsys = lazy_import("colorsys")
+        self.assertNotIn("colorsys", sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(1, 0, 0), (0, 1, 1))
+        self.assertIn("colorsys", sys.modules)
+        self.assertEqual(repr(colorsys), "lazy_import('colorsys')")
+
+    def test_submodule_access(self):
+        """
+        Test that submodules not imported by their package are imported on access
+        """
+        dom = lazy_import("xml.dom")
+        self.assertEqual(dom.minidom.parseString("<a/>").documentElement.tagName, "a")
+        with self.assertRaises(ImportError):
+            dom.not_existing
+
+    def test_setattr_passed_on(self):
+        """
+        Test that attributes set on the stand in are set on the module (E.g. mocks in the tests)
+        """
+        json = lazy_import("json")
+        original = sys.modules["json"].dumps
+        try:
+            json.dumps = "mocked"
+            self.assertEqual(sys.modules["json"].dumps, "mocked")
+        finally:
+            json.dumps = original
+
+    def test_run_import_budget(self):
+        """
+        Test that the runner and the modules do not import the heavy packages and stay in the import time budget
+        """
+        env = dict(os.environ, PYTHONPATH=os.path.abspath(SRC_FOLDER))
+        result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=os.path.abspath(SRC_FOLDER), env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        imported, elapsed = result.stdout.splitlines()[-2:]
+        self.assertEqual(imported, "")
+        self.assertLess(float(elapsed), IMPORT_TIME_BUDGET)
+
+    def test_validate_without_import(self):
+        """
+        Test that validating the visualization modules with a colormap and the Arrow export with column types does not import the heavy packages
+        """
+        env = dict(os.environ, PYTHONPATH=os.path.abspath(SRC_FOLDER))
+        result = subprocess.run([sys.executable, "-c", VALIDATE_SCRIPT], cwd=os.path.abspath(SRC_FOLDER), env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        self.assertEqual(result.stdout.splitlines()[-1], "")
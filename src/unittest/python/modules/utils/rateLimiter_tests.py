@@ -0,0 +1,26 @@
+"""
+Testing the token bucket rate limiter
+"""
+import unittest
+from cybercaptain.utils.rateLimiter import token_bucket
+
+class RateLimiterTest(unittest.TestCase):
+    """
+    Test the token bucket class.
+    """
+    def test_reserve(self):
+        """
+        Test that a burst up to the capacity is free and further tokens have to wait
+        """
+        bucket = token_bucket(10, capacity=2)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, places=2)
+
+    def test_invalid_rate(self):
+        """
+        Test that the rate has to be positive
+        """
+        with self.assertRaises(ValueError):
+            token_bucket(0)
@@ -0,0 +1,49 @@
+"""
+Testing the render pool of the visualizations
+"""
+import unittest
+import os
+import shutil
+from cybercaptain.utils.renderPool import render_pool
+
+TESTDATA_FOLDER = os.path.join(os.path.dirname(__file__), '../assets')
+TESTDATA_GEN_OUTPUT_FOLDER = os.path.join(TESTDATA_FOLDER, 'output')
+TESTDATA_SRC_FILENAME = os.path.join(TESTDATA_FOLDER, 'chart_inputs', 'input_data_10_counted-*.ccsf')
+BAR_MODULE_CONF = ["cybercaptain.visualization.bar", "visualization_bar"]
+
+class RenderPoolTest(unittest.TestCase):
+    """
+    Test the render pool class.
+    """
+    def setUp(self):
+        if not os.path.exists(TESTDATA_GEN_OUTPUT_FOLDER):
+            os.makedirs(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def tearDown(self):
+        shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+
+    def bar_task(self, plot_type, target):
+        return {'src': TESTDATA_SRC_FILENAME,
+                'type': plot_type,
+                'dataAttribute': 'grouped_value',
+                'groupNameAttribute': 'group_name',
+                'projectRoot': TESTDATA_GEN_OUTPUT_FOLDER,
+                'projectName': "UNITTEST.cckv",
+                'moduleName': "UNITEST_MODULE",
+                'target': os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, target)}
+
+    def test_render(self):
+        """
+        Test that the plots are rendered in worker processes and failed tasks are reported
+        """
+        renderer = render_pool(2)
+        renderer.submit("visualization_bar BAR1", BAR_MODULE_CONF, self.bar_task('groupedbarplot', 'bar1.png'))
+        renderer.submit("visualization_bar BAR2", BAR_MODULE_CONF, self.bar_task('barplot3d', 'bar2.png'))
+        renderer.submit("visualization_bar BAR3", BAR_MODULE_CONF, self.bar_task('unknownplot', 'bar3.png'))
+        results = renderer.wait()
+        renderer.shutdown()
+
+        self.assertEqual(results, {"visualization_bar BAR1": True, "visualization_bar BAR2": True, "visualization_bar BAR3": False})
+        self.assertTrue(os.path.isfile(os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'bar1.png')))
+        self.assertTrue(os.path.isfile(os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'bar2.png')))
+        self.assertFalse(os.path.isfile(os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'bar3.png')))
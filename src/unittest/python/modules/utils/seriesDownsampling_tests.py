@@ -0,0 +1,35 @@
+"""
+Testing the downsampling of the line series
+"""
+import unittest
+import numpy as np
+from cybercaptain.utils.seriesDownsampling import lttb_indices
+
+class SeriesDownsamplingTest(unittest.TestCase):
+    """
+    Test the LTTB downsampling.
+    """
+    def test_short_series(self):
+        """
+        Test that series not longer than the maximum are kept as they are
+        """
+        self.assertEqual(list(lttb_indices([3, 1, 2], 5)), [0, 1, 2])
+        self.assertEqual(list(lttb_indices([3, 1, 2, 5, 4], 5)), [0, 1, 2, 3, 4])
+        self.assertEqual(list(lttb_indices([], 5)), [])
+
+    def test_downsampling(self):
+        """
+        Test that the first, last and outstanding points are kept
+        """
+        values = np.zeros(1000)
+        values[123] = 50
+        values[777] = -50
+        indices = lttb_indices(values, 20)
+        self.assertEqual(len(indices), 20)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(123, indices)
+        self.assertIn(777, indices)
+
+        indices = lttb_indices(np.sin(np.linspace(0, 20, 5000)), 3)
+        self.assertEqual(len(indices), 3)
@@ -0,0 +1,81 @@
+"""
+Testing the background task prefetcher
+"""
+import unittest
+import threading
+from cybercaptain.utils.taskPrefetcher import task_prefetcher
+
+class _fake_module():
+    """
+    Counts the runs and the concurrently running tasks.
+    """
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+    runs = []
+
+    def __init__(self, name, exists=False, succeeds=True):
+        self.name = name
+        self.exists = exists
+        self.succeeds = succeeds
+
+    def target_exists(self):
+        return self.exists
+
+    def pre_check(self):
+        return True
+
+    def run(self):
+        with self.lock:
+            _fake_module.running += 1
+            _fake_module.max_running = max(_fake_module.max_running, _fake_module.running)
+            _fake_module.runs.append(self.name)
+        threading.Event().wait(0.05)
+        with self.lock:
+            _fake_module.running -= 1
+        return self.succeeds
+
+    def post_check(self):
+        return True
+
+class TaskPrefetcherTest(unittest.TestCase):
+    """
+    Test the task prefetcher class.
+    """
+    def setUp(self):
+        _fake_module.running = 0
+        _fake_module.max_running = 0
+        _fake_module.runs = []
+
+    def test_prefetch(self):
+        """
+        Test that the tasks run with the given parallelism and the results are returned per task
+        """
+        prefetcher = task_prefetcher()
+        tasks = {"store censys T%d" % i: (lambda i=i: _fake_module(i, succeeds=i != 3)) for i in range(6)}
+        tasks["store censys EXISTS"] = lambda: _fake_module("EXISTS", exists=True)
+        prefetcher.submit(tasks, 2)
+
+        self.assertTrue(prefetcher.is_prefetched("store censys T0"))
+        self.assertFalse(prefetcher.is_prefetched("store censys OTHER"))
+        self.assertTrue(prefetcher.wait("store censys T0"))
+        self.assertFalse(prefetcher.wait("store censys T3"))
+        self.assertTrue(prefetcher.wait("store censys EXISTS"))
+        self.assertFalse(prefetcher.is_prefetched("store censys T0"))
+        prefetcher.shutdown()
+
+        self.assertEqual(sorted(_fake_module.runs), list(range(6)))
+        self.assertEqual(_fake_module.max_running, 2)
+
+    def test_exception(self):
+        """
+        Test that an exception of a task is raised when waiting for it
+        """
+        def failing_module():
+            raise RuntimeError("API not reachable")
+
+        prefetcher = task_prefetcher()
+        prefetcher.submit({"store shodan FAIL": failing_module}, 1)
+        with self.assertRaises(RuntimeError):
+            prefetcher.wait("store shodan FAIL")
+        prefetcher.shutdown()
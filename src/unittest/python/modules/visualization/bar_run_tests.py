@@ -1,4 +1,6 @@
-import unittest, os, shutil
+import unittest, os, shutil, glob, json
+from unittest.mock import patch
+import numpy as np
 
 from cybercaptain.visualization.bar import visualization_bar
 
@@ -29,6 +31,7 @@ class VisualizationBarRunTest(unittest.TestCase):
     
     def tearDown(self):
         shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+        shutil.rmtree(os.path.join(TESTDATA_FOLDER, '.cc_aggregate_cache'), ignore_errors=True)
         
     def test_run(self):
         """
@@ -228,4 +231,48 @@ class VisualizationBarRunTest(unittest.TestCase):
         vb = visualization_bar(**arguments)
         self.assertTrue(vb.run())
         self.assertTrue(os.path.isfile(TESTDATA_TARGET_FILENAME_PNG))
-        #self.assertTrue(open(TESTDATA_FOLDER+"/test-barplotgroupedstacked_horiz_100.png","rb").read() == open(TESTDATA_TARGET_FILENAME_PNG,"rb").read()) #Compare PNG
\ No newline at end of file
+        #self.assertTrue(open(TESTDATA_FOLDER+"/test-barplotgroupedstacked_horiz_100.png","rb").read() == open(TESTDATA_TARGET_FILENAME_PNG,"rb").read()) #Compare PNG
+    def test_histogram_counts(self):
+        """
+        Test if the batched histogram counts match the counts over all values
+        """
+        arguments = append_needed_args({'src': TESTDATA_SRC_FILENAME,
+            'type': 'histogram',
+            'dataAttribute': 'grouped_value',
+            'threshold': 5,
+            'target': TESTDATA_TARGET_FILENAME_PNG})
+        vb = visualization_bar(**arguments)
+        files = sorted(glob.glob(TESTDATA_SRC_FILENAME))
+        all_values = []
+        for file in files:
+            with open(file) as f:
+                all_values.extend(json.loads(line)['grouped_value'] for line in f if line.strip())
+        all_values = [v for v in all_values if int(v) >= 5]
+
+        with patch('cybercaptain.visualization.bar.HISTOGRAM_BATCH_SIZE', 3):
+            bin_edges = vb.get_histogram_bin_edges(files)
+            counts = sum(np.histogram(values, bins=bin_edges)[0] for file in files for values in vb.read_histogram_values(file))
+        expected_counts, expected_edges = np.histogram(all_values, bins=10)
+        self.assertTrue(np.allclose(bin_edges, expected_edges))
+        self.assertEqual(list(counts), list(expected_counts))
+
+        arguments['binRange'] = [0, 100]
+        arguments['bins'] = 4
+        vb = visualization_bar(**arguments)
+        self.assertEqual(list(vb.get_histogram_bin_edges(files)), [0, 25, 50, 75, 100])
+        self.assertTrue(vb.run())
+        self.assertTrue(os.path.isfile(TESTDATA_TARGET_FILENAME_PNG))
+
+    def test_run_not_existing_colormap(self):
+        """
+        Test that a not existing colormap fails the run without a plot
+        """
+        arguments = append_needed_args({'src': TESTDATA_SRC_FILENAME,
+            'type': 'groupedbarplot',
+            'dataAttribute': 'grouped_value',
+            'groupNameAttribute': 'group_name',
+            'colormap': 'NOTEXISTINGCOLORMAP',
+            'target': TESTDATA_TARGET_FILENAME_PNG})
+        vb = visualization_bar(**arguments)
+        self.assertFalse(vb.run())
+        self.assertFalse(os.path.isfile(TESTDATA_TARGET_FILENAME_PNG))
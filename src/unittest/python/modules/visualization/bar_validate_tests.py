@@ -98,14 +98,20 @@ class VisualizationBarTest(unittest.TestCase):
         with self.assertRaises(ValidationError):
             self.visualization.validate(arg8)
 
-        arg9 = {'src': '.',
-                'type': '.',
+        arg10 = {'src': '.',
+                'type': 'histogram',
                 'dataAttribute': '.',
-                'groupNameAttribute': '.',
-                'threshold': 4,
-                'colormap': 'NOTEXISTINGCOLORMAP',
-                'rotateYTicks': 2,
+                'bins': 0,
+                'target': '.'}
+
+        with self.assertRaises(ValidationError):
+            self.visualization.validate(arg10)
+
+        arg11 = {'src': '.',
+                'type': 'histogram',
+                'dataAttribute': '.',
+                'binRange': [100, 0],
                 'target': '.'}
 
         with self.assertRaises(ValidationError):
-            self.visualization.validate(arg9)
\ No newline at end of file
+            self.visualization.validate(arg11)
@@ -1,4 +1,4 @@
-import unittest, os, shutil
+import unittest, os, shutil, glob
 
 from cybercaptain.visualization.line import visualization_line
 
@@ -28,6 +28,7 @@ class VisualizationLineRunTest(unittest.TestCase):
     
     def tearDown(self):
         shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+        shutil.rmtree(os.path.join(TESTDATA_FOLDER, '.cc_aggregate_cache'), ignore_errors=True)
         
     def test_run(self):
         """
@@ -167,4 +168,42 @@ class VisualizationLineRunTest(unittest.TestCase):
         vl = visualization_line(**arguments)
         self.assertTrue(vl.run())
         self.assertTrue(os.path.isfile(TESTDATA_TARGET_FILENAME_PNG))
-        #self.assertTrue(open(TESTDATA_FOLDER+"/test-comparedlineplot-figsize.png","rb").read() == open(TESTDATA_TARGET_FILENAME_PNG,"rb").read()) #Compare PNG
\ No newline at end of file
+        #self.assertTrue(open(TESTDATA_FOLDER+"/test-comparedlineplot-figsize.png","rb").read() == open(TESTDATA_TARGET_FILENAME_PNG,"rb").read()) #Compare PNG
+    def test_run_top_groups_downsampled(self):
+        """
+        Test if the visu line run method limits the groups and downsamples the lines
+        """
+        arguments = append_needed_args({'src': TESTDATA_SRC_FILENAME,
+            'type': 'groupedlineplot',
+            'dataAttribute': 'grouped_value',
+            'groupNameAttribute': 'group_name',
+            'topGroups': 5,
+            'maxPoints': 4,
+            'target': TESTDATA_TARGET_FILENAME_PNG})
+        vl = visualization_line(**arguments)
+        file_count, _, data_dict = vl.get_data_from_files(sorted(glob.glob(TESTDATA_SRC_FILENAME)))
+        self.assertEqual(len(data_dict), 6)
+        self.assertIn("Others", data_dict)
+        self.assertTrue(vl.run())
+        self.assertTrue(os.path.isfile(TESTDATA_TARGET_FILENAME_PNG))
+
+        arguments['type'] = 'comparedlineplot'
+        arguments['showOthers'] = False
+        vl = visualization_line(**arguments)
+        self.assertEqual(len(vl.get_data_from_files(sorted(glob.glob(TESTDATA_SRC_FILENAME)))[2]), 5)
+        self.assertTrue(vl.run())
+        self.assertTrue(os.path.isfile(TESTDATA_TARGET_FILENAME_PNG))
+
+    def test_run_not_existing_colormap(self):
+        """
+        Test that a not existing colormap fails the run without a plot
+        """
+        arguments = append_needed_args({'src': TESTDATA_SRC_FILENAME,
+            'type': 'groupedlineplot',
+            'dataAttribute': 'grouped_value',
+            'groupNameAttribute': 'group_name',
+            'colormap': 'NOTEXISTINGCOLORMAP',
+            'target': TESTDATA_TARGET_FILENAME_PNG})
+        vl = visualization_line(**arguments)
+        self.assertFalse(vl.run())
+        self.assertFalse(os.path.isfile(TESTDATA_TARGET_FILENAME_PNG))
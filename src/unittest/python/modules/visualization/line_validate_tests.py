@@ -91,9 +91,18 @@ class VisualizationLineTest(unittest.TestCase):
                 'type': '.',
                 'dataAttribute': '.',
                 'groupNameAttribute': '.',
-                'threshold': 4,
-                'colormap': 'NOTEXISTINGCOLORMAP',
+                'topGroups': 'NOTANINT',
                 'target': '.'}
 
         with self.assertRaises(ValidationError):
-            self.visualization.validate(arg)
\ No newline at end of file
+            self.visualization.validate(arg)
+
+        arg = {'src': '.',
+                'type': '.',
+                'dataAttribute': '.',
+                'groupNameAttribute': '.',
+                'maxPoints': 2,
+                'target': '.'}
+
+        with self.assertRaises(ValidationError):
+            self.visualization.validate(arg)
@@ -23,6 +23,7 @@ class DataVisualizationMapTest(unittest.TestCase):
     
     def tearDown(self):
         shutil.rmtree(TESTDATA_GEN_OUTPUT_FOLDER)
+        shutil.rmtree(os.path.join(TESTDATA_FOLDER, '.cc_map_cache'), ignore_errors=True)
 
     def test_run_plotting_heatmap(self):
         """
@@ -87,3 +88,39 @@ class DataVisualizationMapTest(unittest.TestCase):
 
         self.assertFalse(v_map.run())
         self.assertFalse(os.path.isfile(target_file_name))
+
+    def test_aggregate_country_values(self):
+        """
+        Testing that the grouped values of alpha2 and alpha3 country codes are summed per country.
+        """
+        src_file_name = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'test_heatmap_duplicates.cctf')
+        with open(src_file_name, 'w') as f:
+            f.write('{"country_code":"CH", "grouped_value": 2}\n{"country_code":"CHE", "grouped_value": 3}\n{"country_code":"-99", "grouped_value": 7}\n{"country_code":"ZZ", "grouped_value": 7}\n{"country_code":"DE", "grouped_value": 1}\n')
+        arguments = append_needed_args({'src': src_file_name,
+                    'map' : 'world',
+                    'type' : 'heatmap',
+                    'colormap' : 'viridis_r',
+                    'countryCodeAttribute' : 'country_code',
+                    'groupedValueAttribute' : 'grouped_value',
+                    'target': os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'test_heatmap_duplicates.png')})
+        v_map = visualization_map(**arguments)
+        self.assertEqual(v_map.aggregate_country_values(), {"CHE": 5, "DEU": 1})
+
+        v_map.src = os.path.join(TESTDATA_FOLDER, 'test_plotting_heatmap_invalid_countrycode.cctf')
+        self.assertIsNone(v_map.aggregate_country_values())
+
+    def test_run_not_existing_colormap(self):
+        """
+        Testing that a not existing colormap fails the run without a plot.
+        """
+        target_file_name = os.path.join(TESTDATA_GEN_OUTPUT_FOLDER, 'test_heatmap_colormap.png')
+        arguments = append_needed_args({'src': os.path.join(TESTDATA_FOLDER, 'test_plotting_heatmap_alpha3.cctf'),
+                    'map' : 'world',
+                    'type' : 'heatmap',
+                    'colormap' : 'NOTEXISTINGCOLORMAP',
+                    'countryCodeAttribute' : 'country_code',
+                    'groupedValueAttribute' : 'grouped_value',
+                    'target': target_file_name})
+        v_map = visualization_map(**arguments)
+        self.assertFalse(v_map.run())
+        self.assertFalse(os.path.isfile(target_file_name))
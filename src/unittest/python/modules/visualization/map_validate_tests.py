@@ -103,21 +103,6 @@ class DataVisualizationMapValidateTest(unittest.TestCase):
         with self.assertRaises(ValidationError):
             self.visualization.validate(arg1)
 
-        # colormap not existing
-        arg1 = append_needed_args({'src': '.',
-                    'map' : 'world',
-                    'colormap' : 'NOTEXISTINGCOLOR',
-                    'countryCodeAttribute' : '.',
-                    'groupedValueAttribute' : '.',
-                    'displayLegend' : 'yes',
-                    'displayLabels' : 'yes',
-                    'labelsThreshold' : 1,
-                    'title' : '.',
-                    'target': '.'})
-
-        with self.assertRaises(ValidationError):
-            self.visualization.validate(arg1)
-
         # Heatmap: countryCodeAttribute missing
         arg1 = append_needed_args({'src': '.',
                     'map' : 'world',